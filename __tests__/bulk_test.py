@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from loaders.bulk import TokenBucket, get_many_ticker_data
+from loaders.cache import clear_memory_cache
+
+THROTTLED = '{"Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute"}'
+
+
+class FakeAlphaVantage(BaseHTTPRequestHandler):
+    requests, throttle = [], set()
+
+    def do_GET(self):
+        symbol = parse_qs(urlparse(self.path).query)['symbol'][0]
+        FakeAlphaVantage.requests.append(symbol)
+        if symbol in FakeAlphaVantage.throttle:
+            FakeAlphaVantage.throttle.discard(symbol)
+            body = THROTTLED
+        else:
+            body = 'timestamp,open,high,low,close,volume\n2020-06-05,1,1,1,{0},1\n2020-06-04,1,1,1,{0},1\n'.format(len(symbol))
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBulkLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAlphaVantage)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = 'http://127.0.0.1:{}/query'.format(self.server.server_address[1])
+        self.data_dir = tempfile.mkdtemp()
+        FakeAlphaVantage.requests = []
+        clear_memory_cache()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir)
+
+    def test_fetch_many(self):
+        FakeAlphaVantage.throttle = {'BB'}
+        symbols = ['A', 'BB', 'CCC', 'DDDD']
+        data = get_many_ticker_data(symbols, interval='daily', concurrency=2, rate_limit=100, per=1.0, backoff=0.01,
+                                    data_dir=self.data_dir, base_url=self.base_url, api_key='demo')
+
+        self.assertEqual(sorted(data), symbols)
+        self.assertEqual(data['CCC']['close'].tolist(), [3.0, 3.0])
+        self.assertEqual(FakeAlphaVantage.requests.count('BB'), 2, "Should retry once the API limit was reached")
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_waits_for_tokens(self):
+        now, waits = [0.0], []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=5, per=60.0, clock=lambda: now[0], sleep=sleep)
+        for _ in range(7):
+            bucket.acquire()
+        self.assertEqual(len(waits), 2, "A burst of 5 should go through, then wait for new tokens")
+        self.assertAlmostEqual(now[0], 24.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
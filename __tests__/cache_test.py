@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.cache import ForecastCache, forecast_key
+from core.functions import forecast
+from methods.lr import LinearRegression
+from methods.sma import MovingAverage
+from utils.caching import LRUCache
+
+
+class CountingAverage(MovingAverage):
+    supports_batch = False
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self._calls = 0
+
+    def predict(self, t, x_data, y_data, look_back=-1):
+        self._calls += 1
+        return super().predict(t=t, x_data=x_data, y_data=y_data, look_back=look_back) * self.scale
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual([cache.get(key) for key in 'abc'], [1, None, 3])
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertEqual(len(cache), 1)
+
+        disabled = LRUCache(0)
+        disabled.put('a', 1)
+        self.assertIsNone(disabled.get('a'))
+
+
+class TestForecastCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.default_rng(5)
+        self.y = pd.Series(100 + np.cumsum(rng.normal(size=60)))
+        self.x = pd.DataFrame({'x': np.ones(60)})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        key = forecast_key(LinearRegression(), (self.x, self.y), start_t=5, look_back=10)
+        self.assertEqual(key, forecast_key(LinearRegression(), (self.x.to_numpy(), self.y.to_numpy()), 5, 10),
+                         "Same values in another container should give the same key")
+        self.assertNotEqual(key, forecast_key(LinearRegression(refresh_every=64), (self.x, self.y), 5, 10))
+        self.assertNotEqual(key, forecast_key(MovingAverage(), (self.x, self.y), 5, 10))
+        self.assertNotEqual(key, forecast_key(LinearRegression(), (self.x, self.y + 1e-9), 5, 10))
+        self.assertNotEqual(key, forecast_key(LinearRegression(), (self.x, self.y), 5, 10, diff_order='0'))
+
+    def test_hit_does_not_refit(self):
+        cache = ForecastCache(directory=self.directory)
+        method = CountingAverage()
+        expected = forecast(method, (self.x, self.y), start_t=5, look_back=10, cache=cache)
+        self.assertEqual(method._calls, 55)
+
+        for cache in [cache, ForecastCache(directory=self.directory)]:  # memory, then disk
+            predictions = forecast(method, (self.x, self.y), start_t=5, look_back=10, cache=cache)
+            np.testing.assert_array_equal(predictions, expected)
+            self.assertEqual(method._calls, 55, "A hit should not call the method")
+
+        predictions[:] = 0
+        np.testing.assert_array_equal(cache.get(forecast_key(method, (self.x, self.y), 5, 10, path='loop')),
+                                      expected, "Callers should get copies")
+
+        forecast(CountingAverage(scale=2.0), (self.x, self.y), start_t=5, look_back=10, cache=cache)
+        self.assertEqual(len(os.listdir(self.directory)), 2, "Different params should be cached separately")
+
+    def test_lru_eviction(self):
+        cache = ForecastCache(directory=self.directory, max_bytes=3 * 928, memory_size=0)
+        for key in 'abc':
+            cache.put(key, np.zeros(100))
+        os.utime(os.path.join(self.directory, 'a.npy'), ns=(1, 1))
+        os.utime(os.path.join(self.directory, 'b.npy'), ns=(2, 2))
+        os.utime(os.path.join(self.directory, 'c.npy'), ns=(3, 3))
+        cache.get('a')
+
+        cache.put('d', np.zeros(100))
+        self.assertIsNone(cache.get('b'), "The least recently used entry should be evicted")
+        for key in 'acd':
+            self.assertIsNotNone(cache.get(key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import io
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_ticker_csv
+from core.functions import forecast
+from core.simulation import sweep_thresholds
+from methods.sma import MovingAverage
+from timeseries.cli import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_dir = self.directory.name
+        self.prices = pd.Series(100 + np.cumsum(np.random.default_rng(4).normal(size=120)))
+        os.makedirs(os.path.join(self.data_dir, '5min'))
+        write_ticker_csv(os.path.join(self.data_dir, '5min', '5min_SYN.csv'), self.prices)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run(self):
+        plot_dir = os.path.join(self.data_dir, 'plots')
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(['run', '--symbol', 'SYN', '--interval', '5min', '--data-dir', self.data_dir, '--method', 'sma',
+                  '--look-back', '10', '--threshold', '0.5', '--plot-dir', plot_dir])
+
+        x_features = pd.DataFrame({'x': [1] * len(self.prices)})
+        predictions = forecast(MovingAverage(), (x_features, self.prices), start_t=5, look_back=10)
+        (final_balance,), (n_trades,) = sweep_thresholds(predictions, self.prices.to_numpy(), [0.5])
+        summary = output.getvalue().splitlines()[0].split()
+        self.assertEqual(int(summary[-5]), n_trades)
+        # prices go through a CSV file, so they can differ in the last digit
+        self.assertAlmostEqual(float(summary[-1]), final_balance, places=6)
+        self.assertEqual(sorted(os.listdir(plot_dir)), ['balance.png', 'balance_vs_price.png', 'predictions.png'])
+
+    def test_run_imports_only_what_it_needs(self):
+        code = ('import sys; from timeseries.cli import main; '
+                'main(["run", "--symbol", "SYN", "--interval", "5min", "--data-dir", sys.argv[1], "--method", "lr"]); '
+                'print(sorted({"sklearn", "matplotlib", "requests"} & set(sys.modules)))')
+        result = subprocess.run([sys.executable, '-W', 'ignore', '-c', code, self.data_dir], cwd=ROOT, check=True,
+                                capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.general import differentiate, inv_differentiate
+
+
+def reference_differentiate(data, order='1'):
+    # the pandas implementation differentiate() replaced
+    diff_data = data.copy()
+    if order == '0':
+        return diff_data
+    if order == '1':
+        diff_data = data.diff().fillna(0)
+    elif order == 'return-price':
+        diff_data = (data.diff() / data.shift(periods=1)).fillna(0)
+    else:
+        diff_data = data.diff().fillna(0)
+        diff_data.drop(diff_data.index[0], inplace=True)
+        diff_data = reference_differentiate(diff_data, str(int(order) - 1))
+    return diff_data
+
+
+def reference_inv_differentiate(predictions, order, initial_val):
+    # the element by element implementation inv_differentiate() replaced
+    if order == '1':
+        inv_diff_predictions = [initial_val + predictions[0]]
+        for i in range(len(predictions) - 1):
+            inv_diff_predictions.append(predictions[i + 1] + inv_diff_predictions[i])
+        return np.array(inv_diff_predictions)
+    inv_diff_predictions = [predictions[0] * initial_val + initial_val]
+    for i in range(len(predictions) - 1):
+        inv_diff_predictions.append(predictions[i + 1] * inv_diff_predictions[i] + inv_diff_predictions[i])
+    return np.array(inv_diff_predictions)
+
+
+class TestDifferentiate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        self.series = pd.Series(100 + np.cumsum(rng.normal(size=500)), index=range(10, 510), name='close')
+        self.series[[20, 21]] = [0.0, 0.0]
+
+    def test_matches_pandas(self):
+        for order in ['0', '1', '2', '3', 'return-price']:
+            expected = reference_differentiate(self.series, order=order)
+            pd.testing.assert_series_equal(differentiate(self.series, order=order), expected)
+
+    def test_arrays(self):
+        for order in ['1', '2', 'return-price']:
+            expected = reference_differentiate(self.series, order=order).to_numpy()
+            np.testing.assert_array_equal(differentiate(self.series.to_numpy(), order=order), expected)
+
+    def test_missing_values(self):
+        series = self.series.copy()
+        series[[50, 51, 80]] = np.nan
+        for order in ['1', '2', '3', 'return-price']:
+            expected = reference_differentiate(series, order=order)
+            pd.testing.assert_series_equal(differentiate(series, order=order), expected)
+
+    def test_short_series(self):
+        for length in [1, 2, 3]:
+            for order in ['1', '2', '3', 'return-price']:
+                if length < int(order if order.isdigit() else 1):
+                    continue
+                expected = reference_differentiate(self.series[:length], order=order)
+                pd.testing.assert_series_equal(differentiate(self.series[:length], order=order), expected)
+
+        for order in ['1', '2', '3', 'return-price']:
+            self.assertEqual(len(differentiate(self.series[:0], order=order)), 0)
+            self.assertEqual(len(differentiate(np.empty(0), order=order)), 0)
+            self.assertEqual(len(differentiate(np.ones(1), order=order)), 1 if order in ['1', 'return-price'] else 0)
+
+
+class TestInvDifferentiate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.predictions = rng.normal(scale=0.01, size=1000)
+
+    def test_order_1(self):
+        expected = reference_inv_differentiate(self.predictions, '1', 100.0)
+        np.testing.assert_array_equal(inv_differentiate(self.predictions, '1', 100.0), expected)
+
+        column = [np.array([value]) for value in self.predictions]
+        np.testing.assert_array_equal(inv_differentiate(column, '1', 100.0), expected.reshape(-1, 1))
+
+    def test_return_price(self):
+        expected = reference_inv_differentiate(self.predictions, 'return-price', 100.0)
+        np.testing.assert_allclose(inv_differentiate(self.predictions, 'return-price', 100.0), expected, rtol=1e-12)
+
+    def test_higher_order_round_trip(self):
+        series = np.cumsum(np.cumsum(self.predictions)) + 50
+        second_diff = differentiate(series, order='2')
+        # second differences from index 2 on, rebuilt from X(1) and X(1) - X(0)
+        rebuilt = inv_differentiate(second_diff[1:], '2', initial_val=[series[1], series[1] - series[0]])
+        np.testing.assert_allclose(rebuilt, series[2:], rtol=1e-12)
+
+        with self.assertRaises(ValueError):
+            inv_differentiate(second_diff, '2', initial_val=series[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
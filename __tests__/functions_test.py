@@ -1,4 +1,6 @@
 import unittest
+import numpy as np
+import pandas as pd
 from utils.general import *
 
 
@@ -30,5 +32,27 @@ class TestTrainingData(unittest.TestCase):
         self.assertEqual(y_train, [2, 4, 2], "Should return [2, 4, 2] as training y data for t=3")
 
 
+class TestPreparedData(unittest.TestCase):
+
+    def test_window_views(self):
+        x_data, y_data = pd.DataFrame({'a': range(6), 'b': [True] * 6}), pd.Series([2, 4, 2, 3, 1, 2])
+        dataset = PreparedData(x_data, y_data)
+        self.assertEqual(dataset.x.shape, (6, 2))
+
+        for t, look_back in [(2, -1), (3, 10), (4, 2)]:
+            x_train, y_train = training_data_for_t(data=(dataset.x, dataset.y), t=t, look_back=look_back)
+            x_expected, y_expected = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
+            np.testing.assert_array_equal(x_train, x_expected.to_numpy(dtype=float))
+            np.testing.assert_array_equal(y_train, y_expected.to_numpy(dtype=float))
+            self.assertTrue(np.shares_memory(y_train, dataset.y), "Windows should be views, not copies")
+
+        np.testing.assert_array_equal(feature_row(dataset.x, 3), [[3.0, 1.0]])
+        np.testing.assert_array_equal(feature_row(x_data, 3), [[3, True]])
+
+    def test_generated_x(self):
+        dataset = PreparedData(None, [5, 6, 7])
+        np.testing.assert_array_equal(dataset.x, [[0.0], [1.0], [2.0]])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from methods.lr import LinearRegression
+from methods.sma import MovingAverage
+from methods.svm import SVM
+from preparers import ticker_svm
+
+
+class TestIncrementalLinearRegression(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = 120
+        self.x_features = pd.DataFrame({'trend': np.arange(n) + 2000.0,
+                                        'noise': rng.normal(size=n),
+                                        'const': np.ones(n)})
+        self.y_features = pd.Series(100 + np.cumsum(rng.normal(size=n)))
+
+    def test_matches_refit(self):
+        data = (self.x_features, self.y_features)
+        for look_back in [-1, 3, 14]:
+            refit = forecast(LinearRegression(), data, start_t=5, look_back=look_back, incremental=False)
+            incremental = forecast(LinearRegression(refresh_every=16), data, start_t=5, look_back=look_back)
+            np.testing.assert_allclose(incremental, refit, rtol=1e-6, atol=1e-6,
+                                       err_msg="Incremental forecast should match refitting at every step")
+
+    def test_constant_features(self):
+        data = (pd.DataFrame({'x': [1] * len(self.y_features)}), self.y_features)
+        refit = forecast(LinearRegression(), data, start_t=5, look_back=10, incremental=False)
+        incremental = forecast(LinearRegression(), data, start_t=5, look_back=10)
+        np.testing.assert_allclose(incremental, refit, rtol=1e-9, err_msg="Should fall back to the window mean")
+
+    def test_date_features(self):
+        # calendar features are nearly collinear over short windows, the same directions have
+        # to be dropped whether the statistics were updated or rebuilt
+        raw_data = pd.DataFrame({'date': pd.bdate_range('2020-01-14', periods=100), 'close': self.y_features[:100]})
+        data = ticker_svm(raw_data)
+        for look_back in [10, 25, 35, 40, -1]:
+            refit = forecast(LinearRegression(), data, start_t=5, look_back=look_back, incremental=False)
+            incremental = forecast(LinearRegression(), data, start_t=5, look_back=look_back)
+            np.testing.assert_allclose(incremental, refit, rtol=1e-6, atol=1e-6, err_msg=str(look_back))
+
+    def test_state_reset_after_failure(self):
+        method = FailingLinearRegression(fail_at=50)
+        with self.assertRaises(RuntimeError):
+            forecast(method, (self.x_features, self.y_features), start_t=5, look_back=14)
+        self.assertIsNone(method._zz, "The walk-forward state should be cleared when a prediction fails")
+
+
+class FailingLinearRegression(LinearRegression):
+    def __init__(self, fail_at, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_at = fail_at
+
+    def predict_incremental(self, t, x_data, y_data, look_back=-1):
+        if t == self.fail_at:
+            raise RuntimeError('Prediction failed at t={}'.format(t))
+        return super().predict_incremental(t=t, x_data=x_data, y_data=y_data, look_back=look_back)
+
+
+class TestBatchedMovingAverage(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.y_data = pd.Series(rng.normal(size=60))
+        self.x_data = pd.DataFrame({'x': [1] * len(self.y_data)})
+
+    def test_matches_predict(self):
+        method = MovingAverage()
+        for look_back in [-1, 1, 5, 20]:
+            expected = [method.predict(t=t, x_data=self.x_data, y_data=self.y_data, look_back=look_back)
+                        for t in range(1, len(self.y_data))]
+            batched = method.predict_walk_forward(t=1, n=len(self.y_data) - 1, x_data=self.x_data,
+                                                  y_data=self.y_data, look_back=look_back)
+            np.testing.assert_allclose(batched, expected, rtol=1e-9, atol=1e-12,
+                                       err_msg="Batched moving averages should match predict() at every step")
+
+    def test_forecast_batched(self):
+        data = (self.x_data, self.y_data + 50)
+        looped = forecast(MovingAverage(), data, start_t=5, look_back=10, batched=False)
+        batched = forecast(MovingAverage(), data, start_t=5, look_back=10)
+        np.testing.assert_allclose(batched, looped, rtol=1e-9)
+
+
+class TestSVMBackends(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(8)
+        n = 150
+        self.x_features = pd.DataFrame({'trend': np.arange(n) + 2000.0, 'noise': rng.normal(size=n)})
+        self.y_features = pd.Series(100 + np.cumsum(rng.normal(size=n)))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, SVM, backend='liblinear')
+
+    def test_sgd_as_accurate_as_libsvm(self):
+        data, changes = (self.x_features, self.y_features), np.diff(self.y_features)[40:]
+        libsvm_error = np.abs(np.diff(forecast(SVM(), data, start_t=40, look_back=40))[40:] - changes).mean()
+        for incremental in [True, False]:
+            sgd = forecast(SVM(backend='sgd'), data, start_t=40, look_back=40, incremental=incremental)
+            sgd_error = np.abs(np.diff(sgd)[40:] - changes).mean()
+            self.assertLess(sgd_error, libsvm_error * 1.1, "Errors of the SGD backend should be close to SVR's")
+
+    def test_warm_start_is_chunk_aligned(self):
+        data = (self.x_features, self.y_features)
+        serial = forecast(SVM(backend='sgd', restart_every=32), data, start_t=5, look_back=20)
+        parallel = forecast(SVM(backend='sgd', restart_every=32), data, start_t=5, look_back=20, n_jobs=2)
+        np.testing.assert_array_equal(parallel, serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
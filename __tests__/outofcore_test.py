@@ -0,0 +1,85 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from core.outofcore import differentiate_chunked, inv_differentiate_chunked, forecast_sma_chunked, write_series
+from core.simulation import simulate_trades_vectorized, simulate_trades_chunked
+from methods.sma import MovingAverage
+from utils.general import differentiate, inv_differentiate
+
+
+class TestOutOfCore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(17)
+        self.prices = 100 + np.cumsum(rng.normal(size=1000))
+        self.values = write_series(self.path('prices.bin'), [self.prices[:500], self.prices[500:]])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_differentiate(self):
+        for order in ['0', '1', '2', '3', 'return-price']:
+            for chunk_size in [7, 64, 5000]:
+                diff = differentiate_chunked(self.values, self.path('diff.bin'), order=order, chunk_size=chunk_size)
+                np.testing.assert_array_equal(diff, differentiate(self.prices, order=order))
+
+        float32 = self.prices.astype(np.float32)
+        diff = differentiate_chunked(float32, self.path('diff.bin'), chunk_size=64)
+        self.assertEqual(diff.dtype, np.float32)
+        np.testing.assert_array_equal(diff, differentiate(float32))
+
+    def test_inv_differentiate(self):
+        changes = differentiate(self.prices)
+        for order, initial_val in [('0', None), ('1', 100.0), ('2', [100.0, 0.5]), ('return-price', 100.0)]:
+            inv = inv_differentiate_chunked(changes / 1000, self.path('inv.bin'), order=order,
+                                            initial_val=initial_val, chunk_size=64)
+            np.testing.assert_array_equal(inv, inv_differentiate(changes / 1000, order=order,
+                                                                 initial_val=initial_val))
+
+    def test_forecast_sma(self):
+        x_features, y_features = pd.DataFrame({'x': np.ones(len(self.prices))}), pd.Series(self.prices)
+        for diff_order in ['0', '1', 'return-price']:
+            for look_back in [-1, 1, 10, 100]:
+                expected = forecast(MovingAverage(), (x_features, y_features), start_t=5, look_back=look_back,
+                                    diff_order=diff_order)
+                for chunk_size in [3, 64]:
+                    predictions = forecast_sma_chunked(self.values, self.path('forecast.bin'), start_t=5,
+                                                       look_back=look_back, diff_order=diff_order,
+                                                       chunk_size=chunk_size)
+                    np.testing.assert_array_equal(predictions, expected)
+
+    def test_simulation(self):
+        predictions = self.prices + np.random.default_rng(3).normal(size=len(self.prices))
+        predictions[[10, 20]] = self.prices[[11, 21]]
+        for threshold in [0, 0.5, 100]:
+            expected = simulate_trades_vectorized(predictions, self.prices, threshold=threshold, verbose=False)
+            for chunk_size in [1, 7, 5000]:
+                balances = simulate_trades_chunked(predictions, self.values, self.path('balances.bin'),
+                                                   threshold=threshold, chunk_size=chunk_size, verbose=False)
+                np.testing.assert_array_equal(balances, expected)
+
+    def test_memory_bounded_by_chunk_size(self):
+        prices = write_series(self.path('long.bin'), (100 + np.cumsum(np.ones(10 ** 5) * 0.01) for _ in range(10)))
+        tracemalloc.start()
+        predictions = forecast_sma_chunked(prices, self.path('forecast.bin'), start_t=5, look_back=20,
+                                           chunk_size=10 ** 4)
+        simulate_trades_chunked(predictions, prices, self.path('balances.bin'), chunk_size=10 ** 4, verbose=False)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.assertEqual(len(predictions), 10 ** 6)
+        self.assertLess(peak, 10 ** 4 * 8 * 16, "Peak memory should be a few chunks, not the 8 MB series")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from core.parallel import chunk_bounds
+from methods.lr import LinearRegression
+from methods.sma import MovingAverage
+from methods.svm import SVM
+
+
+class TestParallelForecast(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        self.y = pd.Series(100 + np.cumsum(rng.normal(size=300)))
+        self.x = pd.DataFrame({'x': np.arange(300.0), 'noise': rng.normal(size=300)})
+
+    def test_chunk_bounds(self):
+        chunks = chunk_bounds(5, 300, n_chunks=8, alignment=16)
+        self.assertEqual(chunks[0][0], 5)
+        self.assertEqual(chunks[-1][1], 300)
+        self.assertTrue(all(first % 16 == 0 for first, _ in chunks[1:]), "Inner boundaries should be aligned")
+        self.assertTrue(all(last == first for (_, last), (first, _) in zip(chunks[:-1], chunks[1:])))
+        self.assertEqual(chunk_bounds(5, 7, n_chunks=8), [(5, 6), (6, 7)])
+
+    def test_bit_identical_to_serial(self):
+        for incremental in [True, False]:
+            expected = forecast(LinearRegression(refresh_every=16), (self.x, self.y), start_t=5, look_back=20,
+                                incremental=incremental)
+            predictions = forecast(LinearRegression(refresh_every=16), (self.x, self.y), start_t=5, look_back=20,
+                                   incremental=incremental, n_jobs=2)
+            np.testing.assert_array_equal(predictions, expected)
+
+    def test_executor(self):
+        expected = forecast(MovingAverage(), (self.x, self.y), start_t=5, look_back=-1, batched=False)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            predictions = forecast(MovingAverage(), (self.x, self.y), start_t=5, look_back=-1, batched=False,
+                                   executor=executor)
+        np.testing.assert_array_equal(predictions, expected)
+
+    def test_stateful_methods_on_threads(self):
+        for make_method in [lambda: LinearRegression(refresh_every=16), lambda: SVM(backend='sgd', restart_every=32)]:
+            for incremental in [True, False]:
+                expected = forecast(make_method(), (self.x, self.y), start_t=5, look_back=20, incremental=incremental)
+                method = make_method()
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    predictions = forecast(method, (self.x, self.y), start_t=5, look_back=20,
+                                           incremental=incremental, executor=executor)
+                np.testing.assert_array_equal(predictions, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
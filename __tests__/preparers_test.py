@@ -0,0 +1,86 @@
+import importlib.util
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from methods.svm import SVM
+from preparers import ticker_svm
+from preparers.datepart import DATEPART_COLUMNS, date_parts
+
+
+def reference_ticker_svm(raw_data):
+    # what the preparer computed with fastai's add_datepart(), which reads the pandas .dt accessors
+    data_copy = raw_data.copy()
+    field = data_copy['date']
+    for name in DATEPART_COLUMNS:
+        data_copy[name] = field.dt.isocalendar().week.astype('int64') if name == 'Week' else getattr(field.dt, name.lower())
+    data_copy.drop('date', axis=1, inplace=True)
+
+    data_copy['mon_fri'] = 0
+    data_copy['mon_fri'].mask(data_copy['Dayofweek'].isin([0, 4]), 1, inplace=True)
+    data_copy['mon_fri'].where(data_copy['Dayofweek'].isin([0, 4]), 0, inplace=True)
+    return data_copy.drop('close', axis=1), data_copy['close']
+
+
+class TestTickerSvm(unittest.TestCase):
+
+    def setUp(self):
+        # covers leap years and ISO weeks that belong to the previous / next year
+        dates = pd.date_range('2014-12-25', '2021-01-10', freq='D').append(
+            pd.date_range('2020-06-05 09:30', periods=200, freq='5min'))
+        self.raw_data = pd.DataFrame({'date': dates, 'close': np.arange(len(dates), dtype=float)})
+
+    def test_matches_reference(self):
+        x_features, y_features = ticker_svm(self.raw_data)
+        x_expected, y_expected = reference_ticker_svm(self.raw_data)
+
+        pd.testing.assert_frame_equal(x_features, x_expected, check_dtype=False)
+        pd.testing.assert_series_equal(y_features, y_expected)
+
+    def test_compact(self):
+        x_features, y_features = ticker_svm(self.raw_data, compact=True)
+        x_expected, _ = reference_ticker_svm(self.raw_data)
+
+        self.assertEqual(x_features.dtype, np.float32)
+        np.testing.assert_array_equal(x_features, x_expected.to_numpy(dtype=np.float32))
+
+    def test_known_dates(self):
+        # add_datepart() output for dates at month, quarter, year and ISO week boundaries
+        raw_data = pd.DataFrame({'date': pd.to_datetime(['2020-12-31', '2021-01-04', '2020-02-29', '2020-04-01',
+                                                         '2021-01-01']), 'close': np.arange(5.0)})
+        expected = [[2020, 12, 53, 31, 3, 366, True, False, True, False, True, False, 0],
+                    [2021, 1, 1, 4, 0, 4, False, False, False, False, False, False, 1],
+                    [2020, 2, 9, 29, 5, 60, True, False, False, False, False, False, 0],
+                    [2020, 4, 14, 1, 2, 92, False, True, False, True, False, False, 0],
+                    [2021, 1, 53, 1, 4, 1, False, True, False, True, False, True, 1]]
+        x_features, _ = ticker_svm(raw_data)
+        self.assertEqual(list(x_features.columns), DATEPART_COLUMNS + ['mon_fri'])
+        self.assertEqual(x_features.astype('int64').values.tolist(), np.array(expected, dtype=np.int64).tolist())
+
+    def test_compact_forecast(self):
+        raw_data = self.raw_data.iloc[:120].assign(close=100 + np.sin(np.arange(120) / 5))
+        expected = forecast(SVM(), ticker_svm(raw_data), start_t=100, look_back=30)
+        predictions = forecast(SVM(), ticker_svm(raw_data, compact=True), start_t=100, look_back=30)
+
+        self.assertEqual(predictions.shape, expected.shape)
+        np.testing.assert_allclose(predictions, expected, rtol=1e-4)
+
+    @unittest.skipUnless(importlib.util.find_spec('fastai'), 'fastai is not installed')
+    def test_matches_fastai(self):
+        x_features, _ = ticker_svm(self.raw_data)
+        x_expected, _ = ticker_svm(self.raw_data, engine='fastai')
+        pd.testing.assert_frame_equal(x_features, x_expected, check_dtype=False)
+
+
+class TestDateParts(unittest.TestCase):
+
+    def test_iso_week_boundaries(self):
+        parts = date_parts(np.array(['2020-12-31', '2021-01-03', '2021-01-04', '2018-12-31'], dtype='datetime64[D]'))
+        self.assertEqual(parts['Week'].tolist(), [53, 53, 1, 1])
+        self.assertEqual(parts['Year'].tolist(), [2020, 2021, 2021, 2018])
+
+
+if __name__ == '__main__':
+    unittest.main()
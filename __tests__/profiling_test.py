@@ -0,0 +1,98 @@
+import os
+import json
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from core.runner import make_grid, run_grid
+from core.simulation import simulate_trades_continuous, simulate_trades_vectorized
+from methods.lr import LinearRegression
+from utils import profiling
+from utils.profiling import Recorder, recording, stage
+
+
+class TestRecorder(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.y = pd.Series(100 + np.cumsum(rng.normal(size=120)))
+        self.x = pd.DataFrame({'x': np.ones(120)})
+
+    def test_disabled_is_noop(self):
+        self.assertIsNone(profiling.active_recorder())
+        self.assertIs(stage('anything', fits=1), stage('other'), "Disabled stages should share one no-op context")
+
+    def test_records_forecast_and_methods(self):
+        with recording() as recorder:
+            predictions = forecast(LinearRegression(refresh_every=32), (self.x, self.y), start_t=5, look_back=10)
+            simulate_trades_vectorized(predictions, self.y.to_numpy(), verbose=False)
+        self.assertIsNone(profiling.active_recorder(), "The previous recorder should be restored")
+
+        stats = recorder.to_dict()
+        self.assertEqual(stats['forecast.predict']['steps'], 115)
+        fits, updates = stats['LinearRegression.fit'], stats['LinearRegression.update']
+        self.assertEqual(fits['fits'] + updates['calls'], 115, "Every step either refits or updates")
+        self.assertEqual(fits['window'] + updates['window'], 5 + 6 + 7 + 8 + 9 + 11 * 110)
+        self.assertIn('simulate.vectorized', stats)
+
+        refitted = Recorder()
+        with recording(refitted):
+            forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, incremental=False)
+        self.assertEqual(refitted.stats['LinearRegression.fit']['fits'], 115)
+        self.assertEqual(refitted.stats['LinearRegression.window']['calls'], 115)
+
+    def test_merge_and_export(self):
+        first, second = Recorder(), Recorder()
+        first.add('fit', seconds=1.0, fits=2)
+        second.add('fit', seconds=0.5, fits=1, window=10)
+        second.add('predict', seconds=0.25)
+
+        merged = Recorder().merge(first).merge(json.loads(second.to_json()))
+        self.assertEqual(merged.stats['fit'], {'seconds': 1.5, 'calls': 2, 'fits': 3, 'window': 10})
+        self.assertEqual([row['stage'] for row in merged.rows(run='a')], ['fit', 'predict'])
+        self.assertEqual(merged.rows(run='a')[1], {'run': 'a', 'stage': 'predict', 'seconds': 0.25, 'calls': 1})
+
+    def test_profile_dump(self):
+        recorder = Recorder(profile=['forecast.predict'])
+        with recording(recorder), tempfile.TemporaryDirectory() as directory:
+            forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10)
+            paths = recorder.dump_profiles(directory)
+            self.assertEqual([os.path.basename(path) for path in paths], ['forecast.predict.pstats'])
+            self.assertTrue(os.path.getsize(paths[0]) > 0)
+
+    def test_recorder_per_thread(self):
+        def record_in_thread(name):
+            with recording() as recorder, stage(name):
+                return profiling.active_recorder() is recorder, recorder
+
+        with recording() as recorder, ThreadPoolExecutor(4) as executor:
+            # a thread does not report into the recorder of the thread that started it
+            self.assertIsNone(executor.submit(profiling.active_recorder).result())
+            results = list(executor.map(record_in_thread, ['a', 'b', 'c', 'd']))
+            simulate_trades_continuous(self.y.to_numpy(), self.y.to_numpy(), verbose=False)
+
+        self.assertTrue(all(own for own, _ in results))
+        self.assertEqual([list(thread_recorder.stats) for _, thread_recorder in results], [['a'], ['b'], ['c'], ['d']])
+        self.assertEqual(list(recorder.stats), ['simulate.loop'])
+        self.assertEqual(recorder.stats['simulate.loop']['steps'], len(self.y) - 1)
+
+    def test_runner_merges_jobs(self):
+        data = {'AAA': pd.DataFrame({'date': pd.date_range('2020-01-01', periods=120), 'close': self.y})}
+        grid = make_grid(['AAA'], [prepare_constant], ['sma', 'lr'], [10], thresholds=[0, 1])
+
+        recorder = Recorder()
+        run_grid(grid, data=data, max_workers=2, recorder=recorder)
+        self.assertEqual(recorder.stats['forecast.predict']['calls'], 2, "One forecast per (method, look back)")
+        self.assertEqual(recorder.stats['simulate.sweep']['thresholds'], 4)
+
+
+def prepare_constant(raw_data):
+    return pd.DataFrame({'x': np.ones(len(raw_data))}), raw_data['close']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from core.refit import RefitEvery, RefitBudget, RefitOnError, RefitOnDrift, walk_forward_refit
+from methods import RefitMethod
+from methods.lr import LinearRegression
+from methods.sma import MovingAverage
+
+
+class TestRefitPolicies(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.y = pd.Series(100 + np.cumsum(rng.normal(size=100)))
+        self.x = pd.DataFrame({'x': np.arange(100.0), 'noise': rng.normal(size=100)})
+
+    def test_refit_every_step_matches_forecast(self):
+        expected = forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, incremental=False)
+        policy = RefitEvery(1)
+        predictions = forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, refit=policy)
+        np.testing.assert_array_equal(predictions, expected)
+        self.assertEqual(policy.n_fits, 95)
+
+    def test_refit_every_k(self):
+        policy = RefitEvery(10)
+        predictions = forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, refit=policy)
+        self.assertEqual(len(predictions), 100)
+        self.assertEqual(policy.n_fits, 1 + 9, "First step, then t = 10, 20, ..., 90")
+
+        # fits happen at the same absolute time steps, so predictions after them agree
+        x, y = self.x.to_numpy(), self.y.to_numpy()
+        first = walk_forward_refit(LinearRegression(), x, y, t=5, n=95, look_back=10, policy=RefitEvery(10))
+        later = walk_forward_refit(LinearRegression(), x, y, t=37, n=63, look_back=10, policy=RefitEvery(10))
+        np.testing.assert_array_equal(np.concatenate(later[3:]), np.concatenate(first[35:]))
+
+    def test_refit_budget(self):
+        ticks = iter(range(1000))
+        policy = RefitBudget(seconds=5, clock=lambda: next(ticks))
+        forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, refit=policy)
+        self.assertEqual(policy.n_fits, 95 // 5)
+
+    def test_refit_on_error(self):
+        for threshold, expected_fits in [(np.inf, 1), (0, 95)]:
+            policy = RefitOnError(threshold=threshold, window=3)
+            forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, refit=policy)
+            self.assertEqual(policy.n_fits, expected_fits)
+
+    def test_refit_on_drift(self):
+        y = np.r_[np.zeros(50), np.full(50, 10.0)] + np.random.default_rng(0).normal(scale=0.1, size=100)
+        x = np.ones((100, 1))
+        policy = RefitOnDrift(threshold=3, window=5)
+        walk_forward_refit(LinearRegression(), x, y, t=20, n=80, look_back=10, policy=policy)
+        self.assertTrue(1 < policy.n_fits < 10, "Only the level shift should trigger refits")
+
+    def test_unsupported_method_ignores_policy(self):
+        policy = RefitEvery(10)
+        predictions = forecast(MovingAverage(), (self.x, self.y), start_t=5, look_back=10, refit=policy)
+        np.testing.assert_array_equal(predictions, forecast(MovingAverage(), (self.x, self.y), start_t=5, look_back=10))
+        self.assertEqual(policy.n_fits, 0)
+
+    def test_invalid_intervals(self):
+        for k in [True, False, 0, -3, 2.5]:
+            with self.assertRaises(ValueError):
+                forecast(LinearRegression(), (self.x, self.y), start_t=5, look_back=10, refit=k)
+        self.assertEqual(RefitEvery(np.int64(4)).k, 4)
+
+    def test_refit_methods(self):
+        self.assertTrue(LinearRegression.supports_refit and issubclass(LinearRegression, RefitMethod))
+        self.assertFalse(hasattr(MovingAverage(), 'fit'), "Only refit methods should have fit()")
+
+        class Incomplete(RefitMethod):
+            def predict(self, t, x_data, y_data, look_back=-1):
+                pass
+
+            def predict_next_n(self, t, n, x_data, y_data, look_back=-1):
+                pass
+
+        self.assertRaises(TypeError, Incomplete)
+
+
+if __name__ == '__main__':
+    unittest.main()
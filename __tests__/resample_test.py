@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from loaders.cache import clear_memory_cache
+from loaders.resample import BAR_COLUMNS, resample_bars, get_resampled_data
+
+
+def random_bars(n, seed=5):
+    rng = np.random.default_rng(seed)
+    # 5 minute bars of trading hours, with gaps overnight and over weekends
+    dates = pd.bdate_range('2020-06-01', periods=n // 78 + 1).repeat(78)[:n] + \
+        pd.to_timedelta(np.tile(np.arange(78) * 5 + 9 * 60 + 30, n // 78 + 1)[:n], unit='min')
+    close = 100 + np.cumsum(rng.normal(size=n))
+    spread = rng.uniform(0, 1, size=(2, n))
+    return {'date': dates.to_numpy(dtype='datetime64[ns]'), 'open': close + rng.normal(size=n) / 4,
+            'high': close + spread[0], 'low': close - spread[1], 'close': close,
+            'volume': rng.integers(0, 1000, size=n).astype(np.float64)}
+
+
+class TestResampleBars(unittest.TestCase):
+
+    def test_matches_pandas(self):
+        bars = random_bars(2000)
+        frame = pd.DataFrame(bars).set_index('date')
+        for interval, rule in [('15min', '15min'), ('60min', '60min'), ('2h', '2h'), ('daily', '1D')]:
+            expected = frame.resample(rule, origin='epoch').agg(
+                {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+
+            resampled = resample_bars(bars, interval)
+            np.testing.assert_array_equal(resampled['date'], expected.index.to_numpy())
+            for name in BAR_COLUMNS[1:]:
+                np.testing.assert_array_equal(resampled[name], expected[name].to_numpy(), err_msg=name)
+
+    def test_weekly(self):
+        bars = random_bars(78 * 40)
+        expected = pd.DataFrame(bars).set_index('date').resample('W').agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+
+        for interval in ['weekly', 'W']:
+            resampled = resample_bars(bars, interval)
+            # pandas labels weeks by the Sunday they end on, the bars start on the Monday before
+            np.testing.assert_array_equal(resampled['date'], (expected.index - pd.Timedelta(days=6)).to_numpy())
+            self.assertTrue((pd.DatetimeIndex(resampled['date']).dayofweek == 0).all())
+            for name in BAR_COLUMNS[1:]:
+                np.testing.assert_array_equal(resampled[name], expected[name].to_numpy(), err_msg=name)
+
+    def test_close_only(self):
+        bars = {'date': np.array(['2020-06-01T10:00', '2020-06-01T10:05', '2020-06-02T10:00'], dtype='datetime64[ns]'),
+                'close': np.array([1.0, 3.0, 2.0])}
+        resampled = resample_bars(bars, 'daily')
+        self.assertEqual(resampled['open'].tolist(), [1.0, 2.0])
+        self.assertEqual(resampled['high'].tolist(), [3.0, 2.0])
+        self.assertEqual(resampled['low'].tolist(), [1.0, 2.0])
+        self.assertEqual(resampled['close'].tolist(), [3.0, 2.0])
+        self.assertEqual(resampled['volume'].tolist(), [0.0, 0.0])
+
+        empty = resample_bars({'date': bars['date'][:0], 'close': bars['close'][:0]}, 'daily')
+        self.assertEqual([len(empty[name]) for name in BAR_COLUMNS], [0] * len(BAR_COLUMNS))
+
+    def test_invalid(self):
+        bars = {'date': np.array(['2020-06-02', '2020-06-01'], dtype='datetime64[ns]'), 'close': np.ones(2)}
+        with self.assertRaises(ValueError):
+            resample_bars(bars, 'daily')
+        # longer than a day without a calendar boundary, weeks of 7D would start on Thursdays
+        for interval in ['2D', '7D', 'monthly']:
+            with self.assertRaises(ValueError):
+                resample_bars({'date': bars['date'][1:], 'close': bars['close'][1:]}, interval)
+
+
+class TestResampledData(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.data_dir, '5min'))
+        self.path = os.path.join(self.data_dir, '5min', '5min_TEST.csv')
+        self.bars = random_bars(500)
+        self.write(self.bars)
+        clear_memory_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def write(self, bars):
+        frame = pd.DataFrame(bars).rename(columns={'date': 'timestamp'}).iloc[::-1]
+        frame.to_csv(self.path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+
+    def test_resampled_data(self):
+        data = get_resampled_data('TEST', interval='60min', data_dir=self.data_dir, use_cache=False)
+        expected = resample_bars(self.bars, '60min')
+        self.assertEqual(list(data.columns), BAR_COLUMNS)
+        np.testing.assert_array_equal(data['date'].to_numpy(), expected['date'])
+        np.testing.assert_allclose(data['close'].to_numpy(), expected['close'])
+
+        with self.assertRaises(ValueError):
+            get_resampled_data('TEST', interval='1min', data_dir=self.data_dir)
+
+    def test_cached_and_invalidated(self):
+        expected = get_resampled_data('TEST', interval='daily', data_dir=self.data_dir, use_cache=False)
+        get_resampled_data('TEST', interval='daily', data_dir=self.data_dir)
+        get_resampled_data('TEST', interval='60min', data_dir=self.data_dir)
+        clear_memory_cache()
+
+        cached = get_resampled_data('TEST', interval='daily', data_dir=self.data_dir, read_only=True)
+        cache_dir = os.path.join(self.data_dir, '5min', '.cache')
+        self.assertEqual(len(os.listdir(cache_dir)), 3 * len(BAR_COLUMNS), "Base bars and both intervals")
+        self.assertIsInstance(cached['close'].values.base, np.memmap, "Should be loaded memory-mapped")
+        self.assertTrue(cached.equals(expected))
+        get_resampled_data('TEST', interval='daily', data_dir=self.data_dir).loc[0, 'close'] = 0.0
+        self.assertTrue(cached.equals(expected), "Writable frames should be copies")
+
+        bars = {name: column[:-100] for name, column in self.bars.items()}
+        self.write(bars)
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10 ** 9))
+
+        data = get_resampled_data('TEST', interval='daily', data_dir=self.data_dir)
+        np.testing.assert_array_equal(data['date'].to_numpy(), resample_bars(bars, 'daily')['date'])
+        self.assertEqual(len(data), len(expected) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
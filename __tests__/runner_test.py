@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from core import runner
+from core.runner import make_grid, run_grid
+from core.simulation import sweep_thresholds
+from methods.sma import MovingAverage
+
+
+def prepare_constant(raw_data):
+    return pd.DataFrame({'x': [1] * len(raw_data['close'])}), raw_data['close']
+
+
+class Constant:
+    @staticmethod
+    def prepare(raw_data):
+        return prepare_constant(raw_data)
+
+
+class Shifted:
+    @staticmethod
+    def prepare(raw_data):
+        return prepare_constant(raw_data.assign(close=raw_data['close'] * 2))
+
+
+class TestRunGrid(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.data = {symbol: pd.DataFrame({'date': pd.date_range('2020-01-01', periods=80),
+                                           'close': 100 + np.cumsum(rng.normal(size=80))})
+                     for symbol in ['AAA', 'BBB']}
+
+    def test_matches_direct_run(self):
+        grid = make_grid(['AAA', 'BBB'], [prepare_constant], ['sma', 'lr'], [3, 10], thresholds=[0, 0.5, 1])
+        with tempfile.TemporaryDirectory() as directory:
+            results_path = os.path.join(directory, 'results.csv')
+            results = run_grid(grid, data=self.data, max_workers=2, results_path=results_path)
+            self.assertEqual(len(pd.read_csv(results_path)), len(grid), "Every row should be streamed to disk")
+
+        self.assertEqual(len(results), len(grid))
+        row = results.query("symbol == 'BBB' and method == 'sma' and look_back == 10 and threshold == 0.5").iloc[0]
+        x_features, y_features = prepare_constant(self.data['BBB'])
+        predictions = forecast(MovingAverage(), (x_features, y_features), start_t=5, look_back=10)
+        final_balances, n_trades = sweep_thresholds(predictions, y_features.to_numpy(), [0.5])
+
+        self.assertEqual(row['final_balance'], final_balances[0])
+        self.assertEqual(row['n_trades'], n_trades[0])
+
+    def test_equally_named_preparers(self):
+        grid = make_grid(['AAA'], [Constant.prepare, Shifted.prepare], ['sma'], [3])
+        results = run_grid(grid, data=self.data, max_workers=1)
+        self.assertEqual(sorted(results['preparer']),
+                         ['{}.{}.prepare'.format(__name__, name) for name in ['Constant', 'Shifted']])
+        self.assertEqual(len(set(results['final_balance'])), 2, "Each preparer should use its own features")
+
+    def test_prepared_features_bounded(self):
+        symbols = ['S{}'.format(i) for i in range(runner.PREPARED_CACHE_SIZE + 3)]
+        runner._init_worker({symbol: self.data['AAA'] for symbol in symbols})
+        try:
+            for symbol in symbols:
+                runner._prepared_features(symbol, prepare_constant)
+            self.assertEqual([symbol for symbol, _ in runner._PREPARED], symbols[-runner.PREPARED_CACHE_SIZE:])
+        finally:
+            runner._RAW_DATA.clear()
+            runner._PREPARED.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
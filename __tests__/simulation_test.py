@@ -0,0 +1,207 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import numpy as np
+
+from core.simulation import simulate_trades_continuous, simulate_trades_vectorized, sweep_thresholds, \
+    simulate_portfolio, read_trade_log, format_trade_log, BUY, SHORT, SELL, BUY_BACK
+
+
+def run_quietly(simulation, **kwargs):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        balances = simulation(**kwargs)
+    return balances, output.getvalue().strip().splitlines()[-1]
+
+
+def assert_logs_equal(trade_log, expected):
+    for field in expected.dtype.names:
+        np.testing.assert_array_equal(trade_log[field], expected[field], "Trade logs should match exactly")
+
+
+class TestVectorizedSimulation(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.ground_truth = 100 + np.cumsum(rng.normal(size=300))
+        self.predictions = self.ground_truth + rng.normal(scale=2.0, size=300)
+        # equal prediction and price takes no action and records nothing
+        self.predictions[[10, 11, 50]] = self.ground_truth[[11, 12, 51]]
+
+    def test_matches_loop(self):
+        for threshold in [0, 0.5, 1, 2.5, 100]:
+            kwargs = dict(predictions=self.predictions, ground_truth=self.ground_truth, threshold=threshold)
+            expected, expected_summary = run_quietly(simulate_trades_continuous, **kwargs)
+            balances, summary = run_quietly(simulate_trades_vectorized, **kwargs)
+
+            np.testing.assert_array_equal(balances, expected, "Balances should match the loop exactly")
+            self.assertEqual(summary, expected_summary, "Trade count and final balance should match the loop")
+
+            _, expected_log = simulate_trades_continuous(verbose=False, return_log=True, **kwargs)
+            _, trade_log = simulate_trades_vectorized(verbose=False, return_log=True, **kwargs)
+            assert_logs_equal(trade_log, expected_log)
+
+    def test_position_left_open(self):
+        predictions, ground_truth = np.array([10.0, 12.0, 9.0]), np.array([10.0, 11.0, 10.0])
+        expected, _ = run_quietly(simulate_trades_continuous, predictions=predictions, ground_truth=ground_truth)
+        balances = simulate_trades_vectorized(predictions=predictions, ground_truth=ground_truth, verbose=False)
+        np.testing.assert_array_equal(balances, expected)
+
+    def test_without_steps(self):
+        for ground_truth in [np.empty(0), np.array([10.0])]:
+            predictions = ground_truth + 1
+            expected, expected_summary = run_quietly(simulate_trades_continuous, predictions=predictions,
+                                                     ground_truth=ground_truth)
+            balances, summary = run_quietly(simulate_trades_vectorized, predictions=predictions,
+                                            ground_truth=ground_truth)
+            self.assertEqual(list(balances), expected, "Nothing to trade on, the curve should be empty")
+            self.assertEqual(summary, expected_summary)
+            _, trade_log = simulate_trades_vectorized(predictions, ground_truth, verbose=False, return_log=True)
+            self.assertEqual(len(trade_log), 0)
+
+
+class TestTradeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.ground_truth = np.array([10.0, 11.0, 10.0, 10.0, 12.0])
+        self.predictions = np.array([10.5, 10.0, 10.0, 13.0, 0.0])
+
+    def test_trades(self):
+        balances, trade_log = simulate_trades_continuous(self.predictions, self.ground_truth, verbose=False,
+                                                         return_log=True)
+        # shorts at 11 and buys back at 10, takes no action twice, then buys at 12 and sells at the end
+        self.assertEqual(trade_log['side'].tolist(), [SHORT, BUY_BACK, BUY, SELL])
+        self.assertEqual(trade_log['step'].tolist(), [1, 2, 4, 4])
+        self.assertEqual(trade_log['price'].tolist(), [11.0, 10.0, 12.0, 12.0])
+        np.testing.assert_array_equal(trade_log['predicted'], [10.5, np.nan, 13.0, np.nan])
+        self.assertEqual(trade_log['balance'].tolist(), [11.0, 1.0, -11.0, 1.0])
+        self.assertEqual(balances, [1.0, 1.0])
+
+    def test_silent_without_verbose(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            simulate_trades_continuous(self.predictions, self.ground_truth, verbose=False)
+            simulate_trades_vectorized(self.predictions, self.ground_truth, verbose=False)
+        self.assertEqual(output.getvalue(), '')
+
+    def test_verbose_output(self):
+        _, output = run_quietly(simulate_trades_continuous, predictions=self.predictions,
+                                ground_truth=self.ground_truth)
+        _, trade_log = simulate_trades_vectorized(self.predictions, self.ground_truth, verbose=False, return_log=True)
+        self.assertEqual(output, 'Simulation done. Executed 2 trades, Final Balance: 1.0')
+        self.assertEqual(format_trade_log(trade_log)[:2], ['Current price is 11.0, Predicting price at t+1 to be 10.5 '
+                                                           '| Shorting one share', 'Actual price is 10.0 | Buying back'])
+
+    def test_log_file(self):
+        rng = np.random.default_rng(3)
+        ground_truth = 100 + np.cumsum(rng.normal(size=500))
+        predictions = ground_truth + rng.normal(size=500)
+        _, expected = simulate_trades_continuous(predictions, ground_truth, verbose=False, return_log=True)
+
+        with tempfile.TemporaryDirectory() as directory, mock.patch('core.simulation.TRADE_LOG_BLOCK', 64):
+            for simulation in [simulate_trades_continuous, simulate_trades_vectorized]:
+                path = os.path.join(directory, simulation.__name__ + '.bin')
+                _, trade_log = simulation(predictions, ground_truth, verbose=False, return_log=True, log_file=path)
+                assert_logs_equal(trade_log, expected)
+                self.assertIsInstance(trade_log, np.memmap, "Both simulations should return the log memory-mapped")
+                assert_logs_equal(read_trade_log(path), expected)
+                self.assertEqual(os.path.getsize(path), expected.nbytes)
+                del trade_log
+
+
+class TestThresholdSweep(unittest.TestCase):
+
+    def test_matches_single_runs(self):
+        rng = np.random.default_rng(5)
+        ground_truth = 50 + np.cumsum(rng.normal(size=200))
+        predictions = ground_truth + rng.normal(scale=1.0, size=200)
+        thresholds = np.linspace(0, 5, 21)
+
+        final_balances, n_trades, curves = sweep_thresholds(predictions, ground_truth, thresholds,
+                                                            return_curves=True, chunk_size=4)
+        for i, threshold in enumerate(thresholds):
+            expected, trade_log = simulate_trades_continuous(predictions=predictions, ground_truth=ground_truth,
+                                                             threshold=threshold, verbose=False, return_log=True)
+            np.testing.assert_array_equal(curves[i], expected)
+            self.assertEqual(np.count_nonzero(np.abs(trade_log['side']) == 1), n_trades[i],
+                             "Trade counts should match the loop")
+            self.assertEqual(final_balances[i], expected[-1] if len(expected) else 0)
+
+    def test_without_curves(self):
+        ground_truth, predictions = np.array([10.0, 11.0, 10.0, 12.0]), np.array([10.5, 10.0, 13.0, 12.0])
+        final_balances, n_trades = sweep_thresholds(predictions, ground_truth, [0, 10, 50])
+        np.testing.assert_array_equal(n_trades, [2, 0, 0])
+        self.assertEqual(final_balances[2], 0)
+
+    def test_without_steps(self):
+        for ground_truth in [np.empty(0), np.array([10.0])]:
+            final_balances, n_trades, curves = sweep_thresholds(ground_truth + 1, ground_truth, [0, 10],
+                                                                return_curves=True)
+            np.testing.assert_array_equal(final_balances, [0, 0])
+            np.testing.assert_array_equal(n_trades, [0, 0])
+            self.assertEqual([len(curve) for curve in curves], [0, 0])
+
+
+class TestPortfolioSimulation(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(12)
+        self.ground_truth = 100 + np.cumsum(rng.normal(size=(200, 7)), axis=0)
+        self.predictions = self.ground_truth + rng.normal(scale=2.0, size=(200, 7))
+
+    def test_matches_single_asset(self):
+        thresholds = np.linspace(0, 3, 7)
+        result = simulate_portfolio(self.predictions, self.ground_truth, threshold=thresholds, return_curves=True,
+                                    chunk_size=3, verbose=False)
+        for asset, threshold in enumerate(thresholds):
+            (final_balance,), (n_trades,) = sweep_thresholds(self.predictions[:, asset], self.ground_truth[:, asset],
+                                                             [threshold])
+            self.assertEqual(result.final_balances[asset], final_balance, "Unit sizing should match exactly")
+            self.assertEqual(result.n_trades[asset], n_trades)
+        self.assertEqual(result.balance_curves.shape, (199, 7))
+        np.testing.assert_allclose(result.total_curve, result.balance_curves.sum(axis=1))
+        np.testing.assert_allclose(result.total_curve[-1], result.final_balances.sum())
+
+    def test_sizing(self):
+        prices = np.array([[10.0, 100.0], [10.0, 100.0], [12.0, 90.0], [11.0, 95.0]])
+        predictions = np.array([[11.0, 95.0], [11.0, 95.0], [0, 0], [0, 0]])
+        # asset 0 buys at 10 and sells at 12, then shorts at 12 and buys back at 11
+        # asset 1 shorts at 100 and buys back at 90, then buys at 90 and sells at 95
+        # and both open a last position that is liquidated at the same price
+        units = simulate_portfolio(predictions, prices, sizing='units', size=2, verbose=False)
+        np.testing.assert_allclose(units.final_balances, [2 * (2 + 1), 2 * (10 + 5)])
+
+        notional = simulate_portfolio(predictions, prices, sizing='notional', size=120, verbose=False)
+        np.testing.assert_allclose(notional.final_balances, [12 * 2 + 10 * 1, 1.2 * 10 + 120 / 90 * 5])
+
+        proportional = simulate_portfolio(predictions, prices, sizing='proportional', size=1, verbose=False)
+        np.testing.assert_allclose(proportional.final_balances, [10 * 2 + 100 / 12 * 1, 5 * 10 + 100 / 18 * 5])
+
+        limited = simulate_portfolio(predictions, prices, sizing='units', size=2, capital=110, verbose=False)
+        # gross values of 2 x (10 + 100) and 2 x (12 + 90) are scaled down to the capital
+        np.testing.assert_allclose(limited.final_balances, [2 * (2 * 110 / 220 + 1 * 110 / 204),
+                                                            2 * (10 * 110 / 220 + 5 * 110 / 204)])
+        self.assertEqual(units.n_trades.tolist(), [3, 3])
+        self.assertRaises(ValueError, simulate_portfolio, predictions, prices, sizing='kelly')
+
+        # steps without positions have a gross value of 0
+        no_capital = simulate_portfolio(predictions, prices, capital=0, return_curves=True, verbose=False)
+        np.testing.assert_array_equal(no_capital.final_balances, [0, 0])
+        np.testing.assert_array_equal(no_capital.balance_curves, np.zeros((3, 2)))
+
+    def test_without_steps(self):
+        for ground_truth in [np.empty((0, 3)), self.ground_truth[:1], np.array([10.0])]:
+            result = simulate_portfolio(ground_truth + 1, ground_truth, capital=100, return_curves=True, verbose=False)
+            n_assets = ground_truth.shape[1] if ground_truth.ndim == 2 else 1
+            np.testing.assert_array_equal(result.final_balances, np.zeros(n_assets))
+            np.testing.assert_array_equal(result.n_trades, np.zeros(n_assets))
+            self.assertEqual(result.total_curve.shape, (0,))
+            self.assertEqual(result.balance_curves.shape, (0, n_assets))
+
+
+if __name__ == '__main__':
+    unittest.main()
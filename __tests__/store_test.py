@@ -0,0 +1,123 @@
+import os
+import time
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.runner import make_grid, run_grid
+from core.simulation import sweep_thresholds
+from core.store import CONFIG_KEYS, ResultsStore, data_hash
+from core.functions import forecast
+from methods.sma import MovingAverage
+
+
+def run(symbol, threshold, final_balance, look_back=5):
+    return dict(symbol=symbol, preparer='ticker_sma', method='sma', params='{}', look_back=look_back, diff_order='1',
+                start_t=5, threshold=threshold, data_hash='0', final_balance=final_balance, n_trades=3, seconds=0.1)
+
+
+def prepare_constant(raw_data):
+    return pd.DataFrame({'x': [1] * len(raw_data['close'])}), raw_data['close']
+
+
+class TestResultsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.directory.name, 'results.db'))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_runs_and_best(self):
+        self.store.add_runs([run('AAA', 0, 1.0), run('AAA', 1, 5.0), run('BBB', 0, -2.0), run('BBB', 1, -1.0)],
+                            curves=[np.arange(3.0), np.arange(4.0), np.arange(5.0), np.arange(6.0)])
+        # results of a configuration that is already stored are replaced
+        self.store.add_runs([run('AAA', 0, 7.0)])
+
+        self.assertEqual(len(self.store), 4)
+        best = self.store.best(['symbol'])
+        self.assertEqual(best[['symbol', 'threshold', 'final_balance']].values.tolist(),
+                         [['AAA', 0.0, 7.0], ['BBB', 1.0, -1.0]])
+        self.assertEqual(len(self.store.runs(symbol='AAA', threshold=1)), 1)
+
+        run_id = self.store.runs(symbol='BBB', threshold=0)['id'][0]
+        np.testing.assert_array_equal(self.store.curve(run_id), np.arange(5.0))
+        self.assertRaises(ValueError, self.store.best, ['symbol; DROP TABLE runs'])
+
+    def test_best_is_fast(self):
+        rng = np.random.default_rng(0)
+        rows = [run('S{}'.format(i % 100), float(i // 100 % 100), rng.normal(), look_back=i // 10000)
+                for i in range(10 ** 5)]
+        for start in range(0, len(rows), 10 ** 4):
+            self.store.add_runs(rows[start:start + 10 ** 4])
+        self.assertEqual(len(self.store), 10 ** 5)
+
+        started = time.perf_counter()
+        best = self.store.best(['symbol'])
+        self.assertLess(time.perf_counter() - started, 0.05)
+        expected = pd.DataFrame(rows).groupby('symbol')['final_balance'].max()
+        np.testing.assert_array_equal(best['final_balance'], expected.to_numpy())
+
+        best = self.store.best(['look_back', 'symbol'], metric='threshold', symbol='S7')
+        expected = pd.DataFrame(rows).query("symbol == 'S7'").groupby('look_back')['threshold'].max()
+        self.assertEqual(best['look_back'].tolist(), expected.index.tolist())
+        np.testing.assert_array_equal(best['threshold'], expected.to_numpy())
+
+    def test_done_uses_index(self):
+        self.store.add_runs([run('S{}'.format(i), float(i % 10), 0.0) for i in range(1000)])
+        wanted = [run('S1', 1.0, 0.0), run('S2', 1.0, 0.0), run('S3', 3, 0.0), dict(run('S3', 3.0, 0.0), start_t=6)]
+        self.assertEqual(self.store.done(wanted), {tuple(wanted[i][key] for key in CONFIG_KEYS) for i in [0, 2]})
+        self.assertEqual(self.store.done([]), set())
+
+        plan = ' '.join(row[-1] for row in self.store._connection.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM wanted JOIN runs USING ({})'.format(', '.join(CONFIG_KEYS))))
+        self.assertIn('runs_config', plan)
+
+
+class TestRunnerStore(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        self.data = {'AAA': pd.DataFrame({'date': pd.date_range('2020-01-01', periods=60),
+                                          'close': 100 + np.cumsum(rng.normal(size=60))})}
+        self.store = ResultsStore(':memory:')
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_skips_stored_configurations(self):
+        grid = make_grid(['AAA'], [prepare_constant], ['sma'], [3, 10], thresholds=[0, 0.5])
+        first = run_grid(grid[:3], data=self.data, max_workers=1, store=self.store, store_curves=True)
+        self.assertEqual(len(first), 3)
+
+        second = run_grid(grid, data=self.data, max_workers=1, store=self.store)
+        self.assertEqual(second[['look_back', 'threshold']].values.tolist(), [[10, 0.5]], "Only the new one runs")
+        self.assertEqual(len(self.store), 4)
+
+        stored = self.store.runs(look_back=3, threshold=0.5).iloc[0]
+        self.assertEqual(stored['data_hash'], data_hash(self.data['AAA']))
+        x_features, y_features = prepare_constant(self.data['AAA'])
+        predictions = forecast(MovingAverage(), (x_features, y_features), start_t=5, look_back=3)
+        (final_balance,), _, (curve,) = sweep_thresholds(predictions, y_features.to_numpy(), [0.5],
+                                                          return_curves=True)
+        self.assertEqual(stored['final_balance'], final_balance)
+        np.testing.assert_array_equal(self.store.curve(stored['id']), curve)
+
+        # a different start time step is a different configuration
+        later = run_grid(grid, data=self.data, start_t=20, max_workers=1, store=self.store)
+        self.assertEqual(len(later), 4, "Results forecast from another start_t should not be reused")
+        self.assertEqual(sorted(self.store.runs(look_back=3, threshold=0.5)['start_t']), [5, 20])
+        self.assertEqual(len(run_grid(grid, data=self.data, start_t=20, max_workers=1, store=self.store)), 0)
+
+        # different data is a different configuration
+        changed = {'AAA': self.data['AAA'].assign(close=self.data['AAA']['close'] + 1)}
+        self.assertEqual(len(run_grid(grid, data=changed, max_workers=1, store=self.store)), 4)
+        self.assertEqual(len(self.store), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.functions import forecast
+from core.simulation import simulate_trades_continuous
+from core.streaming import RingBuffer, StreamingPipeline
+from methods.lr import LinearRegression
+from methods.sma import MovingAverage
+
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(21)
+        self.closes = 100 + np.cumsum(rng.normal(size=150))
+
+    def check_matches_batch(self, method, look_back, diff_order, threshold):
+        y_features = pd.Series(self.closes)
+        x_features = pd.DataFrame({'x': [1] * len(y_features)})
+        expected = forecast(method, (x_features, y_features), start_t=5, look_back=look_back, diff_order=diff_order,
+                            incremental=False, batched=False)
+        expected_balances, trade_log = simulate_trades_continuous(expected, self.closes, threshold=threshold,
+                                                                  verbose=False, return_log=True)
+
+        pipeline = StreamingPipeline(method, look_back=look_back, start_t=5, diff_order=diff_order, threshold=threshold)
+        predictions = [pipeline.update(t, close).prediction for t, close in enumerate(self.closes)]
+        final_balance = pipeline.close()
+
+        np.testing.assert_allclose(predictions, expected, rtol=1e-12)
+        self.assertAlmostEqual(final_balance, expected_balances[-1], places=9)
+        self.assertEqual(np.count_nonzero(np.abs(trade_log['side']) == 1), pipeline.n_trades)
+
+    def test_matches_batch(self):
+        for diff_order in ['0', '1', 'return-price']:
+            self.check_matches_batch(MovingAverage(), look_back=10, diff_order=diff_order, threshold=0.5)
+        self.check_matches_batch(LinearRegression(), look_back=3, diff_order='1', threshold=0)
+
+    def test_unbounded_look_back(self):
+        with self.assertRaises(ValueError):
+            StreamingPipeline(MovingAverage(), look_back=-1)
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_last_values(self):
+        buffer = RingBuffer(3)
+        for value in range(5):
+            buffer.append(value)
+            np.testing.assert_array_equal(buffer.view(), list(range(max(0, value - 2), value + 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
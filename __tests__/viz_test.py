@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from utils.viz import downsample, render_many, plot_balance, plot_time_series_with_forecast
+
+
+class TestDownsample(unittest.TestCase):
+
+    def setUp(self):
+        self.xs = np.arange(100000)
+        self.ys = np.cumsum(np.random.default_rng(9).normal(size=100000))
+
+    def test_shape_preserved(self):
+        for method in ['minmax', 'lttb']:
+            xs, ys = downsample(self.xs, self.ys, n_points=500, method=method)
+            self.assertLessEqual(len(xs), 500)
+            self.assertTrue(np.all(np.diff(xs) > 0), "Points should stay in order")
+            np.testing.assert_array_equal(ys, self.ys[xs])
+            self.assertEqual((xs[0], xs[-1]), (0, 99999), "First and last points should be kept")
+
+        xs, ys = downsample(self.xs, self.ys, n_points=500, method='minmax')
+        self.assertEqual((ys.min(), ys.max()), (self.ys.min(), self.ys.max()), "Extremes should be kept")
+
+    def test_short_series(self):
+        xs, ys = downsample(self.xs[:50], self.ys[:50], n_points=500)
+        np.testing.assert_array_equal(ys, self.ys[:50])
+        self.assertRaises(ValueError, downsample, self.xs, self.ys, 500, method='every_nth')
+
+
+class TestPlots(unittest.TestCase):
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_points_bounded_by_width(self):
+        figure = plt.figure()
+        width = int(figure.get_figwidth() * figure.dpi)
+        plot_time_series_with_forecast(np.arange(10 ** 6, dtype=float), np.arange(10 ** 5, dtype=float))
+        original, forecast = plt.gca().lines
+        self.assertLessEqual(len(original.get_xdata()), width)
+        self.assertEqual((forecast.get_xdata()[0], forecast.get_xdata()[-1]), (900000, 999999))
+
+    def test_render_many(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, '{}.png'.format(i)) for i in range(3)]
+            charts = [(plot_balance, {'data': np.arange(1000.0) * i, 'path': path}) for i, path in enumerate(paths)]
+            self.assertEqual(render_many(charts, max_workers=2), paths)
+            self.assertTrue(all(os.path.getsize(path) > 0 for path in paths))
+        self.assertRaises(ValueError, render_many, [(plot_balance, {'data': [1.0, 2.0]})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,15 @@
+import time
+
+"""
+Calls fn() repeat times and returns the best wall-clock time in seconds
+together with the value returned by the last call
+"""
+
+
+def best_of(fn, repeat=3):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
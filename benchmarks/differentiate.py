@@ -0,0 +1,53 @@
+import numpy as np
+
+from benchmarks import best_of
+from benchmarks.synthetic import random_walk
+from utils.general import differentiate, inv_differentiate
+
+"""
+Times differentiate() and inv_differentiate() against the pandas / element by element
+implementations they replaced, over a 10^6 long series
+
+    python3 -m benchmarks.differentiate
+"""
+
+
+def pandas_differentiate(data, order='1'):
+    if order == 'return-price':
+        return (data.diff() / data.shift(periods=1)).fillna(0)
+    diff_data = data.diff().fillna(0)
+    for _ in range(int(order) - 1):
+        diff_data = diff_data.drop(diff_data.index[0]).diff().fillna(0)
+    return diff_data
+
+
+def loop_inv_differentiate(predictions, order, initial_val):
+    inv_diff_predictions = [initial_val + predictions[0]] if order == '1' else [predictions[0] * initial_val + initial_val]
+    for i in range(len(predictions) - 1):
+        if order == '1':
+            inv_diff_predictions.append(predictions[i + 1] + inv_diff_predictions[i])
+        else:
+            inv_diff_predictions.append(predictions[i + 1] * inv_diff_predictions[i] + inv_diff_predictions[i])
+    return np.array(inv_diff_predictions)
+
+
+def main(n=1000000):
+    series = random_walk(n, start=1000.0)
+    print('{:<36} {:>12} {:>12} {:>9}'.format('n={}'.format(n), 'before (s)', 'after (s)', 'speedup'))
+
+    for order in ['1', '3', 'return-price']:
+        before, _ = best_of(lambda: pandas_differentiate(series, order=order))
+        after, _ = best_of(lambda: differentiate(series, order=order))
+        print('{:<36} {:>12.4f} {:>12.4f} {:>9.1f}'.format('differentiate order={}'.format(order), before, after,
+                                                         before / after))
+
+    predictions = differentiate(series, order='return-price').to_numpy()
+    for order in ['1', 'return-price']:
+        before, _ = best_of(lambda: loop_inv_differentiate(predictions, order, 1000.0), repeat=1)
+        after, _ = best_of(lambda: inv_differentiate(predictions, order, 1000.0))
+        print('{:<36} {:>12.4f} {:>12.4f} {:>9.1f}'.format('inv_differentiate order={}'.format(order), before, after,
+                                                         before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks import best_of
+from benchmarks.synthetic import random_walk
+from core.functions import forecast
+from methods.lr import LinearRegression
+from utils.general import PreparedData, training_data_for_t
+
+"""
+Compares the walk-forward forecast with a full refit at every time step against
+the incremental path of the LinearRegression method, and the cost of getting the
+training window of a time step from pandas objects against PreparedData
+
+    python3 -m benchmarks.forecast
+"""
+
+
+def main(sizes=(1000, 5000, 20000), look_back=14, start_t=5):
+    print('{:>8} {:>12} {:>15} {:>9} {:>12}'.format('n', 'refit (s)', 'incremental (s)', 'speedup', 'max diff'))
+    for n in sizes:
+        y_features = random_walk(n)
+        x_features = pd.DataFrame({'x': np.arange(n, dtype=np.float64)})
+        data = (x_features, y_features)
+
+        refit_time, refit = best_of(lambda: forecast(LinearRegression(), data, start_t, look_back, incremental=False), repeat=1)
+        incremental_time, incremental = best_of(lambda: forecast(LinearRegression(), data, start_t, look_back))
+
+        print('{:>8} {:>12.3f} {:>15.3f} {:>9.1f} {:>12.2e}'.format(n, refit_time, incremental_time,
+                                                                    refit_time / incremental_time,
+                                                                    np.abs(refit - incremental).max()))
+
+
+def windows(n=100000, look_back=14):
+    x_features, y_features = pd.DataFrame({'x': np.ones(n)}), random_walk(n)
+    dataset = PreparedData(x_features, y_features)
+
+    pandas_time, _ = best_of(lambda: [training_data_for_t((x_features, y_features), t, look_back) for t in range(n)])
+    prepared_time, _ = best_of(lambda: [training_data_for_t((dataset.x, dataset.y), t, look_back) for t in range(n)])
+    print('training window per step: {:.2f}us pandas, {:.2f}us PreparedData'.format(pandas_time / n * 1e6,
+                                                                                  prepared_time / n * 1e6))
+
+
+if __name__ == '__main__':
+    main()
+    windows()
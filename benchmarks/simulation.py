@@ -0,0 +1,40 @@
+import numpy as np
+
+from benchmarks import best_of
+from benchmarks.synthetic import random_walk
+from core.simulation import simulate_trades_continuous, simulate_trades_vectorized, sweep_thresholds
+
+"""
+Compares the loop based simulate_trades_continuous() against simulate_trades_vectorized(),
+and a loop of vectorized simulations against sweep_thresholds()
+
+    python3 -m benchmarks.simulation
+"""
+
+
+def main(sizes=(1000, 100000, 1000000), threshold=0.5):
+    print('{:>8} {:>10} {:>15} {:>9}'.format('n', 'loop (s)', 'vectorized (s)', 'speedup'))
+    for n in sizes:
+        ground_truth = random_walk(n, start=1000.0).to_numpy()
+        predictions = ground_truth + np.random.default_rng(1).normal(scale=5.0, size=n)
+        kwargs = dict(predictions=predictions, ground_truth=ground_truth, threshold=threshold)
+
+        loop_time, _ = best_of(lambda: simulate_trades_continuous(verbose=False, **kwargs), repeat=1)
+        vectorized_time, _ = best_of(lambda: simulate_trades_vectorized(verbose=False, **kwargs))
+        print('{:>8} {:>10.3f} {:>15.4f} {:>9.1f}'.format(n, loop_time, vectorized_time, loop_time / vectorized_time))
+
+
+def sweep(n=100000, n_thresholds=200):
+    ground_truth = random_walk(n, start=1000.0).to_numpy()
+    predictions = ground_truth + np.random.default_rng(1).normal(scale=5.0, size=n)
+    thresholds = np.linspace(0, 2, n_thresholds)
+
+    loop_time, _ = best_of(lambda: [simulate_trades_vectorized(predictions, ground_truth, threshold, verbose=False)
+                                    for threshold in thresholds], repeat=1)
+    sweep_time, _ = best_of(lambda: sweep_thresholds(predictions, ground_truth, thresholds))
+    print('{} thresholds over {} steps: {:.3f}s one by one, {:.3f}s swept'.format(n_thresholds, n, loop_time, sweep_time))
+
+
+if __name__ == '__main__':
+    main()
+    sweep()
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks import best_of
+from benchmarks.synthetic import random_walk
+from core.functions import forecast
+from methods.sma import MovingAverage
+
+"""
+Compares the per-step MovingAverage forecast against the batched cumulative sum path
+
+    python3 -m benchmarks.sma
+"""
+
+
+def main(sizes=(1000, 10000, 1000000), max_looped=10000, look_back=14, start_t=5):
+    print('{:>8} {:>12} {:>12} {:>9}'.format('n', 'looped (s)', 'batched (s)', 'speedup'))
+    for n in sizes:
+        data = (pd.DataFrame({'x': np.ones(n)}), random_walk(n))
+
+        batched_time, _ = best_of(lambda: forecast(MovingAverage(), data, start_t, look_back))
+        if n <= max_looped:
+            looped_time, _ = best_of(lambda: forecast(MovingAverage(), data, start_t, look_back, batched=False), repeat=1)
+            print('{:>8} {:>12.3f} {:>12.4f} {:>9.1f}'.format(n, looped_time, batched_time, looped_time / batched_time))
+        else:
+            print('{:>8} {:>12} {:>12.4f} {:>9}'.format(n, '-', batched_time, '-'))
+
+
+if __name__ == '__main__':
+    main()
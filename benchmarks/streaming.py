@@ -0,0 +1,50 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import random_walk
+from core.streaming import StreamingPipeline
+from methods.lr import LinearRegression
+from methods.sma import MovingAverage
+
+"""
+Measures the per-bar latency of the StreamingPipeline, and checks that its memory use
+does not grow with the length of the stream
+
+    python3 -m benchmarks.streaming
+"""
+
+
+def latencies(method, n, look_back=14, threshold=0.5):
+    closes = random_walk(n, start=1000.0).to_numpy()
+    pipeline = StreamingPipeline(method, look_back=look_back, threshold=threshold)
+
+    timings = np.empty(n)
+    for t, close in enumerate(closes):
+        started = time.perf_counter()
+        pipeline.update(t, close)
+        timings[t] = time.perf_counter() - started
+    return timings
+
+
+def main(n=20000):
+    print('{:<18} {:>10} {:>10} {:>10}'.format('method', 'mean (us)', 'p50 (us)', 'p99 (us)'))
+    for name, method, bars in [('MovingAverage', MovingAverage(), n), ('LinearRegression', LinearRegression(), n // 10)]:
+        timings = latencies(method, bars) * 1e6
+        print('{:<18} {:>10.1f} {:>10.1f} {:>10.1f}'.format(name, timings.mean(), np.percentile(timings, 50),
+                                                            np.percentile(timings, 99)))
+
+    for bars in [n // 10, n]:
+        closes = random_walk(bars).to_numpy().tolist()
+        pipeline = StreamingPipeline(MovingAverage(), look_back=14)
+        tracemalloc.start()
+        for t, close in enumerate(closes):
+            pipeline.update(t, close)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('peak memory over {} bars: {:.1f} KiB'.format(bars, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
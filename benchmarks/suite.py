@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import best_of
+from benchmarks.synthetic import GENERATORS, ticker_frame, write_ticker_csv
+
+"""
+Benchmark suite timing every stage of the pipeline on synthetic data, from 10^3 to 10^6
+bars, and comparing the results against a stored baseline:
+
+    python3 -m benchmarks.suite
+    python3 -m benchmarks.suite --sizes 1000 10000 --stages forecast simulate
+    python3 -m benchmarks.suite --save-baseline
+
+For every stage and size, the best of a few runs is reported as seconds and throughput
+(bars per second), along with the peak memory allocated during one more (traced) run.
+A stage is a regression when it is slower than the baseline by more than the threshold.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+"""
+Stages by name, each with the largest size it runs at (refitting methods are too slow
+for long series) and a setup function that takes the synthetic prices and returns the
+function to time
+"""
+STAGES = {}
+
+
+def stage(name, max_n=10 ** 6):
+    def register(setup):
+        STAGES[name] = (setup, max_n)
+        return setup
+    return register
+
+
+@stage('import.sma', max_n=10 ** 3)
+def _import_sma(prices):
+    return _import_run('sma')
+
+
+@stage('import.lr', max_n=10 ** 3)
+def _import_lr(prices):
+    return _import_run('lr')
+
+
+@stage('import.svm', max_n=10 ** 3)
+def _import_svm(prices):
+    return _import_run('svm')
+
+
+@stage('load.csv')
+def _load_csv(prices):
+    from loaders.alphavantage import get_ticker_data
+    data_dir = _ticker_store(prices)
+    return lambda: get_ticker_data('SYN', interval='5min', data_dir=data_dir, use_cache=False)
+
+
+@stage('load.cached')
+def _load_cached(prices):
+    from loaders.alphavantage import get_ticker_data
+    from loaders.cache import clear_memory_cache
+    data_dir = _ticker_store(prices)
+    get_ticker_data('SYN', interval='5min', data_dir=data_dir)
+
+    def load():
+        clear_memory_cache()
+        return get_ticker_data('SYN', interval='5min', data_dir=data_dir, read_only=True)
+    return load
+
+
+@stage('load.resample')
+def _load_resample(prices):
+    from loaders.resample import get_resampled_data
+    data_dir = _ticker_store(prices)
+    return lambda: get_resampled_data('SYN', interval='60min', data_dir=data_dir, use_cache=False)
+
+
+@stage('resample')
+def _resample(prices):
+    from loaders.resample import resample_bars
+    bars = {'date': ticker_frame(prices)['date'].to_numpy(), 'close': np.asarray(prices, dtype=np.float64)}
+    return lambda: resample_bars(bars, '60min')
+
+
+@stage('prepare.ticker_sma')
+def _prepare_sma(prices):
+    from preparers import ticker_sma
+    raw_data = ticker_frame(prices)
+    return lambda: ticker_sma(raw_data=raw_data)
+
+
+@stage('prepare.ticker_svm')
+def _prepare_svm(prices):
+    from preparers import ticker_svm
+    raw_data = ticker_frame(prices)
+    return lambda: ticker_svm(raw_data=raw_data)
+
+
+@stage('differentiate')
+def _differentiate(prices):
+    from utils.general import differentiate
+    return lambda: differentiate(prices, order='1')
+
+
+@stage('inv_differentiate')
+def _inv_differentiate(prices):
+    from utils.general import differentiate, inv_differentiate
+    diff = differentiate(prices, order='1').to_numpy()
+    return lambda: inv_differentiate(diff, order='1', initial_val=prices[0])
+
+
+@stage('forecast.sma')
+def _forecast_sma(prices):
+    from methods.sma import MovingAverage
+    return _forecast(MovingAverage, prices)
+
+
+@stage('forecast.lr', max_n=10 ** 5)
+def _forecast_lr(prices):
+    from methods.lr import LinearRegression
+    return _forecast(LinearRegression, prices)
+
+
+@stage('forecast.svm', max_n=10 ** 3)
+def _forecast_svm(prices):
+    from methods.svm import SVM
+    return _forecast(SVM, prices)
+
+
+@stage('forecast.svm_sgd', max_n=10 ** 4)
+def _forecast_svm_sgd(prices):
+    from methods.svm import SVM
+    return _forecast(lambda: SVM(backend='sgd'), prices)
+
+
+@stage('outofcore.forecast_sma')
+def _outofcore_forecast_sma(prices):
+    from core.outofcore import forecast_sma_chunked, write_series
+    data_dir = _scratch_dir()
+    values = write_series(os.path.join(data_dir, 'prices.bin'), [prices.to_numpy()])
+    return lambda: forecast_sma_chunked(values, os.path.join(data_dir, 'forecast.bin'), start_t=5, look_back=14,
+                                        chunk_size=2 ** 16)
+
+
+@stage('outofcore.simulate')
+def _outofcore_simulate(prices):
+    from core.outofcore import write_series
+    from core.simulation import simulate_trades_chunked
+    data_dir = _scratch_dir()
+    values = write_series(os.path.join(data_dir, 'prices.bin'), [prices.to_numpy()])
+    predictions = write_series(os.path.join(data_dir, 'predictions.bin'), [_noisy_predictions(prices)])
+    return lambda: simulate_trades_chunked(predictions, values, os.path.join(data_dir, 'balances.bin'), threshold=0.5,
+                                           chunk_size=2 ** 16, verbose=False)
+
+
+@stage('simulate.loop', max_n=10 ** 5)
+def _simulate_loop(prices):
+    from core.simulation import simulate_trades_continuous
+    predictions = _noisy_predictions(prices)
+
+    return lambda: simulate_trades_continuous(predictions, prices.to_numpy(), threshold=0.5, verbose=False)
+
+
+@stage('simulate.vectorized')
+def _simulate_vectorized(prices):
+    from core.simulation import simulate_trades_vectorized
+    predictions = _noisy_predictions(prices)
+    return lambda: simulate_trades_vectorized(predictions, prices.to_numpy(), threshold=0.5, verbose=False)
+
+
+@stage('simulate.portfolio', max_n=10 ** 5)
+def _simulate_portfolio(prices):
+    from core.simulation import simulate_portfolio
+    # 10 assets, the same series scaled differently, throughput is in bars per asset
+    ground_truth = np.outer(prices.to_numpy(), np.linspace(0.5, 2.0, 10))
+    predictions = ground_truth + np.random.default_rng(1).normal(scale=prices.std() * 0.01, size=ground_truth.shape)
+    return lambda: simulate_portfolio(predictions, ground_truth, threshold=0.5, sizing='notional', size=100,
+                                      capital=500, verbose=False)
+
+
+def _forecast(method, prices):
+    from core.functions import forecast
+    data = (pd.DataFrame({'x': np.ones(len(prices))}), prices)
+    return lambda: forecast(method(), data, start_t=5, look_back=14)
+
+
+def _import_run(method):
+    # a fresh interpreter importing everything `python3 -m timeseries run --method {method}` does
+    code = 'import timeseries.cli, core.functions, core.runner, core.simulation, loaders.alphavantage, preparers, ' \
+           'methods.{}'.format(method)
+    return lambda: subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+
+
+def _noisy_predictions(prices):
+    return prices.to_numpy() + np.random.default_rng(1).normal(scale=prices.std() * 0.01, size=len(prices))
+
+
+_stores = []
+
+
+def _scratch_dir():
+    data_dir = tempfile.mkdtemp()
+    _stores.append(data_dir)
+    return data_dir
+
+
+def _ticker_store(prices):
+    data_dir = _scratch_dir()
+    os.makedirs(os.path.join(data_dir, '5min'))
+    write_ticker_csv(os.path.join(data_dir, '5min', '5min_SYN.csv'), prices)
+    return data_dir
+
+
+"""
+Runs the stages whose name starts with one of the prefixes given (all by default)
+at every size
+
+Returns:
+    results (dict(str, dict)): Measurements keyed by '{stage}@{size}'
+"""
+
+
+def run(sizes=SIZES, stages=None, series='random_walk', repeat=3, memory=True, verbose=True):
+    results = {}
+    names = [name for name in STAGES if not stages or any(name.startswith(prefix) for prefix in stages)]
+    try:
+        for n in sizes:
+            prices = GENERATORS[series](n)
+            for name in names:
+                setup, max_n = STAGES[name]
+                if n > max_n:
+                    continue
+
+                fn = setup(prices)
+                seconds, _ = best_of(fn, repeat=repeat if n < 10 ** 6 else 1)
+                result = {'seconds': seconds, 'throughput': n / seconds}
+                if memory:
+                    tracemalloc.start()
+                    fn()
+                    result['peak_mib'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                    tracemalloc.stop()
+
+                results['{}@{}'.format(name, n)] = result
+                if verbose:
+                    print(_format_row(name, n, result))
+    finally:
+        for data_dir in _stores:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        _stores.clear()
+    return results
+
+
+"""
+Compares results against a baseline, and returns the ones that are slower by more
+than the threshold (e.g. 0.25 for 25%) as a list of (key, baseline seconds, seconds).
+Slowdowns under min_seconds are timer noise and are ignored
+"""
+
+
+def compare(results, baseline, threshold=0.25, min_seconds=1e-3):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        seconds, baseline_seconds = result['seconds'], baseline[key]['seconds']
+        if seconds > baseline_seconds * (1 + threshold) and seconds - baseline_seconds > min_seconds:
+            regressions.append((key, baseline_seconds, seconds))
+    return regressions
+
+
+def _format_row(name, n, result):
+    return '{:<22} {:>9} {:>11.4f} {:>14.0f} {:>10}'.format(
+        name, n, result['seconds'], result['throughput'],
+        '{:.1f}'.format(result['peak_mib']) if 'peak_mib' in result else '-')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Time every stage of the pipeline on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--stages', nargs='+', help='only run stages starting with these names')
+    parser.add_argument('--series', choices=sorted(GENERATORS), default='random_walk')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip measuring peak memory')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown against the baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args(args)
+
+    print('{:<22} {:>9} {:>11} {:>14} {:>10}'.format('stage', 'n', 'seconds', 'bars / s', 'peak MiB'))
+    results = run(sizes=args.sizes, stages=args.stages, series=args.series, repeat=args.repeat,
+                  memory=not args.no_memory)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print('Baseline saved to {}'.format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline at {}, run with --save-baseline to create one'.format(args.baseline))
+        return 0
+
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), threshold=args.threshold)
+    for key, baseline_seconds, seconds in regressions:
+        print('REGRESSION {}: {:.4f}s -> {:.4f}s ({:+.0%})'.format(key, baseline_seconds, seconds,
+                                                                    seconds / baseline_seconds - 1))
+    print('{} regression(s) above {:.0%}'.format(len(regressions), args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import numpy as np
+
+from benchmarks import best_of
+from benchmarks.synthetic import GENERATORS, ticker_frame
+from core.functions import forecast
+from methods.svm import SVM
+from preparers import ticker_svm
+
+"""
+Compares the accuracy and speed of the SVM backends: the libsvm SVR fitted from scratch at
+every time step, the 'sgd' backend warm-started along the walk-forward, and the 'sgd'
+backend fitted from scratch. Accuracy is the mean absolute error of the predicted one step
+changes, and the agreement with libsvm is the mean absolute difference of those changes
+
+    python3 -m benchmarks.svm
+"""
+
+
+def main(n=1500, look_backs=(30, 250, 1000), series='random_walk', start_t=5):
+    x_features, y_features = ticker_svm(raw_data=ticker_frame(GENERATORS[series](n)))
+    changes = np.diff(y_features.to_numpy())[start_t:]
+    runs = [('libsvm', SVM, {}), ('sgd warm', lambda: SVM(backend='sgd'), {}),
+            ('sgd cold', lambda: SVM(backend='sgd'), {'incremental': False})]
+
+    print('{:>9} {:>10} {:>10} {:>10} {:>14}'.format('look back', 'backend', 'seconds', 'step MAE', 'vs libsvm'))
+    for look_back in look_backs:
+        reference = None
+        for name, method, options in runs:
+            seconds, predictions = best_of(lambda: forecast(method(), (x_features, y_features), start_t, look_back,
+                                                            **options), repeat=1)
+            predicted_changes = np.diff(predictions)[start_t:]
+            reference = predicted_changes if reference is None else reference
+            print('{:>9} {:>10} {:>10.2f} {:>10.4f} {:>14.4f}'.format(
+                look_back, name, seconds, np.abs(predicted_changes - changes).mean(),
+                np.abs(predicted_changes - reference).mean()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+"""
+Deterministic synthetic price series, so that the package can be timed offline
+without the AlphaVantage CSV files. Every generator takes a seed and returns the
+same series for the same arguments.
+"""
+
+
+"""
+Random walk of closing prices with normally distributed steps
+
+Parameters:
+    n (int): Number of time steps
+    seed (int): Seed for the random number generator
+        (default is 0)
+    start (float): First price of the walk
+        (default is 100.0)
+
+Returns:
+    (pd.Series): Random walk of length n
+"""
+
+
+def random_walk(n, seed=0, start=100.0):
+    steps = np.random.default_rng(seed).normal(0.0, 1.0, size=n)
+    steps[0] = 0.0
+    return pd.Series(start + np.cumsum(steps))
+
+
+"""
+Geometric Brownian motion, i.e. prices with log-normally distributed returns
+
+Parameters:
+    n (int): Number of time steps
+    mu (float): Drift per time step
+        (default is 0.0002)
+    sigma (float): Volatility per time step
+        (default is 0.01)
+    seed (int): Seed for the random number generator
+        (default is 0)
+    start (float): First price
+        (default is 100.0)
+
+Returns:
+    (pd.Series): Prices of length n
+"""
+
+
+def gbm(n, mu=0.0002, sigma=0.01, seed=0, start=100.0):
+    log_returns = np.random.default_rng(seed).normal(mu - sigma ** 2 / 2, sigma, size=n)
+    log_returns[0] = 0.0
+    return pd.Series(start * np.exp(np.cumsum(log_returns)))
+
+
+"""
+Geometric Brownian motion that switches between market regimes, e.g. a calm bull
+market and a volatile bear market, following a Markov chain
+
+Parameters:
+    n (int): Number of time steps
+    regimes (list((float, float))): (mu, sigma) of every regime
+        (default is a calm rising and a volatile falling regime)
+    switch_probability (float): Probability of leaving the current regime at every step
+        (default is 0.01)
+    seed (int): Seed for the random number generator
+        (default is 0)
+    start (float): First price
+        (default is 100.0)
+
+Returns:
+    (pd.Series): Prices of length n
+"""
+
+
+def regime_switching(n, regimes=((0.0005, 0.008), (-0.0005, 0.02)), switch_probability=0.01, seed=0, start=100.0):
+    rng = np.random.default_rng(seed)
+    regimes = np.asarray(regimes)
+
+    # the regime changes at every switch to one of the other regimes
+    switches = rng.random(n) < switch_probability
+    offsets = rng.integers(1, len(regimes), size=n) * switches
+    regime = np.cumsum(offsets) % len(regimes)
+
+    mu, sigma = regimes[regime, 0], regimes[regime, 1]
+    log_returns = rng.normal(0.0, 1.0, size=n) * sigma + (mu - sigma ** 2 / 2)
+    log_returns[0] = 0.0
+    return pd.Series(start * np.exp(np.cumsum(log_returns)))
+
+
+"""
+Series generators by name
+"""
+GENERATORS = {'random_walk': random_walk, 'gbm': gbm, 'regime_switching': regime_switching}
+
+
+"""
+Wraps synthetic prices in the 'date' / 'close' DataFrame returned by get_ticker_data(),
+with one bar every 5 minutes
+"""
+
+
+def ticker_frame(prices, start='2000-01-03 09:30:00', freq='5min'):
+    return pd.DataFrame({'date': pd.date_range(start, periods=len(prices), freq=freq),
+                         'close': np.asarray(prices, dtype=np.float64)})
+
+
+"""
+Writes synthetic prices to a CSV file in the AlphaVantage format, newest bar first
+"""
+
+
+def write_ticker_csv(path, prices, start='2000-01-03 09:30:00', freq='5min'):
+    frame = ticker_frame(prices, start=start, freq=freq).iloc[::-1]
+    close = frame['close'].to_numpy()
+    pd.DataFrame({'timestamp': frame['date'].dt.strftime('%Y-%m-%d %H:%M:%S'), 'open': close, 'high': close,
+                  'low': close, 'close': close, 'volume': 1000}).to_csv(path, index=False)
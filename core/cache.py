@@ -0,0 +1,158 @@
+import os
+import hashlib
+
+import numpy as np
+
+from utils.caching import LRUCache, save_array, ignore_cache_errors
+
+"""
+Default location of the forecast cache
+"""
+FORECAST_CACHE_DIR = os.path.join('.cache', 'forecasts')
+
+"""
+Default size limits of the forecast cache, on disk (bytes) and in memory (entries)
+"""
+MAX_BYTES = 1024 * 2 ** 20
+MEMORY_CACHE_SIZE = 32
+
+
+"""
+Computes the key that identifies a forecast: a hash of the x / y data contents, the
+method class and its params() and the forecast() arguments that change the predictions.
+Data with the same values gives the same key, no matter the container (DataFrame,
+Series or np.ndarray) it is passed in.
+
+Returns:
+    key (str): Hex digest
+"""
+
+
+def forecast_key(method, data, start_t, look_back, diff_order='1', **options):
+    digest = hashlib.blake2b(digest_size=20)
+    for values in data:
+        array = np.ascontiguousarray(values, dtype=np.float64)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.data)
+
+    method_class = type(method)
+    description = [method_class.__module__, method_class.__qualname__, sorted(method.params().items()),
+                   start_t, look_back, str(diff_order), sorted(options.items())]
+    digest.update(repr(description).encode())
+    return digest.hexdigest()
+
+
+"""
+Persistent cache of forecast predictions keyed by forecast_key().
+
+Predictions are stored as .npy files in a directory, and the least recently used files
+are removed once they take more than max_bytes together (a hit refreshes the modification
+time of the file, which is used as the access time). The most recently used predictions
+are also kept in memory. Returned arrays are copies, so callers can modify them.
+
+Parameters:
+    directory (str): Directory of the cache files
+        (default is FORECAST_CACHE_DIR)
+    max_bytes (int): Maximum size of the cache files together
+        (default is MAX_BYTES)
+    memory_size (int): Number of predictions also kept in memory, 0 to disable
+        (default is MEMORY_CACHE_SIZE)
+"""
+
+
+class ForecastCache:
+    def __init__(self, directory=FORECAST_CACHE_DIR, max_bytes=MAX_BYTES, memory_size=MEMORY_CACHE_SIZE):
+        self.directory, self.max_bytes, self.memory_size = directory, max_bytes, memory_size
+        self._memory = LRUCache(memory_size)
+
+    """
+    Returns the cached predictions for a key, or None
+    """
+    def get(self, key):
+        predictions = self._memory.get(key)
+        if predictions is not None:
+            self._touch(key)
+            return predictions.copy()
+
+        path = self._path(key)
+        try:
+            predictions = np.load(path)
+        except (OSError, ValueError):
+            return None
+        self._touch(key)
+        self._memory.put(key, predictions)
+        return predictions.copy()
+
+    """
+    Stores the predictions for a key, and evicts the least recently used entries
+    """
+    def put(self, key, predictions):
+        predictions = np.array(predictions)
+        with ignore_cache_errors():
+            os.makedirs(self.directory, exist_ok=True)
+            save_array(self._path(key), predictions)
+            self.evict()
+        self._memory.put(key, predictions)
+
+    """
+    Removes the least recently used files until the cache fits in max_bytes
+
+    Returns:
+        removed (list(str)): Keys of the removed entries
+    """
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as files:
+            for entry in files:
+                if entry.name.endswith('.npy'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.name[:-len('.npy')]))
+
+        total, removed = sum(size for _, size, _ in entries), []
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                continue
+            total -= size
+            removed.append(key)
+
+        for key in removed:
+            self._memory.pop(key)
+        return removed
+
+    """
+    Removes every entry, from memory and from disk
+    """
+    def clear(self):
+        self._memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, '{}.npy'.format(key))
+
+    def _touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+
+_default_cache = None
+
+
+"""
+Returns the ForecastCache used by forecast(cache=True), in FORECAST_CACHE_DIR
+"""
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ForecastCache()
+    return _default_cache
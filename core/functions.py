@@ -1,5 +1,9 @@
-from utils.general import differentiate, inv_differentiate
-import pandas as pd
+from utils.general import differentiate, inv_differentiate, PreparedData
+from utils.profiling import stage
+from core.cache import forecast_key, default_cache
+from core.parallel import walk_forward_parallel
+from core.refit import RefitPolicy, RefitEvery, walk_forward_refit
+import numpy as np
 
 """
 Given a method, data comprising the data points along the "x axis" and "y axis", and a starting point
@@ -7,24 +11,94 @@ in time, makes predictions for every data point into the future using the data f
 
 Additionally, diff_order controls the differentiation order, and look_back controls the default
 amount of time steps that the specific method uses to "look back" and train on.
+
+If the method supports it and batched is True, all predictions are requested at once with
+predict_walk_forward(). Otherwise, if the method supports it and incremental is True, the walk-forward
+uses predict_incremental() so that the method can update its state from one time step to the next
+instead of refitting.
+
+With a refit policy (see core/refit.py, an int k is short for RefitEvery(k)) and a method that supports
+it, the model is only fitted when the policy asks for it, and the last fitted model predicts the time
+steps in between. The number of fits is then given by the policy's n_fits. Other methods ignore it.
+
+With n_jobs > 1 or an executor, the walk-forward time steps are split into chunks that are predicted
+in parallel (see core/parallel.py), giving the same predictions as the serial walk-forward. Batched
+methods ignore n_jobs, as they already predict every time step at once.
+
+With a cache (a ForecastCache from core/cache.py, or True for the default one), the forecast is
+looked up by the contents of the data, the method and its params() and the other arguments first,
+and stored after being computed, so repeated forecasts are loaded instead of refitting the models.
 """
 
 
-def forecast(method, data, start_t, look_back, diff_order='1'):
+def forecast(method, data, start_t, look_back, diff_order='1', incremental=True, batched=True, cache=None,
+             n_jobs=None, executor=None, refit=None):
     x_features, y_features = data[0], data[1]
     assert len(x_features) == len(y_features)
 
-    y_features_diff = differentiate(y_features, order=diff_order)
-    predictions = []
+    # anything but a policy is an interval, validated by RefitEvery (which also rejects booleans)
+    refit = refit if refit is None or isinstance(refit, RefitPolicy) else RefitEvery(refit)
+    use_refit = refit is not None and method.supports_refit
+
+    if cache:
+        cache = default_cache() if cache is True else cache
+        path = ('refit', type(refit).__name__, sorted(refit.params().items())) if use_refit else \
+            'batch' if batched and method.supports_batch else \
+            'incremental' if incremental and method.supports_incremental else 'loop'
+        key = forecast_key(method, data, start_t=start_t, look_back=look_back, diff_order=diff_order, path=path)
+        with stage('forecast.cache'):
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = forecast(method, data, start_t=start_t, look_back=look_back, diff_order=diff_order,
+                          incremental=incremental, batched=batched, n_jobs=n_jobs, executor=executor, refit=refit)
+        cache.put(key, result)
+        return result
+
+    # converted and validated once, the methods then only take views of the arrays
+    with stage('forecast.differentiate', steps=len(y_features)):
+        dataset = PreparedData(x_features, differentiate(y_features, order=diff_order))
+    num_predictions = len(y_features) - start_t
+
+    if use_refit:
+        with stage('forecast.predict', steps=num_predictions):
+            predictions = walk_forward_refit(method, dataset.x, dataset.y, t=start_t, n=num_predictions,
+                                             look_back=look_back, policy=refit)
+    elif batched and method.supports_batch:
+        with stage('forecast.predict', steps=num_predictions):
+            predictions = method.predict_walk_forward(x_data=dataset.x, y_data=dataset.y, t=start_t,
+                                                      n=num_predictions, look_back=look_back)
+    elif (n_jobs or 1) > 1 or executor is not None:
+        use_incremental = incremental and method.supports_incremental
+        with stage('forecast.predict', steps=num_predictions):
+            predictions = walk_forward_parallel(method, dataset.x, dataset.y, t=start_t, n=num_predictions,
+                                                look_back=look_back, incremental=use_incremental, n_jobs=n_jobs,
+                                                executor=executor)
+    else:
+        predictions = []
+
+        use_incremental = incremental and method.supports_incremental
+        predict = method.predict_incremental if use_incremental else method.predict
+        if use_incremental:
+            method.reset()
 
-    for t_i in range(len(y_features) - start_t):
-        current_t = start_t + t_i
-        predictions.append(method.predict(x_data=x_features, y_data=y_features_diff, t=current_t, look_back=look_back))
+        try:
+            with stage('forecast.predict', steps=num_predictions):
+                for t_i in range(num_predictions):
+                    current_t = start_t + t_i
+                    predictions.append(predict(x_data=dataset.x, y_data=dataset.y, t=current_t, look_back=look_back))
+        finally:
+            # the state of the walk-forward is not kept, also when a prediction fails
+            if use_incremental:
+                method.reset()
 
-    inv_predictions = inv_differentiate(predictions, order=diff_order, initial_val=y_features[start_t - 1]).flatten()
+    with stage('forecast.inv_differentiate', steps=num_predictions):
+        inv_predictions = inv_differentiate(predictions, order=diff_order,
+                                            initial_val=y_features[start_t - 1]).flatten()
 
-    result = y_features[:start_t].append(pd.Series(inv_predictions)).reset_index(drop=True)
-    return result.to_numpy()
+    # y_features may be a Series or, e.g. from compact preparers, an np.ndarray
+    return np.concatenate([np.asarray(y_features[:start_t]), inv_predictions])
 
 
 """
@@ -36,7 +110,7 @@ starting from a time point start_t, where:
 
 def forecast_from_t(method, data, start_t, look_back, diff_order='1'):
     x_features, y_features = data[0], data[1]
-    y_features_diff = differentiate(y_features, order=diff_order)
-    num_predictions = (len(y_features_diff) - start_t)
-    predictions = method.predict_next_n(x_data=x_features, y_data=y_features_diff, t=start_t, n=num_predictions, look_back=look_back)
+    dataset = PreparedData(x_features, differentiate(y_features, order=diff_order))
+    num_predictions = (len(dataset) - start_t)
+    predictions = method.predict_next_n(x_data=dataset.x, y_data=dataset.y, t=start_t, n=num_predictions, look_back=look_back)
     return inv_differentiate(predictions, order=diff_order, initial_val=y_features[start_t - 1])
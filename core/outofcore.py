@@ -0,0 +1,228 @@
+import os
+
+import numpy as np
+
+from utils.general import differentiate
+from utils.profiling import stage
+
+"""
+Out-of-core versions of the pipeline for series that do not fit in memory. The series are
+memory-mapped arrays on disk (see open_series() and write_series(), any array works as
+input), processed CHUNK_SIZE values at a time while the state needed at chunk boundaries
+is carried over: the last values for differentiation, the running sums for inverse
+differentiation and for the moving averages, and the open position and balance for the
+simulation (see simulate_trades_chunked() in core/simulation.py). Outputs are written to
+files chunk by chunk and returned memory-mapped, so peak memory is bounded by the chunk
+size and not by the length of the series.
+
+Every value is computed with the same floating point operations in the same order as
+the in-memory functions, so the results are identical to them.
+"""
+
+"""
+Default number of values processed at a time
+"""
+CHUNK_SIZE = 2 ** 20
+
+
+"""
+Memory-maps a series written with write_series() (or any raw array file) read-only
+"""
+
+
+def open_series(path, dtype=np.float64):
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+"""
+Writes chunks of a series one after another to a raw array file
+
+Parameters:
+    path (str): File to write
+    chunks (iterable(np.ndarray)): Consecutive parts of the series
+    dtype (np.dtype): Type the values are stored as
+        (default is np.float64)
+
+Returns:
+    (np.memmap): The series written, memory-mapped read-only
+"""
+
+
+def write_series(path, chunks, dtype=np.float64):
+    with open(path, 'wb') as file:
+        for chunk in chunks:
+            np.asarray(chunk, dtype=dtype).tofile(file)
+    return open_series(path, dtype=dtype)
+
+
+"""
+Chunked differentiate() of a 1D series, see utils/general.py
+
+Returns:
+    (np.memmap): Differentiated series, of the same length and type as differentiate() returns
+"""
+
+
+def differentiate_chunked(values, path, order='1', chunk_size=CHUNK_SIZE):
+    dtype = values.dtype if order == '0' or np.issubdtype(values.dtype, np.floating) else np.float64
+    with stage('outofcore.differentiate', steps=len(values)):
+        return write_series(path, iter_differentiate(values, order=order, chunk_size=chunk_size), dtype=dtype)
+
+
+"""
+Chunked inv_differentiate() of a 1D series of predictions, see utils/general.py
+
+Returns:
+    (np.memmap): Recreated series, the same as inv_differentiate() returns
+"""
+
+
+def inv_differentiate_chunked(predictions, path, order, initial_val, chunk_size=CHUNK_SIZE):
+    chunks = (predictions[start:stop] for start, stop in chunk_bounds(len(predictions), chunk_size))
+    with stage('outofcore.inv_differentiate', steps=len(predictions)):
+        return write_series(path, iter_inv_differentiate(chunks, order=order, initial_val=initial_val))
+
+
+"""
+Chunked forecast() with the MovingAverage method: the values are differentiated, averaged
+and inverse differentiated chunk by chunk in a single pass, without any of the intermediate
+series being stored
+
+Parameters:
+    y_values (np.ndarray): Time series, e.g. memory-mapped with open_series()
+    path (str): File the forecast is written to
+    start_t (int): Time step to start forecasting from
+    look_back (int): Window length of the moving average, -1 to use all previous values
+    diff_order (str): '0', '1' or 'return-price', see differentiate()
+        (default is '1')
+    chunk_size (int): Number of values processed at a time
+        (default is CHUNK_SIZE)
+
+Returns:
+    (np.memmap): The same values as forecast(MovingAverage(), ...) returns
+"""
+
+
+def forecast_sma_chunked(y_values, path, start_t, look_back, diff_order='1', chunk_size=CHUNK_SIZE):
+    differences = iter_differentiate(y_values, order=diff_order, chunk_size=chunk_size)
+    averages = iter_moving_averages(differences, t=start_t, look_back=look_back)
+    predictions = iter_inv_differentiate(averages, order=diff_order, initial_val=y_values[start_t - 1])
+
+    def forecast_chunks():
+        for start, stop in chunk_bounds(start_t, chunk_size):
+            yield y_values[start:stop]
+        yield from predictions
+
+    with stage('outofcore.forecast', steps=len(y_values)):
+        return write_series(path, forecast_chunks())
+
+
+"""
+Splits [0, n) into consecutive (start, stop) ranges of chunk_size values
+"""
+
+
+def chunk_bounds(n, chunk_size):
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+
+"""
+Yields differentiate(values, order) chunk by chunk, where every chunk after the first is
+differentiated together with the values before it that its differences depend on
+"""
+
+
+def iter_differentiate(values, order='1', chunk_size=CHUNK_SIZE):
+    history = 0 if order == '0' else 1 if order == 'return-price' else int(order)
+    for start, stop in chunk_bounds(len(values), chunk_size):
+        if order == '0':
+            yield np.array(values[start:stop])
+            continue
+
+        diff_values = differentiate(np.asarray(values[max(start - history, 0):stop]), order=order)
+        # differences of the values from start on, orders above 1 have none for the first (order - 1)
+        n_values = stop - max(start, history - 1)
+        if n_values > 0:
+            yield diff_values[len(diff_values) - n_values:]
+
+
+"""
+Yields inv_differentiate(predictions, order, initial_val) for consecutive chunks of
+predictions, carrying the last cumulative sum (or product) of every order over
+"""
+
+
+def iter_inv_differentiate(chunks, order, initial_val):
+    if order == '0':
+        for chunk in chunks:
+            yield np.array(chunk)
+        return
+
+    if order == 'return-price':
+        product = None
+        for chunk in chunks:
+            inv_diff_predictions = np.array(chunk, dtype=np.float64)
+            if len(inv_diff_predictions) == 0:
+                continue
+            inv_diff_predictions += 1
+            if product is not None:
+                inv_diff_predictions[0] *= product
+            np.cumprod(inv_diff_predictions, axis=0, out=inv_diff_predictions)
+            product = inv_diff_predictions[-1]
+            inv_diff_predictions *= initial_val
+            yield inv_diff_predictions
+        return
+
+    if not order.isdigit():
+        raise ValueError('Unknown differentiation order {}'.format(order))
+    initial_values = [initial_val] if order == '1' else list(np.atleast_1d(initial_val))
+    if len(initial_values) != int(order):
+        raise ValueError('Order {} requires {} initial values'.format(order, order))
+
+    # the running sum of every order, starting from its initial value
+    sums = list(reversed(initial_values))
+    for chunk in chunks:
+        inv_diff_predictions = np.array(chunk, dtype=np.float64)
+        if len(inv_diff_predictions) == 0:
+            continue
+        for level in range(len(sums)):
+            inv_diff_predictions[0] += sums[level]
+            np.cumsum(inv_diff_predictions, axis=0, out=inv_diff_predictions)
+            sums[level] = inv_diff_predictions[-1]
+        yield inv_diff_predictions
+
+
+"""
+Yields moving_averages(y_data, t, len(y_data) - t, look_back) of methods/sma.py for
+consecutive chunks of y_data, continuing its cumulative sum from chunk to chunk and
+keeping the look_back sums the windows of the next chunk start from
+"""
+
+
+def iter_moving_averages(chunks, t, look_back=-1):
+    # cumulative sums of the values before the global index offset + i, sums[0] is 0
+    tail, offset = np.zeros(1), 0
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if len(chunk) == 0:
+            continue
+        start, stop = offset + len(tail) - 1, offset + len(tail) - 1 + len(chunk)
+
+        sums = np.empty(len(tail) + len(chunk))
+        sums[:len(tail)] = tail
+        sums[len(tail):] = chunk
+        sums[len(tail)] += tail[-1]
+        np.cumsum(sums[len(tail):], out=sums[len(tail):])
+
+        steps = np.arange(max(t, start), stop)
+        expanding = np.full(len(steps), True) if look_back == -1 else steps < look_back
+        starts = np.where(expanding, 0, steps - look_back)
+        stops = np.where(expanding, steps, steps + 1)
+        # sums[0] is 0, which may not be kept in the tail anymore
+        start_sums = np.where(starts == 0, 0.0, sums[np.maximum(starts - offset, 0)])
+        yield (sums[stops - offset] - start_sums) / (stops - starts)
+
+        keep = 1 if look_back == -1 else look_back + 1
+        tail, offset = sums[-keep:].copy(), offset + max(len(sums) - keep, 0)
@@ -0,0 +1,125 @@
+import os
+import copy
+import math
+from multiprocessing import shared_memory
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.profiling import active_recorder, recording
+
+"""
+Number of chunks per worker, more chunks than workers evens out chunks that take longer
+(e.g. later time steps with longer expanding windows)
+"""
+CHUNKS_PER_WORKER = 4
+
+
+"""
+Runs the walk-forward of forecast() for every time step in [t, t+N) over a pool of workers.
+
+The time range is split into consecutive chunks, each predicted by its own copy of the
+method in a worker, and the predictions are put back in order. The copies are made for
+every executor, so methods that keep walk-forward state can also run on threads. The
+arrays are placed in shared memory once and every worker maps them, instead of pickling
+the data for every chunk.
+
+Predictions are bit-identical to the serial walk-forward: predict() only depends on the
+data, and for the incremental walk-forward the chunk boundaries are multiples of the
+method's chunk_alignment(), i.e. time steps where it rebuilds its state anyway.
+
+Parameters:
+    method (Method): Forecasting method, copied for every chunk
+    x_data (np.ndarray): 2D features, as given by PreparedData
+    y_data (np.ndarray): 1D values, as given by PreparedData
+    t (int): First time step to predict
+    n (int): Number of time steps to predict
+    look_back (int): See forecast()
+    incremental (bool): Use predict_incremental() instead of predict()
+    n_jobs (int): Number of worker processes to start when no executor is given
+        (default is None, the number of CPUs)
+    executor (concurrent.futures.Executor): Executor to submit the chunks to
+        (default is None, a ProcessPoolExecutor with n_jobs workers)
+
+Returns:
+    predictions (list): One prediction per time step, as returned by the method
+"""
+
+
+def walk_forward_parallel(method, x_data, y_data, t, n, look_back, incremental, n_jobs=None, executor=None):
+    n_workers = n_jobs or os.cpu_count()
+    alignment = method.chunk_alignment() if incremental else 1
+    chunks = chunk_bounds(t, t + n, n_chunks=n_workers * CHUNKS_PER_WORKER, alignment=alignment)
+    instrument = active_recorder() is not None
+
+    blocks = [_share(x_data), _share(y_data)]
+    owned = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        arrays = [(block.name, array.shape, array.dtype.str) for block, array in zip(blocks, [x_data, y_data])]
+        # a copy per chunk, thread executors would otherwise share the state of one method
+        futures = [executor.submit(_predict_chunk, copy.deepcopy(method), arrays, start, stop, look_back, incremental,
+                                   instrument)
+                   for start, stop in chunks]
+
+        predictions = []
+        for future in futures:
+            chunk_predictions, stats = future.result()
+            predictions.extend(chunk_predictions)
+            if instrument:
+                active_recorder().merge(stats)
+        return predictions
+    finally:
+        if owned:
+            executor.shutdown()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+"""
+Splits [start, stop) into about n_chunks consecutive (start, stop) ranges, whose inner
+boundaries are multiples of alignment
+"""
+
+
+def chunk_bounds(start, stop, n_chunks, alignment=1):
+    size = max(1, math.ceil((stop - start) / max(1, n_chunks)))
+    size = math.ceil(size / alignment) * alignment
+
+    edges = [start] + list(range((start // size + 1) * size, stop, size)) + [stop]
+    return [(first, last) for first, last in zip(edges[:-1], edges[1:]) if last > first]
+
+
+def _share(array):
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block
+
+
+def _predict_chunk(method, arrays, start, stop, look_back, incremental, instrument):
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in arrays]
+    try:
+        x_data, y_data = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                          for block, (_, shape, dtype) in zip(blocks, arrays)]
+        predict = method.predict_incremental if incremental else method.predict
+
+        with recording() if instrument else nullcontext() as recorder:
+            if incremental:
+                method.reset()
+            try:
+                # copies, the predictions may be views of the shared memory that is closed below
+                predictions = [np.array(predict(x_data=x_data, y_data=y_data, t=t, look_back=look_back))
+                               for t in range(start, stop)]
+            finally:
+                # the state must not keep views of the shared memory either
+                if incremental:
+                    method.reset()
+
+        del x_data, y_data
+        return predictions, recorder.to_dict() if instrument else None
+    finally:
+        for block in blocks:
+            block.close()
+
@@ -0,0 +1,179 @@
+import time
+
+import numpy as np
+
+from utils.profiling import add
+
+"""
+Refit policies for walk-forward forecasts of methods that support separate fitting and
+predicting (RefitMethod in methods/__init__.py), see forecast(refit=...).
+
+Between refits, the last fitted model predicts every time step from the features at that
+step. A policy decides at every time step whether the model is fitted again: it is told
+about every fit with fitted() and about the error of every prediction once the actual
+value is known with observe(). After a forecast, n_fits holds the number of fits.
+"""
+
+
+class RefitPolicy:
+    def __init__(self):
+        self.n_fits = 0
+
+    """
+    Whether the model should be fitted again before predicting time step t, y_data holds
+    the values of the time steps before t
+    """
+    def should_refit(self, t, y_data):
+        return True
+
+    """
+    Called after the model was fitted on the training window for time step t
+    """
+    def fitted(self, t, y_data):
+        self.n_fits += 1
+
+    """
+    Called with the prediction for time step t and the actual value, before predicting t + 1
+    """
+    def observe(self, t, prediction, actual):
+        pass
+
+    """
+    Called before a forecast
+    """
+    def reset(self):
+        self.n_fits = 0
+
+    """
+    Settings that determine the predictions, used in the forecast cache key
+    """
+    def params(self):
+        return {name: value for name, value in vars(self).items() if not name.startswith('_') and name != 'n_fits'}
+
+
+"""
+Refits whenever t is a multiple of k, so the fits happen at the same time steps no matter
+where the forecast starts (the first prediction always fits)
+"""
+
+
+class RefitEvery(RefitPolicy):
+    def __init__(self, k):
+        super().__init__()
+        if isinstance(k, bool) or not isinstance(k, (int, np.integer)) or k < 1:
+            raise ValueError('Refit interval must be a positive integer, got {!r}'.format(k))
+        self.k = int(k)
+
+    def should_refit(self, t, y_data):
+        return t % self.k == 0
+
+
+"""
+Refits when more than the given number of seconds passed since the last fit, i.e. spends
+about one fit per interval of wall-clock time whatever the cost of a fit. Which time steps
+are refitted depends on the speed of the machine, so forecasts are not reproducible
+"""
+
+
+class RefitBudget(RefitPolicy):
+    def __init__(self, seconds, clock=time.perf_counter):
+        super().__init__()
+        self.seconds = seconds
+        self._clock = clock
+        self._last_fit = None
+
+    def should_refit(self, t, y_data):
+        return self._clock() - self._last_fit >= self.seconds
+
+    def fitted(self, t, y_data):
+        super().fitted(t, y_data)
+        self._last_fit = self._clock()
+
+
+"""
+Refits when the mean absolute error of the last `window` predictions made with the current
+model is above a threshold
+
+Parameters:
+    threshold (float): Mean absolute error that triggers a refit, in units of the
+        (differentiated) values the method predicts
+    window (int): Number of recent predictions the error is averaged over
+        (default is 10)
+"""
+
+
+class RefitOnError(RefitPolicy):
+    def __init__(self, threshold, window=10):
+        super().__init__()
+        self.threshold, self.window = threshold, window
+        self._errors = []
+
+    def should_refit(self, t, y_data):
+        return len(self._errors) > 0 and np.mean(self._errors) > self.threshold
+
+    def fitted(self, t, y_data):
+        super().fitted(t, y_data)
+        self._errors = []
+
+    def observe(self, t, prediction, actual):
+        self._errors.append(abs(float(np.asarray(prediction).reshape(-1)[0]) - actual))
+        del self._errors[:-self.window]
+
+    def reset(self):
+        super().reset()
+        self._errors = []
+
+
+"""
+Refits when the values drift away from the ones the model was fitted on: the mean of the
+last `window` values is compared to the mean and standard deviation of the `window` values
+before the fit, and a shift of more than `threshold` standard deviations triggers a refit
+
+Parameters:
+    threshold (float): Shift of the mean, in standard deviations, that triggers a refit
+    window (int): Number of values the statistics are computed over
+        (default is 20)
+"""
+
+
+class RefitOnDrift(RefitPolicy):
+    def __init__(self, threshold, window=20):
+        super().__init__()
+        self.threshold, self.window = threshold, window
+        self._mean, self._std = 0.0, 0.0
+
+    def should_refit(self, t, y_data):
+        recent = y_data[max(0, t - self.window):t]
+        shift = abs(recent.mean() - self._mean) if len(recent) else 0.0
+        return shift > self.threshold * self._std if self._std > 0 else shift > 0
+
+    def fitted(self, t, y_data):
+        super().fitted(t, y_data)
+        reference = y_data[max(0, t - self.window):t]
+        self._mean = reference.mean() if len(reference) else 0.0
+        self._std = reference.std() if len(reference) else 0.0
+
+
+"""
+Walk-forward of forecast() for every time step in [t, t+N) with a refit policy: the
+method is fitted with Method.fit() when the policy asks for it (and for the first time
+step), and every time step is predicted with Method.predict_with() from the last model
+
+Returns:
+    predictions (list): One prediction per time step, as returned by predict_with()
+"""
+
+
+def walk_forward_refit(method, x_data, y_data, t, n, look_back, policy):
+    policy.reset()
+    model, predictions = None, []
+    for current_t in range(t, t + n):
+        if predictions:
+            policy.observe(current_t - 1, predictions[-1], y_data[current_t - 1])
+        if model is None or policy.should_refit(current_t, y_data):
+            model = method.fit(t=current_t, x_data=x_data, y_data=y_data, look_back=look_back)
+            policy.fitted(current_t, y_data)
+        predictions.append(method.predict_with(model, t=current_t, x_data=x_data))
+
+    add('forecast.refit', fits=policy.n_fits, steps=n)
+    return predictions
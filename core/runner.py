@@ -0,0 +1,235 @@
+import os
+import time
+import importlib
+import itertools
+from collections import OrderedDict
+from contextlib import nullcontext
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.functions import forecast
+from core.simulation import sweep_thresholds
+from core.store import CONFIG_KEYS, data_hash, params_json
+from utils.profiling import recording
+
+"""
+Methods and preparers that can be referred to by name in a grid. They are
+imported when a job first needs them, so workers only load what they use
+"""
+METHODS = {
+    'sma': ('methods.sma', 'MovingAverage'),
+    'lr': ('methods.lr', 'LinearRegression'),
+    'svm': ('methods.svm', 'SVM'),
+}
+PREPARERS = ['ticker_sma', 'ticker_lr', 'ticker_svm', 'ticker_default']
+
+GRID_KEYS = ['symbol', 'preparer', 'method', 'look_back', 'diff_order', 'threshold']
+RESULT_KEYS = GRID_KEYS + ['final_balance', 'n_trades', 'seconds']
+
+"""
+Number of results written to a ResultsStore per transaction
+"""
+STORE_BATCH_SIZE = 256
+
+"""
+Number of (symbol, preparer) pairs whose prepared features a worker keeps
+"""
+PREPARED_CACHE_SIZE = 4
+
+# raw data and the most recently used prepared features of the jobs that run in this process
+_RAW_DATA = {}
+_PREPARED = OrderedDict()
+
+
+"""
+Builds a grid of backtest configurations from every combination of the values given
+
+Returns:
+    grid (list(dict)): Configurations with the keys in GRID_KEYS
+"""
+
+
+def make_grid(symbols, preparers, methods, look_backs, diff_orders=('1',), thresholds=(0,)):
+    return [dict(zip(GRID_KEYS, values))
+            for values in itertools.product(symbols, preparers, methods, look_backs, diff_orders, thresholds)]
+
+
+"""
+Runs every configuration of a grid of backtests over a pool of worker processes and
+yields the results as jobs finish. Configurations that only differ by threshold share
+a single forecast, and their thresholds are simulated together with sweep_thresholds().
+
+Raw data is loaded once per symbol in the parent process and handed to every worker
+when it starts (only for the symbols of the grid). Jobs are submitted grouped by symbol
+and preparer, and each worker keeps the features of the last PREPARED_CACHE_SIZE
+(symbol, preparer) pairs it prepared, so consecutive jobs share them without the cache
+growing with the number of symbols.
+
+Parameters:
+    grid (list(dict)): Configurations with the keys in GRID_KEYS. The preparer can be
+        a name in PREPARERS or a function, the method a name in METHODS or a Method class
+    data (dict(str, pd.DataFrame)): Already loaded data by symbol, any missing symbol is
+        loaded with get_ticker_data()
+        (default is None)
+    interval (str): Interval used when loading data
+        (default is 'daily')
+    start_t (int): Time step to start forecasting from
+        (default is 5)
+    max_workers (int): Number of worker processes
+        (default is the number of CPUs)
+    recorder (Recorder): If given, every job is instrumented and its stats are merged
+        into the recorder as the job finishes, see utils/profiling.py
+        (default is None)
+    store (ResultsStore): If given, configurations already in the store (for the same
+        method params, start_t and data) are skipped, and the results are added to the store in
+        batches of STORE_BATCH_SIZE as jobs finish, see core/store.py
+        (default is None)
+    store_curves (bool): Also store the balance curve of every configuration
+        (default is False)
+
+Returns:
+    (generator(dict)): Result rows with the keys in RESULT_KEYS, for the configurations run
+"""
+
+
+def iter_grid(grid, data=None, interval='daily', start_t=5, max_workers=None, recorder=None, store=None,
+              store_curves=False):
+    symbols = {config['symbol'] for config in grid}
+    raw_data = {symbol: frame for symbol, frame in (data or {}).items() if symbol in symbols}
+    missing = sorted(symbols - set(raw_data))
+    if missing:
+        from loaders.alphavantage import get_ticker_data
+        raw_data.update({symbol: get_ticker_data(symbol, interval=interval) for symbol in missing})
+
+    stored_configs = {}
+    if store is not None:
+        hashes = {symbol: data_hash(raw_data[symbol]) for symbol in symbols}
+        methods = {config['method'] for config in grid}
+        params = {_name(method): params_json(_resolve_method(method)()) for method in methods}
+        stored_configs = {_grid_key(config): _store_config(config, params, hashes, start_t) for config in grid}
+        done = store.done(list(stored_configs.values()))
+        grid = [config for config in grid
+                if tuple(stored_configs[_grid_key(config)][key] for key in CONFIG_KEYS) not in done]
+
+    jobs = {}
+    for config in grid:
+        key = tuple(config[name] for name in GRID_KEYS[:-1])
+        jobs.setdefault(key, []).append(config['threshold'])
+    # jobs that use the same prepared features are submitted one after another
+    jobs = sorted(jobs.items(), key=lambda job: (job[0][0], _name(job[0][1])))
+
+    pending = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(raw_data,)) as executor:
+            futures = [executor.submit(_run_job, key, thresholds, start_t, recorder is not None, store_curves)
+                       for key, thresholds in jobs]
+            for future in as_completed(futures):
+                rows, stats = future.result()
+                if recorder is not None:
+                    recorder.merge(stats)
+                for row in rows:
+                    curve = row.pop('curve', None)
+                    if store is not None:
+                        pending.append((dict(row, **stored_configs[_grid_key(row)]), curve))
+                    yield row
+
+                if len(pending) >= STORE_BATCH_SIZE:
+                    _store_results(store, pending, store_curves)
+    finally:
+        # results of the jobs that finished are kept even if the grid does not complete
+        if pending:
+            _store_results(store, pending, store_curves)
+
+
+"""
+Same as iter_grid(), but collects the results into a DataFrame. If a results_path is
+given, every row is also appended to that CSV file as soon as its job finishes
+
+Returns:
+    results (pd.DataFrame): One row per configuration with the columns in RESULT_KEYS
+"""
+
+
+def run_grid(grid, data=None, interval='daily', start_t=5, max_workers=None, results_path=None, recorder=None,
+             store=None, store_curves=False):
+    rows = []
+    for row in iter_grid(grid, data=data, interval=interval, start_t=start_t, max_workers=max_workers,
+                         recorder=recorder, store=store, store_curves=store_curves):
+        if results_path is not None:
+            pd.DataFrame([row], columns=RESULT_KEYS).to_csv(results_path, mode='a', index=False,
+                                                            header=not rows and not os.path.exists(results_path))
+        rows.append(row)
+    return pd.DataFrame(rows, columns=RESULT_KEYS)
+
+
+def _init_worker(raw_data):
+    _RAW_DATA.update(raw_data)
+
+
+def _run_job(key, thresholds, start_t, instrument=False, curves=False):
+    symbol, preparer, method, look_back, diff_order = key
+    started = time.perf_counter()
+
+    with recording() if instrument else nullcontext() as recorder:
+        x_features, y_features = _prepared_features(symbol, preparer)
+        predictions = forecast(method=_resolve_method(method)(), data=(x_features, y_features), start_t=start_t,
+                               look_back=look_back, diff_order=diff_order)
+        results = sweep_thresholds(predictions, y_features.to_numpy(), thresholds, return_curves=curves)
+
+    seconds = time.perf_counter() - started
+    rows = [dict(zip(RESULT_KEYS, [symbol, _name(preparer), _name(method), look_back, diff_order, threshold,
+                                   final_balance, trades, seconds]))
+            for threshold, final_balance, trades in zip(thresholds, results[0], results[1])]
+    if curves:
+        for row, curve in zip(rows, results[2]):
+            row['curve'] = curve
+    return rows, recorder.to_dict() if instrument else None
+
+
+def _store_results(store, pending, curves):
+    rows, run_curves = zip(*pending)
+    store.add_runs(rows, curves=run_curves if curves else None)
+    pending.clear()
+
+
+def _store_config(config, params, hashes, start_t):
+    method = _name(config['method'])
+    return dict(config, preparer=_name(config['preparer']), method=method, params=params[method], start_t=start_t,
+                data_hash=hashes[config['symbol']])
+
+
+def _grid_key(config):
+    return tuple(_name(config[name]) if name in ['preparer', 'method'] else config[name] for name in GRID_KEYS)
+
+
+def _prepared_features(symbol, preparer):
+    key = (symbol, _name(preparer))
+    if key in _PREPARED:
+        _PREPARED.move_to_end(key)
+        return _PREPARED[key]
+
+    _PREPARED[key] = _resolve_preparer(preparer)(raw_data=_RAW_DATA[symbol])
+    while len(_PREPARED) > PREPARED_CACHE_SIZE:
+        _PREPARED.popitem(last=False)
+    return _PREPARED[key]
+
+
+def _resolve_method(method):
+    if isinstance(method, str):
+        module, name = METHODS[method]
+        return getattr(importlib.import_module(module), name)
+    return method
+
+
+def _resolve_preparer(preparer):
+    if isinstance(preparer, str):
+        if preparer not in PREPARERS:
+            raise ValueError('Unknown preparer {}'.format(preparer))
+        return getattr(importlib.import_module('preparers'), preparer)
+    return preparer
+
+
+def _name(value):
+    # functions and classes are named by their module too, so that equally named ones do not collide
+    return value if isinstance(value, str) else '{}.{}'.format(value.__module__, value.__qualname__)
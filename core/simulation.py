@@ -1,6 +1,33 @@
+import os
 import time
+from collections import namedtuple
+import numpy as np
 from core import Position, PositionType
 from utils.general import change_above_threshold
+from utils.profiling import stage, add
+from core.outofcore import CHUNK_SIZE, chunk_bounds, write_series
+
+"""
+Structured record of every trade of a simulation:
+    step: index of the price in ground_truth
+    side: BUY / SHORT when a position is opened, SELL / BUY_BACK when it is liquidated
+    price: price of the trade
+    predicted: prediction the position was opened on, NaN for liquidations
+    balance: balance after the trade
+"""
+TRADE_DTYPE = np.dtype([('step', np.int64), ('side', np.int8), ('price', np.float64), ('predicted', np.float64),
+                        ('balance', np.float64)])
+
+"""
+Sides of trades in the trade log, the sign is the direction of the position
+"""
+BUY, SHORT, SELL, BUY_BACK = 1, -1, 2, -2
+
+"""
+Number of trades buffered before they are written when streaming a trade log to a file
+"""
+TRADE_LOG_BLOCK = 4096
+
 
 """
 Liquidates a given Position and returns the new balance
@@ -13,18 +40,31 @@ def liquidate_position(position, at_price, current_balance, verbose):
     # sell from previous buy
     if position.type == PositionType.BUY:
         updated_balance += (at_price * position.amount)
-        log = 'Actual price is {} | Selling'.format(at_price)
-        print(log) if verbose else None
+        if verbose:
+            print('Actual price is {} | Selling'.format(at_price))
 
     # buy back from previous short
     if position.type == PositionType.SHORT:
         updated_balance -= (at_price * position.amount)
-        log = 'Actual price is {} | Buying back'.format(at_price)
-        print(log) if verbose else None
+        if verbose:
+            print('Actual price is {} | Buying back'.format(at_price))
 
     return updated_balance
 
 
+"""
+Returns the position simulate_trades_continuous() opens at the current price given the
+prediction for the next time step: BUY if the price is predicted to rise, SHORT if it is
+predicted to fall, or None if the predicted change is not above the threshold
+"""
+
+
+def next_position_type(curr_price, next_prediction, threshold):
+    if curr_price == next_prediction or not change_above_threshold(curr_price, next_prediction, threshold=threshold):
+        return None
+    return PositionType.BUY if curr_price < next_prediction else PositionType.SHORT
+
+
 """
 Simulation in format of:
     - If open position -> close by selling or buying back
@@ -32,26 +72,60 @@ Simulation in format of:
     - Repeat
 
 Decisions to buy / sell happen continuously each day
+
+Every trade is written to a preallocated trade log (see TRADE_DTYPE) instead of being
+printed, when verbose the log is formatted with format_trade_log() after the simulation.
+Only trades are logged: steps where the predicted change is not above the threshold are
+not, so the verbose output no longer has a "not taking action" line for each of them
+(their balance is still appended to the balances over time).
+
+Parameters:
+    predictions (np.ndarray): Forecasted values, as given by forecast()
+    ground_truth (np.ndarray): Ground truth values to compare the forecasts to
+    threshold (float): Minimum forecasted percent change (0 - 100) to take an action
+        (default is 0)
+    slowed (bool): Wait 2 seconds after every step
+        (default is False)
+    verbose (bool): Print the trades and the number of trades and final balance
+        (default is True)
+    return_log (bool): Also return the trade log
+        (default is False)
+    log_file (str): File the trade log is streamed to in blocks of TRADE_LOG_BLOCK trades,
+        see read_trade_log()
+        (default is None)
+
+Returns:
+    balance_over_time (list): Balances over time
+    trade_log (np.ndarray): Trades as a TRADE_DTYPE array, memory-mapped from the log
+        file if given, only returned when return_log is True
 """
 
 
-def simulate_trades_continuous(predictions, ground_truth, threshold=0, slowed=False, verbose=True):
+def simulate_trades_continuous(predictions, ground_truth, threshold=0, slowed=False, verbose=True, return_log=False,
+                               log_file=None):
     ground_truth = ground_truth[1:]
 
     # tracking historic data
     balance_over_time = []
+    # every step liquidates and opens at most one position, plus the final liquidation
+    trades = TradeLogWriter(capacity=2 * len(ground_truth) + 1, log_file=log_file) \
+        if verbose or return_log or log_file is not None else None
 
     balance = 0
     position = None
     n_trades = 0
 
+    started = time.perf_counter()
     t = 0
     while t < len(ground_truth):
         curr_price = ground_truth[t]
         next_prediction = predictions[t]
 
         if position is not None:
-            balance = liquidate_position(position, at_price=curr_price, current_balance=balance, verbose=verbose)
+            balance = liquidate_position(position, at_price=curr_price, current_balance=balance, verbose=False)
+            if trades is not None:
+                trades.write(t + 1, SELL if position.type == PositionType.BUY else BUY_BACK, curr_price,
+                             np.nan, balance)
 
             # clear position and update data
             position = None
@@ -59,51 +133,531 @@ def simulate_trades_continuous(predictions, ground_truth, threshold=0, slowed=Fa
             n_trades += 1
             balance_over_time.append(balance)
 
-            print('\nBalance: {}\n'.format(balance)) if verbose else None
-
         if curr_price < next_prediction:
             # check threshold
             if change_above_threshold(curr_price, next_prediction, threshold=threshold):
                 # buy and sell tomorrow
                 position = Position(position_type=PositionType.BUY, amount=1)
                 balance -= (curr_price * position.amount)
-
-                log = 'Current price is {}, Predicting price at t+1 to be {} | Buying one share'.format(curr_price,
-                                                                                                        next_prediction)
-                print(log) if verbose else None
+                if trades is not None:
+                    trades.write(t + 1, BUY, curr_price, next_prediction, balance)
             else:
+                # change not above threshold, not taking action
                 balance_over_time.append(balance)
 
-                log = 'Change not above threshold, not taking action'
-                print(log) if verbose else None
-
         elif curr_price > next_prediction:
             # check threshold
             if change_above_threshold(curr_price, next_prediction, threshold=threshold):
                 # short and buy back tomorrow
                 position = Position(position_type=PositionType.SHORT, amount=1)
                 balance += (curr_price * position.amount)
-
-                log = 'Current price is {}, Predicting price at t+1 to be {} | Shorting one share'.format(curr_price,
-                                                                                                          next_prediction)
-                print(log) if verbose else None
+                if trades is not None:
+                    trades.write(t + 1, SHORT, curr_price, next_prediction, balance)
             else:
+                # change not above threshold, not taking action
                 balance_over_time.append(balance)
 
-                log = 'Change not above threshold, not taking action'
-                print(log) if verbose else None
-
         t = t + 1
         if slowed:
             time.sleep(2)
+    # timed like stage('simulate.loop') would, see utils/profiling.py
+    add('simulate.loop', seconds=time.perf_counter() - started, steps=len(ground_truth))
 
     # a position can be left over, so liquidate to get correct balance amount
     if position:
-        balance = liquidate_position(position, at_price=ground_truth[-1], current_balance=balance, verbose=verbose)
+        balance = liquidate_position(position, at_price=ground_truth[-1], current_balance=balance, verbose=False)
+        if trades is not None:
+            trades.write(len(ground_truth), SELL if position.type == PositionType.BUY else BUY_BACK,
+                         ground_truth[-1], np.nan, balance)
         n_trades += 1
         balance_over_time.append(balance)
 
-    log = 'Simulation done. Executed {} trades, Final Balance: {}'.format(n_trades, balance)
-    print(log)
+    trade_log = trades.close() if trades is not None else None
+    if verbose:
+        print('\n'.join(format_trade_log(trade_log)))
+        print('Simulation done. Executed {} trades, Final Balance: {}'.format(n_trades, balance))
+
+    if return_log:
+        return balance_over_time, trade_log
+    return balance_over_time
+
+
+"""
+Vectorized equivalent of simulate_trades_continuous(), computing the signals, positions
+and balances of the whole simulation with array operations. Returns the same balances
+over time (appended on every liquidation and on every step where no action was taken),
+executes the same number of trades and gives the same trade log.
+
+Parameters:
+    predictions (np.ndarray): Forecasted values, as given by forecast()
+    ground_truth (np.ndarray): Ground truth values to compare the forecasts to
+    threshold (float): Minimum forecasted percent change (0 - 100) to take an action
+        (default is 0)
+    verbose (bool): Print the number of trades and the final balance
+        (default is True)
+    return_log (bool): Also return the trade log, see simulate_trades_continuous()
+        (default is False)
+    log_file (str): File the trade log is written to, see read_trade_log()
+        (default is None)
+
+Returns:
+    balance_over_time (np.ndarray): Balances over time
+    trade_log (np.ndarray): Trades as a TRADE_DTYPE array, memory-mapped from the log
+        file if given, only returned when return_log is True
+"""
+
+
+def simulate_trades_vectorized(predictions, ground_truth, threshold=0, verbose=True, return_log=False, log_file=None):
+    prices, next_predictions = _align_simulation_data(predictions, ground_truth)
+
+    with stage('simulate.vectorized', steps=len(prices)):
+        above = _percent_change(prices, next_predictions) >= threshold
+        signals, no_action = _trade_signals(prices, next_predictions, above)
+        balance_over_time, final_balance = _simulate_signals(signals, no_action, prices)
+
+    trade_log = None
+    if return_log or log_file is not None:
+        trade_log = _trade_log(signals, prices, next_predictions, final_balance)
+        if log_file is not None:
+            # memory-mapped from the file, as simulate_trades_continuous() returns it
+            trade_log.tofile(log_file)
+            trade_log = read_trade_log(log_file)
 
+    n_trades = np.count_nonzero(signals)
+    if verbose:
+        print('Simulation done. Executed {} trades, Final Balance: {}'.format(n_trades,
+                                                                             final_balance if n_trades else 0))
+
+    if return_log:
+        return balance_over_time, trade_log
     return balance_over_time
+
+
+"""
+Out-of-core simulate_trades_vectorized(): the predictions and ground truth are processed
+chunk_size time steps at a time (they can be memory-mapped, see core/outofcore.py), the
+open position and the balance are carried over from chunk to chunk, and the balances over
+time are written to a file. Gives the same balances as the in-memory simulation.
+
+Parameters:
+    predictions (np.ndarray): Forecasted values, as given by forecast()
+    ground_truth (np.ndarray): Ground truth values to compare the forecasts to
+    path (str): File the balances over time are written to
+    threshold (float): Minimum forecasted percent change (0 - 100) to take an action
+        (default is 0)
+    chunk_size (int): Number of time steps simulated at a time
+        (default is CHUNK_SIZE)
+    verbose (bool): Print the number of trades and the final balance
+        (default is True)
+
+Returns:
+    balance_over_time (np.memmap): Balances over time, memory-mapped read-only
+"""
+
+
+def simulate_trades_chunked(predictions, ground_truth, path, threshold=0, chunk_size=CHUNK_SIZE, verbose=True):
+    state = {'balance': 0.0, 'signal': 0, 'price': 0.0, 'n_trades': 0}
+
+    def balance_chunks():
+        for start, stop in chunk_bounds(len(ground_truth) - 1, chunk_size):
+            prices, next_predictions = _align_simulation_data(predictions[start:stop], ground_truth[start:stop + 1])
+            above = _percent_change(prices, next_predictions) >= threshold
+            signals, no_action = _trade_signals(prices, next_predictions, above)
+
+            # the position opened at the end of the previous chunk is liquidated first
+            previous = np.empty_like(signals)
+            previous[0], previous[1:] = state['signal'], signals[:-1]
+            balances = np.empty(2 * len(signals))
+            np.multiply(previous, prices, out=balances[0::2])
+            np.multiply(-signals, prices, out=balances[1::2])
+            balances[0] += state['balance']
+            np.cumsum(balances, out=balances)
+
+            recorded = np.empty(balances.shape, dtype=bool)
+            recorded[0::2], recorded[1::2] = previous != 0, no_action
+            state.update(balance=balances[-1], signal=signals[-1], price=prices[-1],
+                         n_trades=state['n_trades'] + np.count_nonzero(signals))
+            yield balances[recorded]
+
+        # a position can be left over, so liquidate to get correct balance amount
+        if state['signal'] != 0:
+            state['balance'] = state['balance'] + state['signal'] * state['price']
+            yield [state['balance']]
+
+    with stage('simulate.chunked', steps=len(ground_truth) - 1):
+        balance_over_time = write_series(path, balance_chunks())
+
+    if verbose:
+        print('Simulation done. Executed {} trades, Final Balance: {}'.format(
+            state['n_trades'], state['balance'] if state['n_trades'] else 0))
+    return balance_over_time
+
+
+"""
+Collects trades into a preallocated TRADE_DTYPE array. With a log file, only a block of
+TRADE_LOG_BLOCK trades is kept in memory and full blocks are appended to the file
+"""
+
+
+class TradeLogWriter:
+    def __init__(self, capacity, log_file=None):
+        self.log_file = log_file
+        self._file = open(log_file, 'wb') if log_file is not None else None
+        self._records = np.empty(min(capacity, TRADE_LOG_BLOCK) if log_file is not None else capacity,
+                                 dtype=TRADE_DTYPE)
+        self._size = 0
+
+    def write(self, step, side, price, predicted, balance):
+        if self._size == len(self._records):
+            self._flush()
+        self._records[self._size] = (step, side, price, predicted, balance)
+        self._size += 1
+
+    """
+    Writes the buffered trades and returns the whole log
+    """
+    def close(self):
+        if self._file is None:
+            return self._records[:self._size]
+        self._flush()
+        self._file.close()
+        return read_trade_log(self.log_file)
+
+    def _flush(self):
+        self._records[:self._size].tofile(self._file)
+        self._size = 0
+
+
+"""
+Reads a trade log written to a file by a simulation, memory-mapped
+"""
+
+
+def read_trade_log(path):
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=TRADE_DTYPE)
+    return np.memmap(path, dtype=TRADE_DTYPE, mode='r')
+
+
+"""
+Formats a trade log into human readable lines, one per trade followed by the balance
+after every liquidation. Steps without a trade are not in the log, and have no line
+"""
+
+
+def format_trade_log(trade_log):
+    lines = []
+    for step, side, price, predicted, balance in trade_log.tolist():
+        if side == BUY:
+            lines.append('Current price is {}, Predicting price at t+1 to be {} | Buying one share'.format(price,
+                                                                                                         predicted))
+        elif side == SHORT:
+            lines.append('Current price is {}, Predicting price at t+1 to be {} | Shorting one share'.format(price,
+                                                                                                           predicted))
+        else:
+            lines.append('Actual price is {} | {}'.format(price, 'Selling' if side == SELL else 'Buying back'))
+            lines.append('Balance: {}'.format(balance))
+    return lines
+
+
+"""
+Pairs up each ground truth price with the prediction it is compared to in the simulation,
+i.e. ground_truth[t + 1] with predictions[t]
+"""
+
+
+def _align_simulation_data(predictions, ground_truth):
+    prices = np.asarray(ground_truth, dtype=np.float64)[1:]
+    next_predictions = np.asarray(predictions, dtype=np.float64).reshape(-1)[:len(prices)]
+    return prices, next_predictions
+
+
+"""
+Vectorized change_above_threshold() percent change between prices and predictions
+"""
+
+
+def _percent_change(prices, next_predictions):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (np.abs(next_predictions - prices) / prices) * 100.0
+
+
+"""
+Turns threshold decisions into signals: 1 to buy, -1 to short and 0 for no action,
+along with a mask of the steps where the change was not above the threshold. Steps
+where the prediction equals the price take no action and are not part of the mask.
+The above mask can have extra leading dimensions, e.g. one row per threshold
+"""
+
+
+def _trade_signals(prices, next_predictions, above):
+    rising, falling = prices < next_predictions, prices > next_predictions
+    signals = (rising & above).astype(np.int8) - (falling & above).astype(np.int8)
+    no_action = (rising | falling) & ~above
+    return signals, no_action
+
+
+"""
+Replays the balance changes of a simulation over the last axis of signals. Each step
+first liquidates the previous position at the current price, then opens the next one,
+and the balances are accumulated in that same order so they match the loop exactly.
+With record set to False only the final balances are computed.
+
+Returns:
+    balance_over_time (np.ndarray or list(np.ndarray)): Balances recorded on liquidations
+        and no-action steps, one array per leading row when signals has more than one dimension
+    final_balance (np.ndarray): Balance after liquidating the last position
+"""
+
+
+def _simulate_signals(signals, no_action, prices, record=True):
+    balances, previous = _balance_events(signals, prices)
+    final_balance = _last(balances) + _last(signals) * _last(prices)
+    if not record:
+        return None, final_balance
+
+    recorded = np.empty(balances.shape, dtype=bool)
+    recorded[..., 0::2] = previous != 0
+    recorded[..., 1::2] = no_action
+
+    if signals.ndim == 1:
+        balance_over_time = _append_final(balances[recorded], _last(signals), final_balance)
+    else:
+        balance_over_time = [_append_final(row[mask], last, final)
+                             for row, mask, last, final in zip(balances, recorded, _last(signals), final_balance)]
+    return balance_over_time, final_balance
+
+
+"""
+Balances after every liquidation (even positions) and every opening (odd positions) of
+positions over the last axis, where positions are signals or signed amounts and prices
+have the same shape or are shared by every row. Also returns the previous positions
+"""
+
+
+def _balance_events(positions, prices):
+    previous = np.zeros_like(positions)
+    previous[..., 1:] = positions[..., :-1]
+
+    events = np.empty(positions.shape[:-1] + (2 * positions.shape[-1],))
+    np.multiply(previous, prices, out=events[..., 0::2])
+    np.multiply(-positions, prices, out=events[..., 1::2])
+    return np.cumsum(events, axis=-1, out=events), previous
+
+
+"""
+Builds the trade log of simulate_trades_continuous() from the signals of a simulation:
+every step liquidates the previous position, then opens the next one
+"""
+
+
+def _trade_log(signals, prices, next_predictions, final_balance):
+    balances, previous = _balance_events(signals, prices)
+    n = len(signals)
+
+    sides = np.empty(2 * n, dtype=np.int8)
+    sides[0::2], sides[1::2] = 2 * previous, signals
+    predicted = np.full(2 * n, np.nan)
+    predicted[1::2] = next_predictions
+    keep = sides != 0
+
+    final = n > 0 and signals[-1] != 0
+    trade_log = np.empty(np.count_nonzero(keep) + final, dtype=TRADE_DTYPE)
+    trade_log['step'][:len(trade_log) - final] = np.repeat(np.arange(1, n + 1), 2)[keep]
+    trade_log['side'][:len(trade_log) - final] = sides[keep]
+    trade_log['price'][:len(trade_log) - final] = np.repeat(prices, 2)[keep]
+    trade_log['predicted'][:len(trade_log) - final] = predicted[keep]
+    trade_log['balance'][:len(trade_log) - final] = balances[keep]
+    if final:
+        trade_log[-1] = (n, 2 * signals[-1], prices[-1], np.nan, final_balance)
+    return trade_log
+
+
+# values at the last step of the last axis, 0 when there are no steps (e.g. a single price)
+def _last(values):
+    values = np.asarray(values)
+    return values[..., -1] if values.shape[-1] else np.zeros(values.shape[:-1])[()]
+
+
+def _append_final(balance_over_time, last_signal, final_balance):
+    if last_signal == 0:
+        return balance_over_time
+    return np.append(balance_over_time, final_balance)
+
+
+"""
+Runs the simulate_trades_continuous() logic for many thresholds at once. The percent
+changes between prices and predictions are computed once, and the thresholds are
+evaluated as a (K x N) broadcast, processed in chunks of thresholds to bound memory.
+
+Parameters:
+    predictions (np.ndarray): Forecasted values, as given by forecast()
+    ground_truth (np.ndarray): Ground truth values to compare the forecasts to
+    thresholds (list(float)): K thresholds (0 - 100) to simulate
+    return_curves (bool): Also return the balances over time for every threshold
+        (default is False)
+    chunk_size (int): Number of thresholds evaluated together, by default sized to keep
+        the intermediate arrays around 256MB
+        (default is None)
+
+Returns:
+    final_balances (np.ndarray): Final balance for every threshold
+    n_trades (np.ndarray): Number of trades executed for every threshold
+    balance_curves (list(np.ndarray)): Balances over time for every threshold, only
+        returned when return_curves is True
+"""
+
+
+def sweep_thresholds(predictions, ground_truth, thresholds, return_curves=False, chunk_size=None):
+    prices, next_predictions = _align_simulation_data(predictions, ground_truth)
+    change = _percent_change(prices, next_predictions)
+    thresholds = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+
+    if chunk_size is None:
+        # events, cumulative balances and masks take roughly 20 bytes per step
+        chunk_size = max(1, (256 * 2 ** 20) // max(1, 20 * len(prices)))
+
+    final_balances = np.empty(len(thresholds))
+    n_trades = np.empty(len(thresholds), dtype=np.int64)
+    balance_curves = []
+
+    for start in range(0, len(thresholds), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        with stage('simulate.sweep', steps=len(prices), thresholds=len(thresholds[chunk])):
+            above = change >= thresholds[chunk, np.newaxis]
+            signals, no_action = _trade_signals(prices, next_predictions, above)
+
+            curves, final_balances[chunk] = _simulate_signals(signals, no_action, prices, record=return_curves)
+            n_trades[chunk] = np.count_nonzero(signals, axis=1)
+            balance_curves.extend(curves if return_curves else [])
+
+    if return_curves:
+        return final_balances, n_trades, balance_curves
+    return final_balances, n_trades
+
+
+"""
+Position sizing rules of simulate_portfolio():
+    units: size units of the asset per trade (simulate_trades_continuous() is units with size 1)
+    notional: units worth size at the price the position is opened at
+    proportional: size units per percent of predicted change
+"""
+SIZINGS = ['units', 'notional', 'proportional']
+
+"""
+Results of simulate_portfolio():
+    final_balances: (A) final balance of every asset
+    n_trades: (A) number of trades executed for every asset
+    total_curve: (T - 1) balance of the portfolio after the liquidations at every time step
+    balance_curves: (T - 1 x A) balance of every asset after the liquidations at every time
+        step, None unless return_curves is True
+"""
+PortfolioResult = namedtuple('PortfolioResult', ['final_balances', 'n_trades', 'total_curve', 'balance_curves'])
+
+
+"""
+Runs the simulate_trades_continuous() logic for A assets at once, on (T x A) predictions
+and prices aligned in time, with the same threshold decisions per asset. Each step
+liquidates the open positions at the current prices and opens new ones sized by the
+sizing rule, the balances are accumulated with array operations over chunks of assets.
+
+The balance curves hold the balance right after the liquidations of every step, i.e. the
+profit or loss realized so far, which can be added up across assets. With units sizing of
+size 1, the final balance of each asset is the same as simulate_trades_vectorized().
+
+With a capital limit, the positions opened at a time step are scaled down together so
+that their gross value (the sum of |units| x price over the assets) is at most the capital.
+
+Parameters:
+    predictions (np.ndarray or pd.DataFrame): (T x A) forecasted values, a column per asset
+    ground_truth (np.ndarray or pd.DataFrame): (T x A) ground truth prices
+    threshold (float or np.ndarray): Minimum forecasted percent change (0 - 100) to take an
+        action, for all assets or one per asset
+        (default is 0)
+    sizing (str): One of SIZINGS
+        (default is 'units')
+    size (float): Units, notional or units per percent of change, see SIZINGS
+        (default is 1)
+    capital (float): Maximum gross value of the positions opened at a time step
+        (default is None, no limit)
+    return_curves (bool): Also return the (T - 1 x A) balance curves of every asset
+        (default is False)
+    chunk_size (int): Number of assets simulated together, by default sized to keep the
+        intermediate arrays around 256MB
+        (default is None)
+    verbose (bool): Print the number of trades and the final balance
+        (default is True)
+
+Returns:
+    (PortfolioResult): Balances and trades per asset and for the portfolio
+"""
+
+
+def simulate_portfolio(predictions, ground_truth, threshold=0, sizing='units', size=1, capital=None,
+                       return_curves=False, chunk_size=None, verbose=True):
+    if sizing not in SIZINGS:
+        raise ValueError('Unknown sizing {}, expected one of {}'.format(sizing, SIZINGS))
+    predictions, ground_truth = np.asarray(predictions, dtype=np.float64), np.asarray(ground_truth, dtype=np.float64)
+    predictions = predictions[:, np.newaxis] if predictions.ndim == 1 else predictions
+    ground_truth = ground_truth[:, np.newaxis] if ground_truth.ndim == 1 else ground_truth
+    n_steps, n_assets = max(0, len(ground_truth) - 1), ground_truth.shape[1]
+    thresholds = np.broadcast_to(np.asarray(threshold, dtype=np.float64), (n_assets,))
+
+    if chunk_size is None:
+        # prices, predictions, positions, balances and masks take roughly 60 bytes per step
+        chunk_size = max(1, (256 * 2 ** 20) // max(1, 60 * n_steps))
+    chunks = [slice(start, start + chunk_size) for start in range(0, n_assets, chunk_size)]
+
+    scale = None
+    if capital is not None:
+        # the limit applies across assets, so the gross value of every step is needed first
+        gross = np.zeros(n_steps)
+        for chunk in chunks:
+            positions, prices, _ = _portfolio_positions(predictions, ground_truth, chunk, thresholds, sizing, size)
+            gross += np.abs(positions * prices).sum(axis=0)
+        # steps without positions have nothing to scale down
+        scale = np.minimum(1.0, np.divide(capital, gross, out=np.ones(n_steps), where=gross > 0))
+
+    final_balances, n_trades = np.empty(n_assets), np.empty(n_assets, dtype=np.int64)
+    total_curve = np.zeros(n_steps)
+    balance_curves = np.empty((n_steps, n_assets)) if return_curves else None
+
+    with stage('simulate.portfolio', steps=n_steps, assets=n_assets):
+        for chunk in chunks:
+            positions, prices, signals = _portfolio_positions(predictions, ground_truth, chunk, thresholds, sizing,
+                                                              size)
+            positions = positions * scale if scale is not None else positions
+
+            balances, _ = _balance_events(positions, prices)
+            final_balances[chunk] = _last(balances) + _last(positions) * _last(prices)
+            n_trades[chunk] = np.count_nonzero(signals, axis=1)
+
+            liquidated = balances[:, 0::2]
+            total_curve += liquidated.sum(axis=0)
+            if return_curves:
+                balance_curves[:, chunk] = liquidated.T
+
+    log = 'Portfolio simulation done. Executed {} trades over {} assets, Final Balance: {}'.format(
+        n_trades.sum(), n_assets, final_balances.sum())
+    if verbose:
+        print(log)
+
+    return PortfolioResult(final_balances, n_trades, total_curve, balance_curves)
+
+
+# signed position sizes, prices and signals of a chunk of assets, as (assets x steps) arrays
+def _portfolio_positions(predictions, ground_truth, chunk, thresholds, sizing, size):
+    prices = np.ascontiguousarray(ground_truth[1:, chunk].T)
+    next_predictions = np.ascontiguousarray(predictions[:len(ground_truth) - 1, chunk].T)
+
+    change = _percent_change(prices, next_predictions)
+    signals, _ = _trade_signals(prices, next_predictions, change >= thresholds[chunk, np.newaxis])
+
+    if sizing == 'units':
+        units = size
+    elif sizing == 'notional':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            units = np.where(signals != 0, size / prices, 0.0)
+    else:
+        units = np.where(signals != 0, size * change, 0.0)
+    return signals * units, prices, signals
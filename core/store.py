@@ -0,0 +1,226 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+"""
+Columns that identify a backtest run, and the results recorded for it
+"""
+CONFIG_KEYS = ['symbol', 'preparer', 'method', 'params', 'look_back', 'diff_order', 'start_t', 'threshold',
+               'data_hash']
+METRIC_KEYS = ['final_balance', 'n_trades', 'seconds']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    preparer TEXT NOT NULL,
+    method TEXT NOT NULL,
+    params TEXT NOT NULL,
+    look_back INTEGER NOT NULL,
+    diff_order TEXT NOT NULL,
+    start_t INTEGER NOT NULL,
+    threshold REAL NOT NULL,
+    data_hash TEXT NOT NULL,
+    final_balance REAL,
+    n_trades INTEGER,
+    seconds REAL,
+    created REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_config
+    ON runs (symbol, preparer, method, params, look_back, diff_order, start_t, threshold, data_hash);
+CREATE INDEX IF NOT EXISTS runs_best_symbol_final_balance ON runs (symbol, final_balance);
+CREATE INDEX IF NOT EXISTS runs_method ON runs (method, look_back, diff_order, threshold);
+CREATE TABLE IF NOT EXISTS curves (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id) ON DELETE CASCADE,
+    balances BLOB NOT NULL
+);
+'''
+
+
+"""
+Hash of the contents of a data set, recorded with every run so that results computed on
+different data (e.g. after new bars were downloaded) are not mistaken for each other
+
+Returns:
+    (str): Hex digest
+"""
+
+
+def data_hash(data):
+    frame = pd.DataFrame(data)
+    rows = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(frame.columns)).encode())
+    digest.update(np.ascontiguousarray(rows).data)
+    return digest.hexdigest()
+
+
+"""
+The params column of a run: the method's params() as JSON
+"""
+
+
+def params_json(method):
+    return json.dumps(method.params(), sort_keys=True, default=str)
+
+
+"""
+Local store of backtest results in a SQLite database.
+
+Every run is a row of the runs table with its configuration (CONFIG_KEYS, where params
+holds the method's params() as JSON) and results (METRIC_KEYS). A configuration is stored
+once: adding it again replaces its results. The configuration columns are indexed, so
+lookups such as done() and best() stay fast with hundreds of thousands of runs. Balance
+curves are stored as float64 blobs in a separate table that queries over runs never read.
+
+Runs are added in batches, each in a single transaction, see add_runs() and
+core/runner.py which uses the store to skip configurations that were already run.
+
+Parameters:
+    path (str): Database file, ':memory:' for a temporary store
+        (default is 'results.db')
+"""
+
+
+class ResultsStore:
+    def __init__(self, path='results.db'):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        if path != ':memory:':
+            # readers do not block the writer and commits do not wait for every write to reach the disk
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.executescript(SCHEMA)
+
+    """
+    Adds runs in one transaction, replacing the results of configurations already stored
+
+    Parameters:
+        rows (list(dict)): Runs with the keys in CONFIG_KEYS and METRIC_KEYS
+        curves (list(np.ndarray)): Balance curve of every run
+            (default is None, no curves are stored)
+    """
+    def add_runs(self, rows, curves=None):
+        created = time.time()
+        values = [tuple(_sql_value(row[key]) for key in CONFIG_KEYS + METRIC_KEYS) + (created,) for row in rows]
+        insert = 'INSERT INTO runs ({}) VALUES ({}) ON CONFLICT ({}) DO UPDATE SET {}'.format(
+            ', '.join(CONFIG_KEYS + METRIC_KEYS + ['created']), ', '.join('?' * (len(CONFIG_KEYS + METRIC_KEYS) + 1)),
+            ', '.join(CONFIG_KEYS), ', '.join('{0} = excluded.{0}'.format(key) for key in METRIC_KEYS + ['created']))
+
+        with self._connection:
+            if curves is None:
+                self._connection.executemany(insert, values)
+                return
+
+            select = 'SELECT id FROM runs WHERE {}'.format(' AND '.join('{} = ?'.format(key) for key in CONFIG_KEYS))
+            for run, curve in zip(values, curves):
+                self._connection.execute(insert, run)
+                run_id = self._connection.execute(select, run[:len(CONFIG_KEYS)]).fetchone()[0]
+                self._connection.execute('INSERT OR REPLACE INTO curves (run_id, balances) VALUES (?, ?)',
+                                         (run_id, np.ascontiguousarray(curve, dtype=np.float64).tobytes()))
+
+    """
+    Returns the configurations among the ones given that are already stored
+
+    Parameters:
+        configs (list(dict)): Configurations with the keys in CONFIG_KEYS
+
+    Returns:
+        (set(tuple)): Values of CONFIG_KEYS of the stored configurations
+    """
+    def done(self, configs):
+        wanted = {tuple(_sql_value(config[key]) for key in CONFIG_KEYS) for config in configs}
+        if not wanted:
+            return set()
+
+        # the configurations are joined against runs in SQLite, which looks each one up in the
+        # runs_config index instead of reading every stored run
+        with self._connection:
+            self._connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted AS SELECT {} FROM runs WHERE 0'.format(
+                ', '.join(CONFIG_KEYS)))
+            self._connection.executemany('INSERT INTO wanted VALUES ({})'.format(', '.join('?' * len(CONFIG_KEYS))),
+                                         wanted)
+            stored = self._connection.execute('SELECT {} FROM wanted JOIN runs USING ({})'.format(
+                ', '.join('wanted.{}'.format(key) for key in CONFIG_KEYS), ', '.join(CONFIG_KEYS))).fetchall()
+            self._connection.execute('DELETE FROM wanted')
+        return set(stored)
+
+    """
+    Returns the stored runs whose columns equal the values given, e.g. runs(symbol='AMZN')
+
+    Returns:
+        (pd.DataFrame): One row per run, with an id column and the columns of the runs table
+    """
+    def runs(self, **filters):
+        where, values = _where(filters)
+        return pd.read_sql_query('SELECT * FROM runs{} ORDER BY id'.format(where), self._connection, params=values)
+
+    """
+    Returns the run with the highest value of a metric for every group, e.g. the best
+    threshold per symbol with best(['symbol']), or per symbol and method with
+    best(['symbol', 'method']). Filters restrict the runs considered, as for runs().
+    Ties go to the run stored first.
+
+    Every group is looked up in an index on the grouping columns and the metric, which
+    is created by the first call for a grouping (best per symbol has one from the start)
+
+    Returns:
+        (pd.DataFrame): One row per group, with the columns of the runs table
+    """
+    def best(self, group_by=('symbol',), metric='final_balance', **filters):
+        _check_columns(list(group_by) + [metric])
+        where, values = _where(filters)
+        with self._connection:
+            self._connection.execute('CREATE INDEX IF NOT EXISTS runs_best_{} ON runs ({})'.format(
+                '_'.join(list(group_by) + [metric]), ', '.join(list(group_by) + [metric])))
+
+        # the distinct groups come from the index, and the best run of each is the last entry of
+        # its group in the index, instead of reading every run as GROUP BY with MAX() does
+        query = ('SELECT runs.* FROM (SELECT DISTINCT {0} FROM runs{1}) AS groups JOIN runs ON runs.id = ('
+                 'SELECT id FROM runs AS best WHERE {2}{3} ORDER BY {4} DESC, id LIMIT 1) ORDER BY {5}').format(
+            ', '.join(group_by), where, ' AND '.join('best.{0} = groups.{0}'.format(key) for key in group_by),
+            ''.join(' AND best.{} = ?'.format(key) for key in filters), metric,
+            ', '.join('runs.{}'.format(key) for key in group_by))
+        return pd.read_sql_query(query, self._connection, params=values + values)
+
+    """
+    Returns the balance curve stored for a run, or None
+    """
+    def curve(self, run_id):
+        row = self._connection.execute('SELECT balances FROM curves WHERE run_id = ?', (int(run_id),)).fetchone()
+        return np.frombuffer(row[0], dtype=np.float64) if row is not None else None
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _check_columns(columns):
+    for column in columns:
+        if column not in CONFIG_KEYS + METRIC_KEYS:
+            raise ValueError('Unknown run column {}'.format(column))
+
+
+def _where(filters):
+    if not filters:
+        return '', []
+    _check_columns(filters)
+    return ' WHERE ' + ' AND '.join('{} = ?'.format(key) for key in filters), [_sql_value(v) for v in filters.values()]
+
+
+def _sql_value(value):
+    # numpy scalars are stored as the matching Python types
+    return value.item() if isinstance(value, np.generic) else value
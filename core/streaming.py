@@ -0,0 +1,182 @@
+from collections import namedtuple
+
+import numpy as np
+
+from core import Position, PositionType
+from core.simulation import liquidate_position, next_position_type
+
+"""
+What the streaming pipeline decided for one bar:
+    timestamp, close: the bar received
+    prediction: forecast for this bar's time step, the same value forecast() gives
+    action: PositionType opened at this bar's close, or None
+    balance: balance after liquidating the previous position and opening the new one
+"""
+StreamDecision = namedtuple('StreamDecision', ['timestamp', 'close', 'prediction', 'action', 'balance'])
+
+
+"""
+Fixed size buffer of the most recent values. Every value is written twice, so the
+last N values are always one contiguous view of the storage and reading a window
+never copies
+"""
+
+
+class RingBuffer:
+    def __init__(self, capacity, width=None):
+        self.capacity = capacity
+        self.count = 0
+        self._data = np.empty((2 * capacity,) if width is None else (2 * capacity, width))
+
+    def append(self, value):
+        position = self.count % self.capacity
+        self._data[position] = value
+        self._data[position + self.capacity] = value
+        self.count += 1
+
+    def view(self):
+        size = min(self.count, self.capacity)
+        start = (self.count - size) % self.capacity
+        return self._data[start:start + size]
+
+
+"""
+Streaming version of forecast() followed by simulate_trades_continuous(), that takes
+bars one at a time and decides on a trade for every bar.
+
+Only the last look_back + 1 differentiated values and features are kept in ring buffers,
+together with the last close and the state used to invert the differentiation, so memory
+stays O(look_back) no matter how long the stream is. For every bar, the method predicts on
+the same training window that forecast() would use at that time step, and the decision
+follows the simulation: liquidate the open position at the new close, then open a new
+position if the close compared to the previous bar's prediction changes by more than the
+threshold.
+
+Parameters:
+    method (Method): Forecasting method, see methods/
+    look_back (int): Amount of time steps to look back, -1 (unbounded) is not supported
+    start_t (int): Time step to start forecasting from, earlier predictions are the closes
+        (default is 5)
+    diff_order (str): '0', '1' or 'return-price', see differentiate()
+        (default is '1')
+    threshold (float): Value (0 - 100) to threshold decisions by
+        (default is 0)
+    features (function): Called with a bar's timestamp, returns the bar's x features as
+        a 1D array
+        (default is None, a constant feature like the ticker_sma / ticker_lr preparers)
+"""
+
+
+class StreamingPipeline:
+    def __init__(self, method, look_back, start_t=5, diff_order='1', threshold=0, features=None):
+        if look_back < 1:
+            raise ValueError('Streaming requires a positive look_back, got {}'.format(look_back))
+        if diff_order not in ['0', '1', 'return-price']:
+            raise ValueError('Streaming does not support differentiation order {}'.format(diff_order))
+        if start_t < 1:
+            raise ValueError('Streaming requires start_t >= 1, got {}'.format(start_t))
+
+        self.method, self.look_back, self.start_t = method, look_back, start_t
+        self.diff_order, self.threshold = diff_order, threshold
+        self.features = features or (lambda timestamp: np.ones(1))
+
+        self.t = 0
+        self.balance, self.n_trades = 0, 0
+        self.position = None
+        self._last_close, self._last_prediction = None, None
+        self._initial_val, self._level = None, None
+        self._x, self._y = None, RingBuffer(look_back + 1)
+
+    """
+    Processes a new bar and returns the StreamDecision for it
+    """
+    def update(self, timestamp, close):
+        x_row = np.asarray(self.features(timestamp), dtype=np.float64)
+        if self._x is None:
+            self._x = RingBuffer(self.look_back + 1, width=len(x_row))
+        self._x.append(x_row)
+        self._y.append(self._differentiate(close))
+
+        prediction = self._predict(close)
+        action = self._trade(close) if self.t > 0 else None
+
+        self._last_close, self._last_prediction = close, prediction
+        self.t += 1
+        return StreamDecision(timestamp, close, prediction, action, self.balance)
+
+    """
+    Liquidates the position left open at the last close, as the simulation does at the
+    end of the data, and returns the final balance
+    """
+    def close(self):
+        if self.position is not None:
+            self.balance = liquidate_position(self.position, at_price=self._last_close, current_balance=self.balance,
+                                              verbose=False)
+            self.position = None
+            self.n_trades += 1
+        return self.balance
+
+    def _differentiate(self, close):
+        if self.diff_order == '0':
+            return close
+        if self._last_close is None:
+            return 0.0
+        change = close - self._last_close
+        if self.diff_order == 'return-price':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change = np.float64(change) / self._last_close
+        return 0.0 if np.isnan(change) else change
+
+    def _predict(self, close):
+        if self.t < self.start_t:
+            return close
+        if self.t == self.start_t:
+            self._initial_val = self._last_close
+
+        # the buffers hold the last look_back + 1 values, so the window that training_data_for_t()
+        # gives for the current t is the same as for the local index of the newest value
+        y_window = self._y.view()
+        local_t = len(y_window) - 1
+        predicted = self.method.predict(t=local_t, x_data=self._x.view(), y_data=y_window, look_back=self.look_back)
+        predicted = float(np.asarray(predicted).reshape(-1)[0])
+
+        # inverse differentiation, carried forward one value at a time like inv_differentiate()
+        if self.diff_order == '0':
+            return predicted
+        if self.diff_order == 'return-price':
+            self._level = (1 + predicted) * (self._level if self._level is not None else 1.0)
+            return self._level * self._initial_val
+        self._level = (self._level if self._level is not None else self._initial_val) + predicted
+        return self._level
+
+    def _trade(self, close):
+        if self.position is not None:
+            self.balance = liquidate_position(self.position, at_price=close, current_balance=self.balance,
+                                              verbose=False)
+            self.position = None
+            self.n_trades += 1
+
+        position_type = next_position_type(close, self._last_prediction, threshold=self.threshold)
+        if position_type is not None:
+            self.position = Position(position_type=position_type, amount=1)
+            if position_type == PositionType.BUY:
+                self.balance -= (close * self.position.amount)
+            else:
+                self.balance += (close * self.position.amount)
+        return position_type
+
+
+"""
+Generator version of StreamingPipeline: takes an iterable of (timestamp, close) bars and
+yields a StreamDecision for every bar. The position left open after the last bar is
+liquidated when the bars run out, see StreamingPipeline.close(), and the final balance
+is the return value of the generator (e.g. the result of yield from)
+"""
+
+
+def stream_decisions(bars, method, look_back, start_t=5, diff_order='1', threshold=0, features=None):
+    pipeline = StreamingPipeline(method=method, look_back=look_back, start_t=start_t, diff_order=diff_order,
+                                 threshold=threshold, features=features)
+    for timestamp, close in bars:
+        yield pipeline.update(timestamp, close)
+    return pipeline.close()
@@ -1,8 +1,32 @@
-import requests
+import os
+import numpy as np
 import pandas as pd
 from io import StringIO
 
-from utils.config import ALPHAVANTAGE_API_KEY
+from loaders.cache import cached_columns, store_columns
+
+
+"""
+AlphaVantage query endpoint, can be pointed at a local stand-in server for testing
+"""
+API_URL = 'https://www.alphavantage.co/query'
+
+"""
+Number of most recent bars returned by the API with outputsize=compact
+"""
+COMPACT_SIZE = 100
+
+"""
+Length of a bar for every interval supported by the API
+"""
+INTERVALS = {
+    '1min': pd.Timedelta(minutes=1),
+    '5min': pd.Timedelta(minutes=5),
+    '15min': pd.Timedelta(minutes=15),
+    '30min': pd.Timedelta(minutes=30),
+    '60min': pd.Timedelta(minutes=60),
+    'daily': pd.Timedelta(days=1),
+}
 
 
 def check_limits(data):
@@ -18,56 +42,232 @@ Parameters:
     api_key (str): API key provided by AlphaVantage
     interval (str): Frequency of time series
         (default is '5min')
+    outputsize (str): 'full' for the whole history, 'compact' for the latest COMPACT_SIZE bars
+        (default is 'full')
+    base_url (str): API endpoint
+        (default is API_URL)
 
 Returns:
     (str): AlphaVantage URL
 """
 
 
-def generate_intraday_url(symbol, api_key, interval='5min'):
-    base_url = 'https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY'
+def generate_intraday_url(symbol, api_key, interval='5min', outputsize='full', base_url=API_URL):
+    base_url += '?function=TIME_SERIES_INTRADAY'
     base_url += '&symbol={}'.format(symbol)
     base_url += '&interval={}'.format(interval)
     base_url += '&apikey={}'.format(api_key)
     base_url += '&datatype=csv'
-    base_url += '&outputsize=full'
+    base_url += '&outputsize={}'.format(outputsize)
+    return base_url
+
+
+"""
+Constructs a TIME_SERIES_DAILY AlphaVantage API URL, see generate_intraday_url()
+"""
+
+
+def generate_daily_url(symbol, api_key, outputsize='full', base_url=API_URL):
+    base_url += '?function=TIME_SERIES_DAILY'
+    base_url += '&symbol={}'.format(symbol)
+    base_url += '&apikey={}'.format(api_key)
+    base_url += '&datatype=csv'
+    base_url += '&outputsize={}'.format(outputsize)
     return base_url
 
 
+"""
+Constructs the AlphaVantage API URL for any interval in INTERVALS
+"""
+
+
+def generate_url(symbol, api_key, interval='5min', outputsize='full', base_url=API_URL):
+    if interval == 'daily':
+        return generate_daily_url(symbol=symbol, api_key=api_key, outputsize=outputsize, base_url=base_url)
+    return generate_intraday_url(symbol=symbol, api_key=api_key, interval=interval, outputsize=outputsize,
+                                 base_url=base_url)
+
+
+"""
+Downloads the bars of a stock ticker that are newer than the ones already stored on disk,
+and appends them to the stored CSV file (see ticker_data_path()). The whole history is
+only requested when nothing is stored yet or when more than COMPACT_SIZE bars could be
+missing, otherwise the API is asked for the compact output. The estimate compares the
+(naive, local) current time with the last stored bar, so it can be off by the time zone
+difference or gaps such as weekends: when the compact output does not overlap the stored
+bars, the whole history is requested instead. Bars that are not newer than the last
+stored timestamp are dropped, as are duplicated timestamps.
+
+Parameters:
+    symbol (str): Stock ticker symbol
+    interval (str): Frequency of the time series, one of INTERVALS
+        (default is '5min')
+    data_dir (str): Directory of the local store
+        (default is 'data')
+    session (requests.Session): Object whose get(url) is used for the request, e.g.
+        a session to reuse connections
+        (default is None, a new connection per request)
+    api_key (str): API key provided by AlphaVantage
+        (default is the ALPHAVANTAGE_API_KEY setting)
+    base_url (str): API endpoint
+        (default is API_URL)
+    now (pd.Timestamp): Current time used to estimate the number of missing bars
+        (default is None, the current local time)
+
+Returns:
+    n_new (int): Number of bars appended to the store
+"""
+
+
+def sync_ticker_data(symbol, interval='5min', data_dir='data', session=None, api_key=None, base_url=API_URL, now=None):
+    path = ticker_store_path(symbol, interval=interval, data_dir=data_dir)
+    stored = _stored_columns(path, interval) if os.path.exists(path) else None
+
+    outputsize = 'full'
+    if stored is not None and len(stored['date']):
+        last_timestamp = pd.Timestamp(stored['date'][-1])
+        missing_bars = ((now or pd.Timestamp.now()) - last_timestamp) / INTERVALS[interval]
+        outputsize = 'compact' if missing_bars < COMPACT_SIZE else 'full'
+
+    if not api_key:
+        from utils.config import ALPHAVANTAGE_API_KEY
+        api_key = ALPHAVANTAGE_API_KEY
+    if session is None:
+        # only needed for downloads, so reading from the store does not pay for the import
+        import requests
+        session = requests
+
+    df, dates = _download(session, generate_url(symbol=symbol, api_key=api_key, interval=interval,
+                                                outputsize=outputsize, base_url=base_url), interval)
+    if outputsize == 'compact' and len(dates) and dates.min() > stored['date'][-1]:
+        # the estimate was off (e.g. time zones or a long gap): the compact output does not reach
+        # back to the stored bars, so bars in between would be missing from the store for good
+        df, dates = _download(session, generate_url(symbol=symbol, api_key=api_key, interval=interval,
+                                                    outputsize='full', base_url=base_url), interval)
+    rows = _new_rows(dates, stored['date'] if stored is not None else None)
+    if not len(rows):
+        return 0
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if stored is None:
+        df.iloc[rows].to_csv(path, index=False)
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        df.iloc[rows][header].to_csv(path, mode='a', index=False, header=False)
+
+    # extend the cached columns instead of parsing the whole file again
+    new_columns = {'date': dates[rows], 'close': df['close'].to_numpy(dtype=np.float64)[rows]}
+    if stored is not None:
+        new_columns = {name: np.concatenate([stored[name], new_columns[name]]) for name in new_columns}
+    store_columns(path, key=interval, data=new_columns)
+    return len(rows)
+
+
 """
 Create and return a pd.DataFrame containing the date and close price fields for 
 a stock ticker time-series via AlphaVantage. If available, retrieve from disk,
-otherwise option to download via the API. 
+otherwise option to download via the API. Downloaded bars are merged into the local
+store first, see sync_ticker_data().
+
+Data read from disk is cached: the normalized columns are stored next to the CSV
+file and memory-mapped on later loads, and recently used symbols are kept in memory
+(see loaders/cache.py). The cache is invalidated when the CSV file changes. The cached
+columns are shared and read-only, so they are copied into the returned frame unless a
+read-only frame is requested.
 
 Parameters:
     symbol (str): Stock ticker symbol
     interval (str): Frequency of the time series requested via the API
         (default is '5min')
-    download (bool): Specifies whether to retrieve the data from disk or download
+    download (bool): Specifies whether to download new bars before reading from disk
+        (default is False)
+    data_dir (str): Directory of the local store
+        (default is 'data')
+    use_cache (bool): Specifies whether to use the cache when reading from disk
+        (default is True)
+    read_only (bool): Return a frame that wraps the cached (possibly memory-mapped) columns
+        without copying them, which raises on assignment
         (default is False)
 
 Returns:
-    data (pd.DataFrame): Data with a 'date' and 'close' column ordered chronologically
+    data (pd.DataFrame): Data with a 'date' (datetime64) and 'close' (float64) column ordered chronologically
 """
 
 
-def get_ticker_data(symbol, interval='5min', download=False):
+def get_ticker_data(symbol, interval='5min', download=False, data_dir='data', use_cache=True, read_only=False):
     if download:
-        response = requests.get(generate_intraday_url(symbol=symbol, interval=interval, api_key=ALPHAVANTAGE_API_KEY)).content
-        check_limits(response)
-        df = pd.read_csv(StringIO(response.decode('utf-8')))
-    else:
-        if interval == 'daily':
-            df = pd.read_csv('data/daily/daily_{}.csv'.format(symbol))
-        else:
-            df = pd.read_csv('{}.csv'.format(symbol))
-
-    cols = ['timestamp', 'close']
-    df[cols[0]] = pd.to_datetime(df[cols[0]], format='%Y-%m-%d')
-    df.index = df[cols[0]]
-    df = df.sort_index(ascending=True, axis=0)
-
-    data = pd.DataFrame(index=range(0, len(df)), columns=['date', 'close'])
-    data['date'] = df[cols[0]].values
-    data['close'] = df[cols[1]].values
-    return data
+        sync_ticker_data(symbol, interval=interval, data_dir=data_dir)
+
+    path = ticker_data_path(symbol, interval=interval, data_dir=data_dir)
+    build = lambda: normalize_ticker_data(pd.read_csv(path), interval=interval)
+    columns = cached_columns(path, key=interval, build=build, columns=['date', 'close']) if use_cache else build()
+
+    # freshly parsed columns belong to the caller and are never copied
+    return pd.DataFrame({'date': columns['date'], 'close': columns['close']}, copy=use_cache and not read_only)
+
+
+"""
+Returns the path of the CSV file that holds the data for a symbol and interval. Intraday
+data that has not been synced to the store yet is read from {symbol}.csv
+"""
+
+
+def ticker_data_path(symbol, interval, data_dir='data'):
+    path = ticker_store_path(symbol, interval=interval, data_dir=data_dir)
+    if interval != 'daily' and not os.path.exists(path):
+        return '{}.csv'.format(symbol)
+    return path
+
+
+"""
+Returns the path of the CSV file in the local store for a symbol and interval,
+e.g. data/daily/daily_AMZN.csv or data/5min/5min_AMZN.csv
+"""
+
+
+def ticker_store_path(symbol, interval, data_dir='data'):
+    return os.path.join(data_dir, interval, '{}_{}.csv'.format(interval, symbol))
+
+
+"""
+Converts AlphaVantage CSV data into chronologically ordered 'date' (datetime64) and
+'close' (float64) arrays
+
+Returns:
+    (dict(str, np.ndarray)): 'date' and 'close' columns
+"""
+
+
+def normalize_ticker_data(df, interval):
+    dates = _parse_dates(df, interval=interval)
+    order = np.argsort(dates, kind='stable')
+    return {'date': dates[order], 'close': df['close'].to_numpy(dtype=np.float64)[order]}
+
+
+def _download(session, url, interval):
+    response = session.get(url).content
+    check_limits(response)
+    df = pd.read_csv(StringIO(response.decode('utf-8')))
+    return df, _parse_dates(df, interval=interval)
+
+
+def _parse_dates(df, interval):
+    date_format = '%Y-%m-%d' if interval == 'daily' else '%Y-%m-%d %H:%M:%S'
+    return pd.to_datetime(df['timestamp'], format=date_format).to_numpy(dtype='datetime64[ns]')
+
+
+def _stored_columns(path, interval):
+    return cached_columns(path, key=interval, columns=['date', 'close'],
+                          build=lambda: normalize_ticker_data(pd.read_csv(path), interval=interval))
+
+
+def _new_rows(dates, stored_dates):
+    # chronologically ordered positions of the downloaded rows that are newer than the
+    # stored ones, keeping the last row of every duplicated timestamp
+    order = np.argsort(dates, kind='stable')
+    ordered = dates[order]
+    keep = np.ones(len(ordered), dtype=bool)
+    keep[:-1] = ordered[1:] != ordered[:-1]
+    if stored_dates is not None and len(stored_dates):
+        keep &= ordered > stored_dates[-1]
+    return order[keep]
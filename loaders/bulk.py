@@ -0,0 +1,131 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from loaders.alphavantage import API_URL, get_ticker_data, sync_ticker_data
+
+"""
+Token bucket rate limiter, shared between threads. Tokens are added continuously at
+rate / per tokens per second, up to capacity, and acquire() blocks until one is available
+
+Parameters:
+    rate (int): Number of tokens added every per seconds
+    per (float): Length of the period in seconds
+        (default is 60.0)
+    capacity (int): Maximum number of tokens, i.e. the largest burst
+        (default is rate)
+"""
+
+
+class TokenBucket:
+    def __init__(self, rate, per=60.0, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate_per_second = rate / per
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.clock, self.sleep = clock, sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_second
+            self.sleep(wait)
+
+
+"""
+Session that takes a token from a TokenBucket before every request
+"""
+
+
+class RateLimitedSession:
+    def __init__(self, session, bucket):
+        self.session, self.bucket = session, bucket
+
+    def get(self, url):
+        self.bucket.acquire()
+        return self.session.get(url)
+
+
+"""
+Downloads many stock tickers concurrently, and yields each symbol's data as soon as it
+is ready. Every symbol is synced into the local store with sync_ticker_data() and then
+loaded with get_ticker_data().
+
+All requests go through one session with a connection pool of the size of concurrency,
+and are limited by a token bucket (the AlphaVantage free tier allows 5 requests per minute).
+When the API reports that its limit was reached, the request is retried after waiting
+backoff seconds, doubling the wait on every further attempt.
+
+Parameters:
+    symbols (list(str)): Stock ticker symbols
+    interval (str): Frequency of the time series
+        (default is '5min')
+    concurrency (int): Number of requests in flight at the same time
+        (default is 4)
+    rate_limit (int): Number of requests allowed every per seconds
+        (default is 5)
+    per (float): Length of the rate limit period in seconds
+        (default is 60.0)
+    retries (int): Number of retries after the API limit was reached
+        (default is 3)
+    backoff (float): Seconds to wait before the first retry
+        (default is 15.0)
+    data_dir (str): Directory of the local store
+        (default is 'data')
+    base_url (str): API endpoint
+        (default is API_URL)
+    api_key (str): API key provided by AlphaVantage
+        (default is the ALPHAVANTAGE_API_KEY setting)
+
+Returns:
+    (generator((str, pd.DataFrame))): Symbol and data, in order of completion
+"""
+
+
+def iter_many_ticker_data(symbols, interval='5min', concurrency=4, rate_limit=5, per=60.0, retries=3, backoff=15.0,
+                          data_dir='data', base_url=API_URL, api_key=None):
+    pooled = requests.Session()
+    pooled.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+    pooled.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+    session = RateLimitedSession(pooled, TokenBucket(rate_limit, per=per))
+
+    def fetch(symbol):
+        for attempt in range(retries + 1):
+            try:
+                sync_ticker_data(symbol, interval=interval, data_dir=data_dir, session=session, api_key=api_key,
+                                 base_url=base_url)
+                break
+            except RuntimeError:
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+        return symbol, get_ticker_data(symbol, interval=interval, data_dir=data_dir)
+
+    with pooled, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(fetch, symbol) for symbol in symbols]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+"""
+Same as iter_many_ticker_data(), but waits for every symbol
+
+Returns:
+    (dict(str, pd.DataFrame)): Data by symbol
+"""
+
+
+def get_many_ticker_data(symbols, interval='5min', concurrency=4, rate_limit=5, per=60.0, retries=3, backoff=15.0,
+                         data_dir='data', base_url=API_URL, api_key=None):
+    return dict(iter_many_ticker_data(symbols, interval=interval, concurrency=concurrency, rate_limit=rate_limit,
+                                      per=per, retries=retries, backoff=backoff, data_dir=data_dir,
+                                      base_url=base_url, api_key=api_key))
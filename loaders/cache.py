@@ -0,0 +1,95 @@
+import os
+import glob
+
+import numpy as np
+
+from utils.caching import LRUCache, save_array, ignore_cache_errors
+
+"""
+Maximum number of entries kept by the in-process cache
+"""
+MEMORY_CACHE_SIZE = 32
+
+_memory_cache = LRUCache(MEMORY_CACHE_SIZE)
+
+
+"""
+Returns the columns built from a source file, caching them both in memory and on disk.
+
+On disk, every column is stored as a raw .npy file in a .cache directory next to the
+source file, and is loaded back memory-mapped (read-only). Entries are keyed by the
+source file, a key describing how the columns were built (e.g. the interval) and the
+modification time of the source file, so changing the source invalidates the cache.
+In memory, the most recently used MEMORY_CACHE_SIZE entries are kept. The returned
+arrays are shared between callers and are therefore read-only.
+
+Parameters:
+    source_path (str): File the columns are built from
+    key (str): Name for the way the columns are built from the source file
+    build (function): Called without arguments to build a dict(str, np.ndarray) of
+        columns on a cache miss
+    columns (list(str)): Names of the columns returned by build()
+
+Returns:
+    columns (dict(str, np.ndarray)): Cached columns
+"""
+
+
+def cached_columns(source_path, key, build, columns):
+    mtime = os.stat(source_path).st_mtime_ns
+    memory_key = (os.path.abspath(source_path), key, mtime)
+    data = _memory_cache.get(memory_key)
+    if data is not None:
+        return data
+
+    prefix, paths = _cache_paths(source_path, key, mtime, columns)
+    if all(os.path.exists(path) for path in paths.values()):
+        data = {column: np.load(path, mmap_mode='r') for column, path in paths.items()}
+        _memory_cache.put(memory_key, data)
+        return data
+    return store_columns(source_path, key, build())
+
+
+"""
+Caches columns for the current version of a source file, e.g. when they were updated
+together with the file, so that the next cached_columns() call does not rebuild them
+
+Returns:
+    columns (dict(str, np.ndarray)): Cached (read-only) columns
+"""
+
+
+def store_columns(source_path, key, data):
+    mtime = os.stat(source_path).st_mtime_ns
+    prefix, paths = _cache_paths(source_path, key, mtime, list(data))
+    _save(prefix, paths, data)
+
+    # cached arrays are shared by every caller, same as the read-only memory-mapped ones
+    for column in data.values():
+        column.flags.writeable = False
+    _memory_cache.put((os.path.abspath(source_path), key, mtime), data)
+    return data
+
+
+"""
+Empties the in-process cache, files cached on disk are kept
+"""
+
+
+def clear_memory_cache():
+    _memory_cache.clear()
+
+
+def _cache_paths(source_path, key, mtime, columns):
+    directory, name = os.path.split(os.path.abspath(source_path))
+    prefix = os.path.join(directory, '.cache', '{}.{}'.format(name, key))
+    return prefix, {column: '{}.{}.{}.npy'.format(prefix, mtime, column) for column in columns}
+
+
+def _save(prefix, paths, data):
+    with ignore_cache_errors():
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        for stale in glob.glob(glob.escape(prefix) + '.*.npy'):
+            os.remove(stale)
+        for column, path in paths.items():
+            save_array(path, data[column])
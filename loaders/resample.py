@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from loaders.cache import cached_columns
+from loaders.alphavantage import INTERVALS, ticker_data_path, _parse_dates
+
+"""
+Columns of resampled bars
+"""
+BAR_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+"""
+Names of weekly intervals, weeks start on Monday
+"""
+WEEKLY = ['weekly', 'W']
+
+
+"""
+Resamples bars into coarser bars of a fixed length with vectorized group operations: the
+bars are grouped by the interval they start in, and every group becomes one bar with the
+first open, the highest high, the lowest low, the last close and the total volume.
+Intervals of up to a day are aligned to multiples of their length since the Unix epoch,
+i.e. to midnight for intervals that divide a day, and weekly intervals start on Mondays
+(the week a bar is in does not depend on where the epoch falls in the week). Other
+intervals longer than a day are rejected, as they have no calendar boundary to start
+on. Only intervals that contain bars are returned.
+
+Parameters:
+    bars (dict(str, np.ndarray)): Chronologically ordered 'date' (datetime64) and 'close'
+        columns, and optionally 'open', 'high', 'low' (the close is used when missing)
+        and 'volume' (0 when missing)
+    interval (str): Length of the resampled bars, one of INTERVALS, a pandas Timedelta
+        string of at most a day such as '2h', or one of WEEKLY
+
+Returns:
+    (dict(str, np.ndarray)): Columns in BAR_COLUMNS, 'date' being the start of each interval
+"""
+
+
+def resample_bars(bars, interval):
+    width, offset = _interval_bounds(interval)
+    dates = np.asarray(bars['date'], dtype='datetime64[ns]').view(np.int64)
+    close = np.asarray(bars['close'], dtype=np.float64)
+
+    buckets = (dates + offset) // width
+    if len(buckets) and np.any(buckets[1:] < buckets[:-1]):
+        raise ValueError('Bars must be ordered chronologically')
+    if len(buckets) == 0:
+        return {name: np.empty(0, dtype='datetime64[ns]' if name == 'date' else np.float64) for name in BAR_COLUMNS}
+
+    # first and last bar of every interval
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    def column(name, default):
+        return np.asarray(bars[name], dtype=np.float64) if name in bars else default
+
+    return {
+        'date': (buckets[starts] * width - offset).view('datetime64[ns]'),
+        'open': column('open', close)[starts],
+        'high': np.maximum.reduceat(column('high', close), starts),
+        'low': np.minimum.reduceat(column('low', close), starts),
+        'close': close[ends],
+        'volume': np.add.reduceat(column('volume', np.zeros(len(close))), starts),
+    }
+
+
+"""
+Length of an interval in nanoseconds, for the names in INTERVALS and WEEKLY or any pandas
+Timedelta string
+"""
+
+
+def interval_length(interval):
+    length = pd.Timedelta(days=7) if interval in WEEKLY else \
+        INTERVALS[interval] if interval in INTERVALS else pd.Timedelta(interval)
+    if length <= pd.Timedelta(0):
+        raise ValueError('Interval {} must be positive'.format(interval))
+    return length.value
+
+
+def _interval_bounds(interval):
+    # length of the interval and the offset that moves its start to a calendar boundary, in nanoseconds
+    length = interval_length(interval)
+    if interval in WEEKLY:
+        # the epoch is a Thursday, 3 days after the start of its week
+        return length, pd.Timedelta(days=3).value
+    if length > pd.Timedelta(days=1).value:
+        raise ValueError('Interval {} is longer than a day, use one of {} for weeks'.format(interval, WEEKLY))
+    return length, 0
+
+
+"""
+Returns the bars of a symbol for an interval derived from the stored data of a finer base
+interval (e.g. hourly and daily bars from 5 minute bars), so only the base interval has to
+be downloaded. Both the base columns and the resampled bars are cached next to the base
+CSV file (see loaders/cache.py), and are rebuilt when the base file changes.
+
+Parameters:
+    symbol (str): Stock ticker symbol
+    interval (str): Interval of the returned bars, see resample_bars()
+    base_interval (str): Interval of the stored data the bars are derived from
+        (default is '5min')
+    data_dir (str): Directory of the local store
+        (default is 'data')
+    use_cache (bool): Specifies whether to use the cache
+        (default is True)
+    read_only (bool): Return a frame that wraps the cached columns without copying them,
+        see get_ticker_data()
+        (default is False)
+
+Returns:
+    data (pd.DataFrame): Bars with the columns in BAR_COLUMNS, ordered chronologically
+"""
+
+
+def get_resampled_data(symbol, interval, base_interval='5min', data_dir='data', use_cache=True, read_only=False):
+    if interval_length(interval) < interval_length(base_interval):
+        raise ValueError('Cannot resample {} bars into shorter {} bars'.format(base_interval, interval))
+
+    path = ticker_data_path(symbol, interval=base_interval, data_dir=data_dir)
+    base = lambda: base_bars(pd.read_csv(path), interval=base_interval)
+    if not use_cache:
+        columns = resample_bars(base(), interval)
+    else:
+        build = lambda: resample_bars(cached_columns(path, key='ohlcv.{}'.format(base_interval), build=base,
+                                                     columns=BAR_COLUMNS), interval)
+        columns = cached_columns(path, key='resample.{}.{}'.format(base_interval, interval), build=build,
+                                 columns=BAR_COLUMNS)
+
+    return pd.DataFrame({name: columns[name] for name in BAR_COLUMNS}, copy=use_cache and not read_only)
+
+
+"""
+Converts AlphaVantage CSV data into chronologically ordered columns for resample_bars(),
+with the open, high, low and volume columns of the file when it has them
+"""
+
+
+def base_bars(df, interval):
+    dates = _parse_dates(df, interval=interval)
+    order = np.argsort(dates, kind='stable')
+    close = df['close'].to_numpy(dtype=np.float64)[order]
+    columns = {'date': dates[order], 'close': close, 'volume': np.zeros(len(close))}
+    for name in ['open', 'high', 'low']:
+        columns[name] = close
+    for name in ['open', 'high', 'low', 'volume']:
+        if name in df:
+            columns[name] = df[name].to_numpy(dtype=np.float64)[order]
+    return columns
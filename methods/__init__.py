@@ -2,6 +2,24 @@ from abc import ABC, abstractmethod
 
 
 class Method(ABC):
+    """
+    Whether the method implements predict_incremental() by carrying state between
+    consecutive time steps of a walk-forward forecast instead of fitting from scratch
+    """
+    supports_incremental = False
+
+    """
+    Whether the method overrides predict_walk_forward() with a batched implementation
+    that computes every walk-forward prediction at once
+    """
+    supports_batch = False
+
+    """
+    Whether the method implements fit() and predict_with() of RefitMethod, so that a
+    walk-forward forecast can reuse a fitted model for several time steps (see core/refit.py)
+    """
+    supports_refit = False
+
     """
     Predict the price at time step t using a range of values ending at t-1
     to make the prediction
@@ -17,3 +35,68 @@ class Method(ABC):
     @abstractmethod
     def predict_next_n(self, t, n, x_data, y_data, look_back=-1):
         pass
+
+    """
+    Same as predict(), but the method may reuse state left over from the previous
+    call when the data is the same and t only moved forward. Results are expected
+    to match predict() within floating point tolerance. Defaults to predict()
+    """
+    def predict_incremental(self, t, x_data, y_data, look_back=-1):
+        return self.predict(t=t, x_data=x_data, y_data=y_data, look_back=look_back)
+
+    """
+    Predict every time step in [t, t+N) exactly like calling predict() once per step,
+    i.e. each step only uses the data available at that step. Defaults to a loop over predict()
+    """
+    def predict_walk_forward(self, t, n, x_data, y_data, look_back=-1):
+        return [self.predict(t=t + i, x_data=x_data, y_data=y_data, look_back=look_back) for i in range(n)]
+
+    """
+    Clears any state kept by predict_incremental(), called before and after
+    a walk-forward pass
+    """
+    def reset(self):
+        pass
+
+    """
+    Time steps at which a parallel incremental walk-forward may be split into chunks are
+    multiples of this value, see core/parallel.py. Methods whose predict_incremental()
+    state depends on where the walk-forward started should return a period at which the
+    state is rebuilt from scratch, so that chunks give the same predictions as one pass
+    """
+    def chunk_alignment(self):
+        return 1
+
+    """
+    Hyperparameters that determine the predictions, used to identify forecasts in the
+    forecast cache (see core/cache.py). Defaults to the public attributes of the method,
+    methods with hyperparameters stored elsewhere should override it
+    """
+    def params(self):
+        return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+
+
+"""
+Base class of methods that fit a model separately from predicting with it, which
+refit policies use to reuse a fitted model for several time steps (see core/refit.py)
+"""
+
+
+class RefitMethod(Method):
+    supports_refit = True
+
+    """
+    Fit a model on the training window for time step t and return it, predict() is
+    then the same as predict_with() on the returned model
+    """
+    @abstractmethod
+    def fit(self, t, x_data, y_data, look_back=-1):
+        pass
+
+    """
+    Predict time step t with a model returned by fit(), which may have been fitted
+    for an earlier time step
+    """
+    @abstractmethod
+    def predict_with(self, model, t, x_data):
+        pass
@@ -1,28 +1,151 @@
-from methods import Method
-from utils.general import training_data_for_t
-from sklearn.linear_model import LinearRegression as LinearRegressionModel
+import numpy as np
+from methods import RefitMethod
+from utils.general import training_data_for_t, feature_row, training_window
+from utils.profiling import stage
 
 """
 Linear Regression (LR) prediction model / method
+
+Besides fitting a new model for every predict() call, the method supports an
+incremental walk-forward mode that keeps the sufficient statistics (X'X, X'y)
+of the current training window and only adds / removes the rows that entered
+or left the window between two consecutive time steps.
+
+Parameters:
+    refresh_every (int): In incremental mode, rebuild the statistics from scratch
+        whenever t is a multiple of this value to stop rounding errors from adding up
+        (default is 256)
 """
 
 
-class LinearRegression(Method):
-    def predict(self, t, x_data, y_data, look_back=-1):
-        # -1 means look back at as much data as possible
-        # get the training data slice up to the current time step t
-        x_train, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
+class LinearRegression(RefitMethod):
+    supports_incremental = True
 
-        model = LinearRegressionModel()
-        model.fit(x_train, y_train)
+    def __init__(self, refresh_every=256):
+        self.refresh_every = refresh_every
+        self.reset()
 
-        return model.predict([x_data.iloc[t]])
+    def predict(self, t, x_data, y_data, look_back=-1):
+        model = self.fit(t=t, x_data=x_data, y_data=y_data, look_back=look_back)
+        return self.predict_with(model, t=t, x_data=x_data)
 
     def predict_next_n(self, t, n, x_data, y_data, look_back=-1):
+        model = self.fit(t=t, x_data=x_data, y_data=y_data, look_back=look_back)
+        return model.predict(x_data[t: t + n])
+
+    def fit(self, t, x_data, y_data, look_back=-1):
         # -1 means look back at as much data as possible
         # get the training data slice up to the current time step t
-        x_train, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
+        with stage('LinearRegression.window'):
+            x_train, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
 
+        # sklearn takes about a second to import and the incremental walk-forward does not need it
+        from sklearn.linear_model import LinearRegression as LinearRegressionModel
         model = LinearRegressionModel()
-        model.fit(x_train, y_train)
-        return model.predict(x_data[t: t + n])
+        with stage('LinearRegression.fit', fits=1, window=len(y_train)):
+            model.fit(x_train, y_train)
+        return model
+
+    def predict_with(self, model, t, x_data):
+        return model.predict(feature_row(x_data, t))
+
+    def predict_incremental(self, t, x_data, y_data, look_back=-1):
+        start, stop = training_window(t, look_back)
+        if stop <= start:
+            raise ValueError('No training data available for t={}'.format(t))
+
+        if self._needs_rebuild(t, x_data, y_data, start, stop):
+            with stage('LinearRegression.fit', fits=1, window=stop - start):
+                self._rebuild(x_data, y_data, start, stop)
+        else:
+            with stage('LinearRegression.update', window=stop - start):
+                self._update(self._start, start, sign=-1.0)
+                self._update(self._stop, stop, sign=1.0)
+            self._start, self._stop = start, stop
+            if self._drifted():
+                with stage('LinearRegression.fit', fits=1, window=stop - start):
+                    self._rebuild(x_data, y_data, start, stop)
+
+        coef, intercept = self._solve()
+        return np.array([intercept + (self._x[t] - self._x_ref) @ coef + self._y_ref])
+
+    def chunk_alignment(self):
+        # the statistics are rebuilt at every multiple of refresh_every, so a walk-forward
+        # starting there is in the same state as one that started earlier
+        return self.refresh_every
+
+    def reset(self):
+        self._x_source, self._y_source = None, None
+        self._x, self._y = None, None
+        self._x_ref, self._y_ref = None, 0.0
+        self._start, self._stop = 0, 0
+        self._zz, self._zy = None, None
+        self._rows = 0
+
+    def _needs_rebuild(self, t, x_data, y_data, start, stop):
+        if self._zz is None or x_data is not self._x_source or y_data is not self._y_source:
+            return True
+        if t % self.refresh_every == 0 or start < self._start or stop < self._stop:
+            return True
+        # a jump larger than the window is cheaper to rebuild than to update
+        return (start - self._start) + (stop - self._stop) > (stop - start)
+
+    def _rebuild(self, x_data, y_data, start, stop):
+        if x_data is not self._x_source or y_data is not self._y_source:
+            x = np.asarray(x_data, dtype=np.float64)
+            self._x = x.reshape(-1, 1) if x.ndim == 1 else x
+            self._y = np.asarray(y_data, dtype=np.float64)
+            self._x_source, self._y_source = x_data, y_data
+
+        # statistics are kept relative to the first row of the window, which avoids
+        # cancellation when removing rows from features with a large offset (e.g. years)
+        self._x_ref, self._y_ref = self._x[start].copy(), self._y[start]
+        z = self._design(start, stop)
+        self._zz = z.T @ z
+        self._zy = z.T @ (self._y[start:stop] - self._y_ref)
+        self._start, self._stop = start, stop
+        self._rows = stop - start
+
+    def _update(self, old, new, sign):
+        if new == old:
+            return
+        z = self._design(old, new)
+        self._zz += sign * (z.T @ z)
+        self._zy += sign * (z.T @ (self._y[old:new] - self._y_ref))
+        self._rows += new - old
+
+    def _design(self, start, stop):
+        # column of ones for the intercept, followed by the shifted features
+        x = self._x[start:stop] - self._x_ref
+        return np.hstack([np.ones((len(x), 1)), x])
+
+    def _drifted(self):
+        # once the rounding errors get close to the cutoff of _solve() they decide which directions
+        # are kept and the result leaves the refit, rebuilding brings them back to those of a refit
+        cutoff = self._cutoff(self._centered()[2])
+        return 0.0 < cutoff < 10 * self._rounding_error()
+
+    def _rounding_error(self):
+        # grows with the rows added and removed since the last rebuild and with the offset of the
+        # features from the reference row
+        return np.finfo(np.float64).eps * self._rows * np.abs(np.diag(self._zz)).max()
+
+    def _centered(self):
+        n, sx, sy = self._zz[0, 0], self._zz[0, 1:], self._zy[0]
+        x_mean, y_mean = sx / n, sy / n
+        return x_mean, y_mean, self._zz[1:, 1:] - np.outer(sx, x_mean), self._zy[1:] - sx * y_mean
+
+    def _cutoff(self, centered_xx):
+        # relative to the variances of the window, which unlike the raw statistics do not depend on
+        # the reference row, so refits and updates of the same window drop the same directions
+        return 1e-9 * np.diag(centered_xx).max(initial=0.0)
+
+    def _solve(self):
+        # same solution as sklearn: least squares on centered data, minimum norm
+        # coefficients for rank deficient windows, intercept from the means
+        x_mean, y_mean, centered_xx, centered_xy = self._centered()
+        eigen_values, eigen_vectors = np.linalg.eigh(centered_xx)
+        keep = eigen_values > max(self._cutoff(centered_xx), self._rounding_error())
+        basis = eigen_vectors[:, keep]
+        coef = basis @ ((basis.T @ centered_xy) / eigen_values[keep])
+        return coef, y_mean - x_mean @ coef
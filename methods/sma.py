@@ -1,5 +1,7 @@
+import numpy as np
 from methods import Method
 from utils.general import training_data_for_t
+from utils.profiling import stage
 
 """
 Simple Moving Average (SMA) prediction model / method
@@ -7,24 +9,52 @@ Simple Moving Average (SMA) prediction model / method
 
 
 class MovingAverage(Method):
+    supports_batch = True
+
     def predict(self, t, x_data, y_data, look_back=-1):
         # -1 means look back at as much data as possible
         # get the training data slice for the current t
-        _, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
-        return y_train.sum() / len(y_train)
+        with stage('MovingAverage.predict'):
+            _, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
+            return y_train.sum() / len(y_train)
 
     def predict_next_n(self, t, n, x_data, y_data, look_back=-1):
         # -1 means look back at as much data as possible
-        predictions = []
-
-        # forecast for N periods
-        for i in range(n):
-            t_i = t + i
-            # get the training data slice for the current t_i
-            _, y_train = training_data_for_t(data=(x_data, y_data), t=t_i, look_back=look_back)
-
-            moving_average = y_train.sum() / len(y_train)
-            predictions.append(moving_average)
+        predictions = self.predict_walk_forward(t=t, n=n, x_data=x_data, y_data=y_data, look_back=look_back)
 
         assert len(predictions) == n
         return predictions
+
+    def predict_walk_forward(self, t, n, x_data, y_data, look_back=-1):
+        with stage('MovingAverage.walk_forward', steps=n):
+            return moving_averages(y_data, t=t, n=n, look_back=look_back)
+
+
+"""
+Computes the moving average used by MovingAverage.predict() for every time step in
+[t, t+N) in one pass over a cumulative sum, using the same training window as
+training_data_for_t() (expanding before look_back, inclusive of t afterwards)
+
+Parameters:
+    y_data (np.ndarray or pd.Series): Values to average
+    t (int): First time step to predict
+    n (int): Number of time steps to predict
+    look_back (int): Window length, -1 to use all previous values
+        (default is -1)
+
+Returns:
+    (np.ndarray): Moving averages of length n
+"""
+
+
+def moving_averages(y_data, t, n, look_back=-1):
+    steps = np.arange(t, t + n)
+    expanding = np.full(n, True) if look_back == -1 else steps < look_back
+
+    starts = np.where(expanding, 0, steps - look_back)
+    stops = np.where(expanding, steps, steps + 1)
+
+    y = np.asarray(y_data, dtype=np.float64)
+    sums = np.zeros(len(y) + 1)
+    np.cumsum(y, out=sums[1:])
+    return (sums[stops] - sums[starts]) / (stops - starts)
@@ -1,28 +1,127 @@
-from methods import Method
-from utils.general import training_data_for_t
+import warnings
+
+import numpy as np
+from methods import RefitMethod
+from utils.general import training_data_for_t, feature_row
+from utils.profiling import stage
 from sklearn import svm
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import SGDRegressor
+
+"""
+Solvers the SVM method can fit with
+"""
+BACKENDS = ['libsvm', 'sgd']
+
 
 """
 Support Vector Machine (SVM) prediction model / method
+
+The default 'libsvm' backend fits a linear kernel SVR from scratch at every time step,
+whose cost grows quadratically or worse with the window length. The 'sgd' backend fits
+an epsilon-insensitive linear model with stochastic gradient descent on standardized
+features, in time linear in the window length. C plays the same role, but regularizes the
+coefficients of the standardized features, so the solutions are close in accuracy rather
+than identical to the SVR ones. In a walk-forward forecast, it warm-starts every window
+from the previous window's solution, translated to the new window's standardization,
+so a few passes over the data are enough.
+
+Parameters:
+    backend (str): 'libsvm' or 'sgd'
+        (default is 'libsvm')
+    C (float): Regularization parameter, as for SVR
+        (default is 1.0)
+    epsilon (float): Width of the epsilon-insensitive tube, as for SVR
+        (default is 0.1)
+    restart_every (int): With the 'sgd' backend, fit from scratch instead of warm-starting
+        whenever t is a multiple of this value
+        (default is 256)
 """
 
 
-class SVM(Method):
-    def predict(self, t, x_data, y_data, look_back=-1):
-        # -1 means look back at as much data as possible
-        # get the training data slice up to the current time step t
-        x_train, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
+class SVM(RefitMethod):
+    def __init__(self, backend='libsvm', C=1.0, epsilon=0.1, restart_every=256):
+        if backend not in BACKENDS:
+            raise ValueError('Unknown SVM backend {}, expected one of {}'.format(backend, BACKENDS))
+        self.backend, self.C, self.epsilon, self.restart_every = backend, C, epsilon, restart_every
+        self.reset()
 
-        model = svm.SVR(gamma='scale', kernel='linear', degree=2, coef0=1)
-        model.fit(x_train, y_train)
+    @property
+    def supports_incremental(self):
+        return self.backend == 'sgd'
 
-        return model.predict([x_data.iloc[t]])
+    def predict(self, t, x_data, y_data, look_back=-1):
+        model = self.fit(t=t, x_data=x_data, y_data=y_data, look_back=look_back)
+        return self.predict_with(model, t=t, x_data=x_data)
 
     def predict_next_n(self, t, n, x_data, y_data, look_back=-1):
+        model = self.fit(t=t, x_data=x_data, y_data=y_data, look_back=look_back)
+        return model.predict(x_data[t: t + n])
+
+    def predict_incremental(self, t, x_data, y_data, look_back=-1):
+        if self._warm is None or t % self.restart_every == 0 or x_data is not self._x_source \
+                or y_data is not self._y_source:
+            self._warm = None
+        model = self.fit(t=t, x_data=x_data, y_data=y_data, look_back=look_back, warm=self._warm)
+        self._warm, self._x_source, self._y_source = model, x_data, y_data
+        return self.predict_with(model, t=t, x_data=x_data)
+
+    def fit(self, t, x_data, y_data, look_back=-1, warm=None):
         # -1 means look back at as much data as possible
         # get the training data slice up to the current time step t
-        x_train, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
+        with stage('SVM.window'):
+            x_train, y_train = training_data_for_t(data=(x_data, y_data), t=t, look_back=look_back)
 
-        model = svm.SVR(gamma='scale', kernel='linear', degree=2, coef0=1)
-        model.fit(x_train, y_train)
-        return model.predict(x_data[t: t + n])
+        with stage('SVM.fit', fits=1, window=len(y_train)):
+            if self.backend == 'sgd':
+                return self._fit_sgd(x_train, y_train, warm=warm)
+
+            model = svm.SVR(gamma='scale', kernel='linear', degree=2, coef0=1, C=self.C, epsilon=self.epsilon)
+            model.fit(x_train, y_train)
+            return model
+
+    def predict_with(self, model, t, x_data):
+        return model.predict(feature_row(x_data, t))
+
+    def chunk_alignment(self):
+        # warm starts are dropped at every multiple of restart_every
+        return self.restart_every
+
+    def reset(self):
+        self._warm, self._x_source, self._y_source = None, None, None
+
+    def _fit_sgd(self, x_train, y_train, warm=None):
+        x = np.asarray(x_train, dtype=np.float64)
+        x = x.reshape(-1, 1) if x.ndim == 1 else x
+        mean, scale = x.mean(axis=0), x.std(axis=0)
+        scale[scale == 0] = 1.0
+
+        # alpha * ||w||^2 / 2 + mean loss is the SVR objective divided by C * n
+        model = SGDRegressor(loss='epsilon_insensitive', epsilon=self.epsilon, alpha=1.0 / (self.C * len(x)),
+                             learning_rate='invscaling', eta0=0.01, max_iter=1000, tol=1e-4, random_state=0,
+                             n_iter_no_change=2 if warm is not None else 5)
+        init = {}
+        if warm is not None:
+            # the same function of the raw features, expressed in this window's standardization
+            init = {'coef_init': warm.coef * scale, 'intercept_init': warm.intercept + warm.coef @ mean}
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', ConvergenceWarning)
+            model.fit((x - mean) / scale, np.asarray(y_train, dtype=np.float64), **init)
+
+        coef = model.coef_ / scale
+        return LinearModel(coef=coef, intercept=model.intercept_[0] - coef @ mean)
+
+
+"""
+Linear function of the raw features fitted by the 'sgd' backend
+"""
+
+
+class LinearModel:
+    def __init__(self, coef, intercept):
+        self.coef, self.intercept = coef, intercept
+
+    def predict(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        return (x.reshape(-1, len(self.coef)) @ self.coef) + self.intercept
@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-from fastai.tabular import add_datepart
+from preparers.datepart import date_features, date_feature_matrix
 
 """
 Data preparer function for ticker data to be used with an SMA method
@@ -35,11 +36,39 @@ def ticker_default(raw_data):
 
 
 """
-Data preparer function for ticker data to be used with an SVM method
+Data preparer function for ticker data to be used with an SVM method. Adds calendar
+features of the 'date' column (see preparers/datepart.py), including 'mon_fri' since
+we assume that Fridays and Mondays, the days before and after weekends, are more important
+
+Parameters:
+    raw_data (pd.DataFrame): Data with 'date' and 'close' columns
+    compact (bool): Return x_features as a float32 np.ndarray and y_features as np.ndarray
+        instead of pandas objects
+        (default is False)
+    engine (str): 'numpy' to compute the calendar features directly, or 'fastai' to use
+        fastai's add_datepart(), which requires fastai to be installed
+        (default is 'numpy')
 """
 
 
-def ticker_svm(raw_data):
+def ticker_svm(raw_data, compact=False, engine='numpy'):
+    if engine == 'fastai':
+        return _ticker_svm_fastai(raw_data)
+
+    if compact:
+        other_features = raw_data.drop(['date', 'close'], axis=1).to_numpy(dtype=np.float32)
+        x_features = np.hstack([other_features, date_feature_matrix(raw_data['date'])])
+        return x_features, raw_data['close'].to_numpy()
+
+    x_features = pd.concat([raw_data.drop(['date', 'close'], axis=1),
+                            date_features(raw_data['date'], index=raw_data.index)], axis=1)
+    y_features = raw_data['close']
+    return x_features, y_features
+
+
+def _ticker_svm_fastai(raw_data):
+    from fastai.tabular import add_datepart
+
     data_copy = raw_data.copy()
     add_datepart(data_copy, 'date')
     data_copy.drop('Elapsed', axis=1, inplace=True)
@@ -47,9 +76,7 @@ def ticker_svm(raw_data):
     # setting importance of days before and after weekends
     # we assume that Fridays and Mondays are more important
     # 0 is Monday, 1 is Tuesday
-    data_copy['mon_fri'] = 0
-    data_copy['mon_fri'].mask(data_copy['Dayofweek'].isin([0, 4]), 1, inplace=True)
-    data_copy['mon_fri'].where(data_copy['Dayofweek'].isin([0, 4]), 0, inplace=True)
+    data_copy['mon_fri'] = data_copy['Dayofweek'].isin([0, 4]).astype('int64')
 
     x_features = data_copy.drop('close', axis=1)
     y_features = data_copy['close']
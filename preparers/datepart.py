@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+"""
+Names of the date part columns, in the order fastai's add_datepart() adds them
+"""
+DATEPART_COLUMNS = ['Year', 'Month', 'Week', 'Day', 'Dayofweek', 'Dayofyear', 'Is_month_end', 'Is_month_start',
+                    'Is_quarter_end', 'Is_quarter_start', 'Is_year_end', 'Is_year_start']
+
+
+"""
+Computes calendar features for an array of dates with vectorized NumPy operations on
+datetime64 values, giving the same values as fastai's add_datepart() (i.e. the pandas
+.dt accessors) without importing fastai:
+ - Year, Month, Day, Dayofyear (starting at 1)
+ - Week (ISO 8601 week number)
+ - Dayofweek (0 is Monday)
+ - Is_month_end, Is_month_start, Is_quarter_end, Is_quarter_start, Is_year_end, Is_year_start
+ - mon_fri (1 on Mondays and Fridays, the days before and after weekends, else 0)
+
+Parameters:
+    dates (np.ndarray or pd.Series): Dates, anything convertible to datetime64
+
+Returns:
+    (dict(str, np.ndarray)): int64 / bool columns, DATEPART_COLUMNS followed by 'mon_fri'
+"""
+
+
+def date_parts(dates):
+    days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+    months, years = days.astype('datetime64[M]'), days.astype('datetime64[Y]')
+
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months).astype(np.int64) + 1
+    day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    is_month_end = (days + 1).astype('datetime64[M]') != months
+    is_month_start = day == 1
+
+    # the ISO week is the week of the year of the Thursday in the same Monday to Sunday week
+    thursday = days + (3 - day_of_week)
+    week = (thursday - thursday.astype('datetime64[Y]')).astype(np.int64) // 7 + 1
+
+    return {
+        'Year': years.astype(np.int64) + 1970,
+        'Month': month,
+        'Week': week,
+        'Day': day,
+        'Dayofweek': day_of_week,
+        'Dayofyear': (days - years).astype(np.int64) + 1,
+        'Is_month_end': is_month_end,
+        'Is_month_start': is_month_start,
+        'Is_quarter_end': is_month_end & (month % 3 == 0),
+        'Is_quarter_start': is_month_start & (month % 3 == 1),
+        'Is_year_end': is_month_end & (month == 12),
+        'Is_year_start': is_month_start & (month == 1),
+        'mon_fri': np.isin(day_of_week, [0, 4]).astype(np.int64),
+    }
+
+
+"""
+Calendar features of date_parts() as a DataFrame
+"""
+
+
+def date_features(dates, index=None):
+    return pd.DataFrame(date_parts(dates), index=index)
+
+
+"""
+Calendar features of date_parts() as one compact 2D array, by default float32 which
+takes half the memory of the DataFrame and can be fed to sklearn directly
+"""
+
+
+def date_feature_matrix(dates, dtype=np.float32):
+    parts = date_parts(dates)
+    matrix = np.empty((len(parts['Year']), len(parts)), dtype=dtype)
+    for i, column in enumerate(parts.values()):
+        matrix[:, i] = column
+    return matrix
@@ -0,0 +1,5 @@
+import sys
+
+from timeseries.cli import main
+
+sys.exit(main())
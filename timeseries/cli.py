@@ -0,0 +1,179 @@
+import os
+import sys
+import argparse
+import importlib
+
+"""
+Command-line entry point of the pipeline:
+
+    python3 -m timeseries run --symbol AMZN --method svm --look-back 14 --threshold 1.5
+    python3 -m timeseries sweep --symbols AMZN MSFT --methods sma lr --look-backs 7 14 --thresholds 0 1 2
+    python3 -m timeseries fetch --symbols AMZN MSFT --interval 5min
+
+Only argparse is imported at startup. Every command imports the modules it needs when it
+runs, so e.g. an SMA or LR run does not load sklearn, matplotlib or requests. Plots are
+only rendered with --plot-dir, to PNG files with matplotlib's non-interactive Agg backend,
+so runs never block on windows when there is no display.
+"""
+
+METHOD_NAMES = ['sma', 'lr', 'svm']
+
+
+"""
+Loads data, forecasts with one method, simulates trades on the forecast and prints the
+number of trades and final balance
+"""
+
+
+def run(args):
+    from core.functions import forecast
+    from core.runner import METHODS
+    from core.simulation import simulate_trades_vectorized
+    from loaders.alphavantage import get_ticker_data
+
+    module, name = METHODS[args.method]
+    method = getattr(importlib.import_module(module), name)()
+    preparer = getattr(importlib.import_module('preparers'), args.preparer or 'ticker_{}'.format(args.method))
+
+    raw_data = get_ticker_data(args.symbol, interval=args.interval, download=args.download, data_dir=args.data_dir)
+    x_features, y_features = preparer(raw_data=raw_data)
+    ground_truth = y_features.to_numpy()
+
+    predictions = forecast(method=method, data=(x_features, y_features), start_t=args.start_t,
+                           look_back=args.look_back, diff_order=args.diff_order, cache=args.cache or None,
+                           n_jobs=args.n_jobs, refit=args.refit)
+    balances, trade_log = simulate_trades_vectorized(predictions=predictions, ground_truth=ground_truth,
+                                                     threshold=args.threshold, verbose=False, return_log=True,
+                                                     log_file=args.trade_log)
+
+    n_trades = int((abs(trade_log['side']) == 1).sum())
+    print('{} {} look_back={} threshold={}: {} trades, final balance {}'.format(
+        args.symbol, args.method, args.look_back, args.threshold, n_trades, balances[-1] if len(balances) else 0))
+
+    if args.plot_dir:
+        paths = plot_run(args.plot_dir, args.method, predictions, ground_truth, balances)
+        print('Plots saved to {}'.format(', '.join(paths)))
+    return 0
+
+
+"""
+Renders the plots of experiment.py to PNG files in a directory, with the Agg backend
+
+Returns:
+    paths (list(str)): Paths of the files written
+"""
+
+
+def plot_run(plot_dir, label, predictions, ground_truth, balances):
+    import matplotlib
+    matplotlib.use('Agg')
+    from utils.viz import plot_time_series, plot_balance, plot_balance_vs_price
+
+    os.makedirs(plot_dir, exist_ok=True)
+    paths = [os.path.join(plot_dir, name) for name in ['predictions.png', 'balance.png', 'balance_vs_price.png']]
+    plot_time_series(ts_1=predictions, ts_label_1=label, ts_2=ground_truth, ts_label_2='Close',
+                     title='{} predictions vs. ground truth'.format(label), path=paths[0])
+    plot_balance(data=balances, path=paths[1])
+    plot_balance_vs_price(balances=balances, price=ground_truth[1:len(balances) + 1], title='balance vs. price',
+                          path=paths[2])
+    return paths
+
+
+"""
+Runs a grid of backtests over worker processes (see core/runner.py) and prints the best
+configurations, optionally writing every result to a CSV file. With a results store,
+configurations already stored are skipped and the best stored run per symbol and method
+is printed
+"""
+
+
+def sweep(args):
+    from core.runner import make_grid, run_grid
+    from loaders.alphavantage import get_ticker_data
+
+    data = {symbol: get_ticker_data(symbol, interval=args.interval, data_dir=args.data_dir) for symbol in args.symbols}
+    grid = make_grid(args.symbols, args.preparers, args.methods, args.look_backs, diff_orders=args.diff_orders,
+                     thresholds=args.thresholds)
+    if args.store is None:
+        results = run_grid(grid, data=data, interval=args.interval, start_t=args.start_t, max_workers=args.workers,
+                           results_path=args.results)
+        print(results.sort_values('final_balance', ascending=False).head(args.top).to_string(index=False))
+        return 0
+
+    from core.store import ResultsStore
+    with ResultsStore(args.store) as store:
+        results = run_grid(grid, data=data, interval=args.interval, start_t=args.start_t, max_workers=args.workers,
+                           results_path=args.results, store=store, store_curves=args.store_curves)
+        print('{} configurations run, {} skipped'.format(len(results), len(grid) - len(results)))
+        print(store.best(['symbol', 'method']).to_string(index=False))
+    return 0
+
+
+"""
+Downloads new bars for every symbol into the local store, see loaders/bulk.py
+"""
+
+
+def fetch(args):
+    from loaders.bulk import iter_many_ticker_data
+
+    for symbol, data in iter_many_ticker_data(args.symbols, interval=args.interval, concurrency=args.concurrency,
+                                              rate_limit=args.rate_limit, data_dir=args.data_dir):
+        print('{}: {} bars stored'.format(symbol, len(data)))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python3 -m timeseries', description='Time series forecasting backtests')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='forecast and simulate one symbol with one method')
+    run_parser.add_argument('--symbol', required=True)
+    run_parser.add_argument('--method', choices=METHOD_NAMES, default='sma')
+    run_parser.add_argument('--preparer', help='preparer function in preparers/ (default is ticker_{method})')
+    run_parser.add_argument('--look-back', type=int, default=14)
+    run_parser.add_argument('--diff-order', default='1')
+    run_parser.add_argument('--threshold', type=float, default=0)
+    run_parser.add_argument('--download', action='store_true', help='download new bars before running')
+    run_parser.add_argument('--cache', action='store_true', help='use the forecast cache, see core/cache.py')
+    run_parser.add_argument('--n-jobs', type=int, help='forecast over this many worker processes')
+    run_parser.add_argument('--refit', type=int, help='refit the model every k time steps (LR and SVM)')
+    run_parser.add_argument('--trade-log', help='write the trade log to this file')
+    run_parser.add_argument('--plot-dir', help='save plots of the run as PNG files in this directory')
+    run_parser.set_defaults(handler=run)
+
+    sweep_parser = commands.add_parser('sweep', help='run a grid of backtests')
+    sweep_parser.add_argument('--symbols', nargs='+', required=True)
+    sweep_parser.add_argument('--methods', nargs='+', choices=METHOD_NAMES, default=['sma'])
+    sweep_parser.add_argument('--preparers', nargs='+', default=['ticker_default'])
+    sweep_parser.add_argument('--look-backs', type=int, nargs='+', default=[14])
+    sweep_parser.add_argument('--diff-orders', nargs='+', default=['1'])
+    sweep_parser.add_argument('--thresholds', type=float, nargs='+', default=[0])
+    sweep_parser.add_argument('--workers', type=int, help='number of worker processes (default is the CPU count)')
+    sweep_parser.add_argument('--results', help='append every result to this CSV file')
+    sweep_parser.add_argument('--top', type=int, default=10, help='number of best configurations to print')
+    sweep_parser.add_argument('--store', help='SQLite results store, configurations already in it are skipped')
+    sweep_parser.add_argument('--store-curves', action='store_true', help='also store the balance curves')
+    sweep_parser.set_defaults(handler=sweep)
+
+    fetch_parser = commands.add_parser('fetch', help='download new bars into the local store')
+    fetch_parser.add_argument('--symbols', nargs='+', required=True)
+    fetch_parser.add_argument('--concurrency', type=int, default=4)
+    fetch_parser.add_argument('--rate-limit', type=int, default=5, help='requests per minute')
+    fetch_parser.set_defaults(handler=fetch)
+
+    for command in [run_parser, sweep_parser, fetch_parser]:
+        command.add_argument('--interval', default='daily')
+        command.add_argument('--data-dir', default='data')
+    for command in [run_parser, sweep_parser]:
+        command.add_argument('--start-t', type=int, default=5)
+    return parser
+
+
+def main(args=None):
+    args = build_parser().parse_args(args)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
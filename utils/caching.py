@@ -0,0 +1,79 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+"""
+Building blocks shared by the caches of the package (the column cache in loaders/cache.py
+and the forecast cache in core/cache.py)
+"""
+
+
+"""
+Thread-safe in-memory cache of the most recently used entries, the least recently used
+entry is dropped once there are more than max_size entries (0 keeps nothing)
+"""
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    """
+    Returns the value of a key and marks it as the most recently used, or None
+    """
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+"""
+Saves an array as a .npy file under a temporary name first and then renames it, so
+readers (in this or other processes) never see a partially written file
+"""
+
+
+def save_array(path, array):
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as file:
+        np.save(file, np.ascontiguousarray(array))
+    os.replace(temporary_path, path)
+
+
+"""
+Ignores the OS errors raised by the cache writes in its block: a cache is an optimization,
+and e.g. a read-only directory should not fail the load or the forecast it speeds up
+"""
+
+
+@contextmanager
+def ignore_cache_errors():
+    try:
+        yield
+    except OSError:
+        pass
@@ -1,34 +1,62 @@
 import numpy as np
+import pandas as pd
 
 """
 Differentiates a time series to make it stationary
  - '1' (order 1): X(n) <- X(n) - X(n-1)
- - '2' (order 2): X(n) <- X(n) - 2 X(n-1) - X(n-2)
+ - '2' (order 2): X(n) <- X(n) - 2 X(n-1) + X(n-2)
  - 'return-price': X(n) <- (X(n) - X(n-1)) / X(n-1)
 
+Orders above 1 drop the first value at every level except the last one, so the result
+is (order - 1) values shorter than the input, and empty for inputs shorter than that.
+Missing values (e.g. the first difference) are filled with 0 at every level. The differences are computed with NumPy in one pass per order.
+
 Parameters:
-    data (pd.DataFrame): Data with 'close' and 'date' columns
+    data (pd.Series, pd.DataFrame or np.ndarray): Time series, chronologically ordered
+        along the first axis
     order (str): Order of differentiation
         (default is 1)
 
 Returns:
-    data_diff (pd.DataFrame): DataFrame with a differentiated 'close' price column
+    data_diff (same type as data): Differentiated time series, pandas objects keep the
+        index labels of the values they were computed from
 """
 
 
 def differentiate(data, order='1'):
-    diff_data = data.copy()
     if order == '0':
-        return diff_data
-    if order == '1':
-        diff_data = data.diff().fillna(0)
-    elif order == 'return-price':
-        diff_data = (data.diff() / data.shift(periods=1)).fillna(0)
+        return data.copy()
+
+    values = np.asarray(data)
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+
+    if order == 'return-price':
+        diff_values = _diff(values)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(diff_values[1:], values[:-1], out=diff_values[1:])
+        diff_values[np.isnan(diff_values)] = 0
     else:
-        diff_data = data.diff().fillna(0)
-        diff_data.drop(diff_data.index[0], inplace=True)
-        diff_data = differentiate(diff_data, str(int(order)-1))
-    return diff_data
+        # missing values are filled at every level, so a NaN only affects the differences next to it
+        diff_values = _diff(values)
+        diff_values[np.isnan(diff_values)] = 0
+        for _ in range(int(order) - 1):
+            diff_values = _diff(diff_values[1:])
+            diff_values[np.isnan(diff_values)] = 0
+
+    if isinstance(data, pd.Series):
+        return pd.Series(diff_values, index=data.index[len(data) - len(diff_values):], name=data.name)
+    if isinstance(data, pd.DataFrame):
+        return pd.DataFrame(diff_values, index=data.index[len(data) - len(diff_values):], columns=data.columns)
+    return diff_values
+
+
+def _diff(values):
+    # slices instead of indices, series shorter than the order differentiate to an empty result
+    diff_values = np.empty_like(values)
+    diff_values[:1] = np.nan
+    np.subtract(values[1:], values[:-1], out=diff_values[1:])
+    return diff_values
 
 
 """
@@ -37,14 +65,21 @@ initial_val is required to rebuild the time series when order > 0
 and corresponds to the first used value in the time series when 
 treating the time series as chronological.
 
+The series is rebuilt with a cumulative sum for order '1', a cumulative
+product of (1 + r) for 'return-price', and repeated cumulative sums for
+higher orders. Order '1' gives the same values as adding the predictions
+one by one; 'return-price' agrees with it up to floating point rounding.
+
 Parameters:
     predictions (list(float)): Predicted values given by a forecast
     diff_order (str): Order of differentiation, see differentiate() 
         for more info
-    initial_val (float): Start value for time series
+    initial_val (float): Start value for time series. For orders above 1, a list
+        with the start value of the series followed by the start value of each
+        lower order difference, e.g. [X(t-1), X(t-1) - X(t-2)] for order 2
 
 Returns:
-    inv_diff_predictions (list(float)): recreated time series of predictions
+    inv_diff_predictions (np.ndarray): recreated time series of predictions
         from differentiated values
 """
 
@@ -52,20 +87,28 @@ Returns:
 def inv_differentiate(predictions, order, initial_val):
     if order == '0':
         return np.array(predictions)
-    elif order == '1':
-        inv_diff_predictions = [initial_val + predictions[0]]
 
-        for i in range(len(predictions)-1):
-            inv_diff_predictions.append(predictions[i+1] + inv_diff_predictions[i])
+    inv_diff_predictions = np.array(predictions, dtype=np.float64)
+    if len(inv_diff_predictions) == 0:
+        return inv_diff_predictions
 
-        return np.array(inv_diff_predictions)
-    elif order == 'return-price':
-        inv_diff_predictions = [predictions[0] * initial_val + initial_val]
+    if order == 'return-price':
+        inv_diff_predictions += 1
+        np.cumprod(inv_diff_predictions, axis=0, out=inv_diff_predictions)
+        inv_diff_predictions *= initial_val
+        return inv_diff_predictions
 
-        for i in range(len(predictions)-1):
-            inv_diff_predictions.append(predictions[i+1] * inv_diff_predictions[i] + inv_diff_predictions[i])
+    if not order.isdigit():
+        raise ValueError('Unknown differentiation order {}'.format(order))
+    initial_values = [initial_val] if order == '1' else list(np.atleast_1d(initial_val))
+    if len(initial_values) != int(order):
+        raise ValueError('Order {} requires {} initial values'.format(order, order))
 
-        return np.array(inv_diff_predictions)
+    for level_initial_val in reversed(initial_values):
+        # X(0) = initial + D(0), X(n) = X(n-1) + D(n)
+        inv_diff_predictions[0] += level_initial_val
+        np.cumsum(inv_diff_predictions, axis=0, out=inv_diff_predictions)
+    return inv_diff_predictions
 
 
 """
@@ -75,7 +118,45 @@ for visualization purposes of returns vs. close price comparisons
 
 
 def min_max_normalize(data):
-    return (data - min(data)) / (max(data) - min(data))
+    low, high = np.min(data), np.max(data)
+    return (data - low) / (high - low)
+
+
+"""
+x and y data of a time series converted once to contiguous float64 NumPy arrays
+and validated once, so that training_data_for_t() and feature_row() hand out
+training windows and feature rows as views instead of slicing pandas objects at
+every time step. If x_data is None, a monotonically increasing series from 0 to n
+is used.
+
+Attributes:
+    x (np.ndarray): 2D array of features, one row per time step
+    y (np.ndarray): 1D array of values being predicted
+"""
+
+
+class PreparedData:
+    def __init__(self, x_data, y_data):
+        x_data, y_data = generate_and_verify_data(x_data=x_data, y_data=y_data)
+
+        x = np.ascontiguousarray(x_data, dtype=np.float64)
+        self.x = x.reshape(-1, 1) if x.ndim == 1 else x
+        self.y = np.ascontiguousarray(y_data, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.y)
+
+
+"""
+Returns the features at time t of x_data as a single row that can be passed to
+sklearn's predict(), without copying when x_data is an array (e.g. PreparedData.x)
+"""
+
+
+def feature_row(x_data, t):
+    if isinstance(x_data, np.ndarray):
+        return x_data[t:t + 1]
+    return [x_data.iloc[t]]
 
 
 """ 
@@ -102,13 +183,25 @@ def training_data_for_t(data, t, look_back):
     x_data, y_data = generate_and_verify_data(x_data=data[0], y_data=data[1])
     assert len(x_data) == len(y_data)
 
-    if look_back == -1 or t < look_back:
-        x_train, y_train = x_data[:t], y_data[:t]
-    else:
-        x_train, y_train = x_data[t - look_back:t + 1], y_data[t - look_back:t + 1]
+    start, stop = training_window(t, look_back)
+    x_train, y_train = x_data[start:stop], y_data[start:stop]
     return x_train, y_train
 
 
+"""
+Returns the [start, stop) bounds of the training data slice used by
+training_data_for_t() for a time t and look back. Methods that keep
+state between time steps can use this to know which rows entered or
+left the training window
+"""
+
+
+def training_window(t, look_back):
+    if look_back == -1 or t < look_back:
+        return 0, t
+    return t - look_back, t + 1
+
+
 """
 Returns whether a percent change between two values is above a specified threshold.
 Useful for making decisions based on thresholds
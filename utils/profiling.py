@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import cProfile
+import contextvars
+import pstats
+from contextlib import contextmanager, nullcontext
+
+"""
+Lightweight instrumentation of the hot paths (forecast(), the methods and the simulations).
+
+Instrumented code wraps its stages in stage(), which reports into the active Recorder,
+if any. Without an active recorder stage() only returns a shared no-op context manager,
+so instrumentation costs one function call per stage:
+
+    with recording() as recorder:
+        forecast(method, data, start_t=5, look_back=14)
+    recorder.to_json('forecast.json')
+
+Stage names are dotted, e.g. 'forecast.differentiate' or 'LinearRegression.fit'.
+
+The active recorder is a context variable: it applies to the thread (or asyncio task) that
+called recording(), and threads started from it, e.g. by a ThreadPoolExecutor, do not
+report into it. Worker processes have their own state as well, code that runs work in
+other threads or processes collects their stats explicitly (see core/parallel.py and
+the recorder parameter of core/runner.py) and merges them into the active recorder.
+"""
+
+_NULL_STAGE = nullcontext()
+_active = contextvars.ContextVar('active_recorder', default=None)
+
+
+"""
+Collects the time, calls and counters of every stage reported while it is active.
+
+For every stage, the recorder keeps the cumulative seconds, the number of calls and the
+sum of any counter passed to stage() (e.g. fits=1 or window=len(x_train), the mean window
+is then window / calls). Recorders from different runs or processes can be merged, and
+are exported as a dict, JSON or flat rows.
+
+Parameters:
+    profile (bool or list(str)): Stages to also run under cProfile, True for all. Only
+        the outermost profiled stage is profiled when profiled stages are nested
+        (default is False)
+"""
+
+
+class Recorder:
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.stats = {}
+        self.profiles = {}
+        self._profiling = False
+
+    """
+    Context manager that times a stage and adds its counters
+    """
+    @contextmanager
+    def stage(self, name, **counts):
+        profiler = self._start_profile(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            self.add(name, seconds=seconds, **counts)
+
+    """
+    Adds a call to a stage without timing it, e.g. to count events
+    """
+    def add(self, name, seconds=0.0, calls=1, **counts):
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = self.stats[name] = {'seconds': 0.0, 'calls': 0}
+        entry['seconds'] += seconds
+        entry['calls'] += calls
+        for counter, value in counts.items():
+            entry[counter] = entry.get(counter, 0) + value
+
+    """
+    Adds the stats of another Recorder (or of its to_dict()) to this one
+    """
+    def merge(self, other):
+        stats = other.stats if isinstance(other, Recorder) else other
+        for name, entry in stats.items():
+            self.add(name, **entry)
+        if isinstance(other, Recorder):
+            for name, profile in other.profiles.items():
+                self._profile_stats(name, profile)
+        return self
+
+    def to_dict(self):
+        return {name: dict(entry) for name, entry in self.stats.items()}
+
+    """
+    Returns the stats as JSON, also written to path if given
+    """
+    def to_json(self, path=None):
+        text = json.dumps(self.to_dict(), indent=2, sort_keys=True)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(text)
+        return text
+
+    """
+    Returns the stats as a flat table, one dict per stage with a 'stage' key, e.g. to
+    build a pd.DataFrame or append to a CSV file together with other runs
+    """
+    def rows(self, **columns):
+        return [dict(columns, stage=name, **entry) for name, entry in sorted(self.stats.items())]
+
+    """
+    Writes the cProfile stats of every profiled stage to {directory}/{stage}.pstats
+
+    Returns:
+        paths (list(str)): Files written
+    """
+    def dump_profiles(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, profile in sorted(self.profiles.items()):
+            path = os.path.join(directory, '{}.pstats'.format(name))
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def _start_profile(self, name):
+        if not self.profile or self._profiling:
+            return None
+        if self.profile is not True and name not in self.profile:
+            return None
+
+        profiler = cProfile.Profile()
+        self._profiling = True
+        profiler.enable()
+        return _ProfileHandle(self, name, profiler)
+
+    def _profile_stats(self, name, profiler):
+        if name in self.profiles:
+            self.profiles[name].add(profiler)
+        else:
+            self.profiles[name] = pstats.Stats(profiler)
+
+
+# stops the profiler of a stage and collects its stats into the recorder
+class _ProfileHandle:
+    def __init__(self, recorder, name, profiler):
+        self.recorder, self.name, self.profiler = recorder, name, profiler
+
+    def disable(self):
+        self.profiler.disable()
+        self.recorder._profile_stats(self.name, self.profiler)
+
+
+"""
+Context manager for a stage of the active Recorder, a no-op when nothing is recorded
+
+Parameters:
+    name (str): Name of the stage
+    **counts: Counters added to the stage, e.g. fits=1 or window=len(x_train)
+"""
+
+
+def stage(name, **counts):
+    recorder = _active.get()
+    if recorder is None:
+        return _NULL_STAGE
+    return recorder.stage(name, **counts)
+
+
+"""
+Adds a call to a stage of the active Recorder without timing it, see Recorder.add()
+"""
+
+
+def add(name, **counts):
+    recorder = _active.get()
+    if recorder is not None:
+        recorder.add(name, **counts)
+
+
+"""
+Returns the active Recorder, or None
+"""
+
+
+def active_recorder():
+    return _active.get()
+
+
+"""
+Makes a Recorder the active one for the duration of the block, and restores the
+previously active one afterwards
+
+Parameters:
+    recorder (Recorder): Recorder to report into
+        (default is None, a new Recorder with the profile option given)
+    profile (bool or list(str)): See Recorder
+        (default is False)
+
+Returns:
+    recorder (Recorder): The active recorder
+"""
+
+
+@contextmanager
+def recording(recorder=None, profile=False):
+    recorder = recorder or Recorder(profile=profile)
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
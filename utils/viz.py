@@ -1,20 +1,49 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import matplotlib.pyplot as plt
 from utils.general import min_max_normalize
 
+"""
+Every plot function takes an optional path: without it the plot is shown in a window,
+with it the plot is saved to that file instead and the figure is closed. Select the
+non-interactive backend with matplotlib.use('Agg') before importing this module to
+render plots without a display, or render many plots at once with render_many().
+
+Series are downsampled before plotting (see downsample()) to about one point per pixel
+of the figure width, so drawing a chart takes the same time whatever the series length.
+The downsample argument selects the algorithm: 'minmax', 'lttb' or None to plot every point.
+"""
+
+"""
+Downsampling algorithm used by the plot functions unless another one is given
+"""
+DOWNSAMPLE = 'minmax'
+
+
+def show(path=None):
+    if path is None:
+        plt.show()
+    else:
+        plt.savefig(path)
+        plt.close()
+
+
 """
 Plots a visualization of time series forecast values vs. the
 ground truth
 """
 
 
-def plot_forecast(forecast_data, true_data):
-    xs = list(range(0, len(forecast_data)))  # create an x axis
+def plot_forecast(forecast_data, true_data, path=None, downsample=DOWNSAMPLE):
+    xs = np.arange(len(forecast_data))  # create an x axis
 
-    plt.plot(xs, forecast_data, c='b', label='predicted')
-    plt.plot(xs, true_data, c='r', label='true')
+    plt.plot(*_reduce(xs, forecast_data, downsample), c='b', label='predicted')
+    plt.plot(*_reduce(xs, true_data, downsample), c='r', label='true')
 
     plt.legend(loc='upper left')
-    plt.show()
+    show(path)
 
 
 """
@@ -23,34 +52,34 @@ a series of trades simulation
 """
 
 
-def plot_balance(data):
-    xs = list(range(0, len(data)))  # create an x axis
+def plot_balance(data, path=None, downsample=DOWNSAMPLE):
+    xs = np.arange(len(data))  # create an x axis
 
-    plt.plot(xs, data, c='green', label='Balance')
+    plt.plot(*_reduce(xs, data, downsample), c='green', label='Balance')
 
     plt.title("balance over time")
     plt.legend(loc='upper left')
-    plt.show()
+    show(path)
 
 
 """
-Plots a visualization of balance vs. true values over time. Each time 
+Plots a visualization of balance vs. true values over time. Each time
 series is normalized to [0, 1] for comparison purposes
 """
 
 
-def plot_balance_vs_price(balances, price, title):
-    xs = list(range(0, len(balances)))  # create an x axis
+def plot_balance_vs_price(balances, price, title, path=None, downsample=DOWNSAMPLE):
+    xs = np.arange(len(balances))  # create an x axis
 
-    normalized_balances = min_max_normalize(balances)
-    normalized_price = min_max_normalize(price)
+    normalized_balances = min_max_normalize(np.asarray(balances, dtype=np.float64))
+    normalized_price = min_max_normalize(np.asarray(price, dtype=np.float64))
 
-    plt.plot(xs, normalized_balances, c='green', label='Balance')
-    plt.plot(xs, normalized_price, c='black', label='Price')
+    plt.plot(*_reduce(xs, normalized_balances, downsample), c='green', label='Balance')
+    plt.plot(*_reduce(xs, normalized_price, downsample), c='black', label='Price')
 
     plt.title(title)
     plt.legend(loc='upper left')
-    plt.show()
+    show(path)
 
 
 """
@@ -58,16 +87,16 @@ Plots two time series side-by-side
 """
 
 
-def plot_time_series(ts_1, ts_label_1, ts_2, ts_label_2, title):
+def plot_time_series(ts_1, ts_label_1, ts_2, ts_label_2, title, path=None, downsample=DOWNSAMPLE):
     assert len(ts_1) == len(ts_2)
-    xs = list(range(0, len(ts_1)))
+    xs = np.arange(len(ts_1))
 
-    plt.plot(xs, ts_1, c='green', label=ts_label_1)
-    plt.plot(xs, ts_2, c='red', label=ts_label_2)
+    plt.plot(*_reduce(xs, ts_1, downsample), c='green', label=ts_label_1)
+    plt.plot(*_reduce(xs, ts_2, downsample), c='red', label=ts_label_2)
 
     plt.title(title)
     plt.legend(loc='upper left')
-    plt.show()
+    show(path)
 
 
 """
@@ -75,16 +104,123 @@ Plots time series along with the forecast overlapped
 """
 
 
-def plot_time_series_with_forecast(time_series, forecast):
-    xs = list(range(0, len(time_series)))
-
+def plot_time_series_with_forecast(time_series, forecast, path=None, downsample=DOWNSAMPLE):
+    xs = np.arange(len(time_series))
     num_no_forecast = (len(time_series) - len(forecast))
-    zeroed_forecast = [None] * num_no_forecast
-    zeroed_forecast.extend(forecast)
 
-    plt.plot(xs, time_series, c='green', label='Original')
-    plt.plot(xs, zeroed_forecast, c='red', label='Forecast from t={}'.format(num_no_forecast))
+    plt.plot(*_reduce(xs, time_series, downsample), c='green', label='Original')
+    plt.plot(*_reduce(xs[num_no_forecast:], forecast, downsample), c='red',
+             label='Forecast from t={}'.format(num_no_forecast))
 
     plt.title('forecast for {} points into future from t={}'.format(len(forecast), len(time_series) - len(forecast)))
     plt.legend(loc='upper left')
-    plt.show()
+    show(path)
+
+
+"""
+Reduces a series to about n_points points that look the same when plotted
+
+ - 'minmax': splits the series into n_points / 2 buckets of consecutive points and keeps the
+   minimum and maximum of every bucket, so every peak and trough is drawn
+ - 'lttb': Largest-Triangle-Three-Buckets, keeps from every bucket the point that forms the
+   largest triangle with the point kept from the previous bucket and the average of the next
+   bucket, which follows the shape of the series more closely between extremes
+
+The first and last points are always kept, and series with at most n_points points are
+returned as they are.
+
+Parameters:
+    xs (np.ndarray): x values, increasing
+    ys (np.ndarray): y values
+    n_points (int): Number of points to reduce to
+    method (str): 'minmax' or 'lttb'
+        (default is 'minmax')
+
+Returns:
+    xs (np.ndarray): x values of the points kept
+    ys (np.ndarray): y values of the points kept
+"""
+
+
+def downsample(xs, ys, n_points, method='minmax'):
+    xs, ys = np.asarray(xs), np.asarray(ys, dtype=np.float64)
+    if len(ys) <= max(n_points, 3):
+        return xs, ys
+    if method == 'minmax':
+        keep = _minmax_indices(ys, max((n_points - 2) // 2, 1))
+    elif method == 'lttb':
+        keep = _lttb_indices(xs.astype(np.float64), ys, max(n_points, 3))
+    else:
+        raise ValueError('Unknown downsampling method {}, expected minmax or lttb'.format(method))
+    return xs[keep], ys[keep]
+
+
+"""
+Renders many charts to files over a pool of worker processes that use the non-interactive
+Agg backend
+
+Parameters:
+    charts (list((function, dict))): Plot functions of this module with their keyword
+        arguments, each including the path of the file to save to
+    max_workers (int): Number of worker processes
+        (default is the number of CPUs)
+
+Returns:
+    paths (list(str)): Paths of the files written, in the order of the charts
+"""
+
+
+def render_many(charts, max_workers=None):
+    for _, kwargs in charts:
+        if kwargs.get('path') is None:
+            raise ValueError('Every chart needs a path to be rendered to')
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_renderer) as executor:
+        futures = [executor.submit(_render, plot, kwargs) for plot, kwargs in charts]
+        return [future.result() for future in futures]
+
+
+def _init_renderer():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render(plot, kwargs):
+    plot(**kwargs)
+    return kwargs['path']
+
+
+def _reduce(xs, ys, method):
+    if method is None:
+        return xs, ys
+    # one point per pixel of the width of the figure
+    figure = plt.gcf()
+    return downsample(xs, ys, n_points=int(figure.get_figwidth() * figure.dpi), method=method)
+
+
+def _minmax_indices(ys, n_buckets):
+    # buckets of equal size, the last one padded with its last point
+    size = -(-(len(ys) - 2) // n_buckets)
+    inner = np.arange(1, 1 + size * n_buckets).clip(max=len(ys) - 2).reshape(n_buckets, size)
+    values = ys[inner]
+    low, high = inner[np.arange(n_buckets), values.argmin(axis=1)], inner[np.arange(n_buckets), values.argmax(axis=1)]
+    return np.unique(np.concatenate([[0, len(ys) - 1], low, high]))
+
+
+def _lttb_indices(xs, ys, n_points):
+    # n_points - 2 buckets between the first and the last point
+    edges = np.linspace(1, len(ys) - 1, n_points - 1).astype(np.int64)
+    keep = np.empty(n_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, len(ys) - 1
+
+    for i in range(n_points - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else len(ys)
+        next_x, next_y = xs[stop:next_stop].mean(), ys[stop:next_stop].mean()
+
+        previous = keep[i]
+        # twice the area of the triangle formed with the previous point and the next bucket's average
+        areas = np.abs((xs[previous] - next_x) * (ys[start:stop] - ys[previous])
+                       - (xs[previous] - xs[start:stop]) * (next_y - ys[previous]))
+        keep[i + 1] = start + areas.argmax()
+    return keep